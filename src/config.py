@@ -1,5 +1,6 @@
 import configparser
 import os
+from urllib.parse import urlparse
 
 config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
 if not os.path.exists(config_path):
@@ -14,13 +15,76 @@ RIC_BASE_URL = config['RICGRAPH-API']['BaseURL']
 FACULTY_PREFIX = config['RICGRAPH-API']['FacultyPrefix']
 OPENALEX_BASE_URL = config['OPENALEX_PURE']['BaseURL']
 OPENALEX_ID_URI = config['ID_URI']['OPENALEX']
-ORCID_ID_URI = config['ID_URI']['OPENALEX']
+ORCID_ID_URI = config['ID_URI']['ORCID']
 ID_URI = config['ID_URI']
 TYPE_URI = config['URI']
 
 
 DEFAULTS = config['DEFAULTS']
 
+# Connection pool and retry policy of the shared Pure client (optional settings)
+PURE_POOL_SIZE = config.getint('PURE-API', 'PoolSize', fallback=10)
+PURE_MAX_RETRIES = config.getint('PURE-API', 'MaxRetries', fallback=5)
+PURE_BACKOFF_FACTOR = config.getfloat('PURE-API', 'BackoffFactor', fallback=1)
+
+# Rate limit per host as "rate, burst" (requests per second, max requests at once) or "unlimited", e.g.
+# [RATE-LIMITS]
+# default = 10, 20
+# api.openalex.org = 10, 10
+# ricgraph.example.org = unlimited
+# The default applies to Pure and DataCite; Ricgraph is not rate limited unless it is listed.
+RATE_LIMITS = {}
+if config.has_section('RATE-LIMITS'):
+    for host in config.options('RATE-LIMITS'):
+        limit = config.get('RATE-LIMITS', host)
+        if limit.strip().lower() == 'unlimited':
+            RATE_LIMITS[host] = None
+        else:
+            rate, burst = limit.split(',')
+            RATE_LIMITS[host] = (float(rate), int(burst))
+RATE_LIMITS.setdefault(urlparse(RIC_BASE_URL).hostname, None)
+
+# Resolve the contributors of an output concurrently with the asyncio client (pure_async.py)
+# and the maximum number of Pure requests in flight for that client
+PURE_ASYNC_CONTRIBUTORS = config.getboolean('PURE-API', 'AsyncContributors', fallback=False)
+PURE_ASYNC_CONCURRENCY = config.getint('PURE-API', 'AsyncConcurrency', fallback=10)
+# Page size and number of pages fetched ahead when paging through Pure searches
+PURE_PAGE_SIZE = config.getint('PURE-API', 'PageSize', fallback=100)
+PURE_PREFETCH = config.getint('PURE-API', 'Prefetch', fallback=2)
+# Number of research outputs processed at the same time by df_to_pure (1 => one by one)
+# and the maximum number of PUTs to Pure in flight at the same time
+PURE_WORKERS = config.getint('PURE-API', 'Workers', fallback=1)
+PURE_MAX_CONCURRENT_PUTS = config.getint('PURE-API', 'MaxConcurrentPuts', fallback=4)
+
+# Local caches (optional settings)
+CACHE_DIR = config.get('CACHE', 'Directory', fallback='cache')
+CACHE_ENABLED = config.getboolean('CACHE', 'Enabled', fallback=True)
+
+# Time to live in seconds of cached Pure searches per endpoint, can be changed in [CACHE-TTL]
+PURE_CACHE_TTLS = {
+    'persons/search': 86400,
+    'journals/search': 7 * 86400,
+    'publishers/search': 7 * 86400,
+    'data-sets/search': 86400,
+}
+if config.has_section('CACHE-TTL'):
+    for endpoint in config.options('CACHE-TTL'):
+        PURE_CACHE_TTLS[endpoint.strip('/')] = config.getint('CACHE-TTL', endpoint)
+
+# Local index of person identifiers, rebuilt when it is older than MaxAgeDays
+PERSON_INDEX_ENABLED = config.getboolean('PERSON-INDEX', 'Enabled', fallback=True)
+PERSON_INDEX_MAX_AGE = config.getfloat('PERSON-INDEX', 'MaxAgeDays', fallback=7) * 86400
+# Maximum number of persons kept in the per-run memo of find_person (0 = unbounded)
+PERSON_MEMO_SIZE = config.getint('PERSON-INDEX', 'MemoSize', fallback=0)
+
+# ISSN => journal uuid index, optionally prefetched with all journals in Pure
+JOURNAL_PREFETCH = config.getboolean('JOURNALS', 'Prefetch', fallback=False)
+JOURNAL_INDEX_MAX_AGE = config.getfloat('JOURNALS', 'MaxAgeDays', fallback=30) * 86400
+
+# publisher name => publisher uuid map, optionally prefetched with all publishers in Pure
+PUBLISHER_PREFETCH = config.getboolean('PUBLISHERS', 'Prefetch', fallback=False)
+PUBLISHER_INDEX_MAX_AGE = config.getfloat('PUBLISHERS', 'MaxAgeDays', fallback=30) * 86400
+
 
 PURE_HEADERS = {
     "Content-Type": "application/json",
@@ -30,4 +94,30 @@ PURE_HEADERS = {
 
 OPENALEX_HEADERS = {'Accept': 'application/json',
                     'User-Agent': 'mailto:d.h.j.grotebeverborg@uu.nl'
-                    }
\ No newline at end of file
+                    }
+# Number of OpenAlex requests in flight and requests per second (the polite pool allows 10 per second);
+# an api.openalex.org entry in [RATE-LIMITS] takes precedence over RequestsPerSecond
+OPENALEX_WORKERS = config.getint('OPENALEX_PURE', 'Workers', fallback=4)
+OPENALEX_REQUESTS_PER_SECOND = config.getfloat('OPENALEX_PURE', 'RequestsPerSecond', fallback=10)
+RATE_LIMITS.setdefault(urlparse(OPENALEX_BASE_URL).hostname, (OPENALEX_REQUESTS_PER_SECOND, OPENALEX_WORKERS))
+# Harvested OpenAlex works are written as json lines, gzip compressed if CompressHarvest is set
+OPENALEX_HARVEST_COMPRESS = config.getboolean('OPENALEX_PURE', 'CompressHarvest', fallback=False)
+# Maximum number of author display names whose split in first and last name is remembered
+OPENALEX_NAME_MEMO_SIZE = config.getint('OPENALEX_PURE', 'NameMemoSize', fallback=100000)
+# Neighbor nodes fetched from Ricgraph are cached on disk for CacheMaxAgeHours
+RICGRAPH_CACHE_MAX_AGE = config.getfloat('RICGRAPH-API', 'CacheMaxAgeHours', fallback=24) * 3600
+# Number of person-roots of a faculty fetched from Ricgraph at the same time
+RICGRAPH_WORKERS = config.getint('RICGRAPH-API', 'Workers', fallback=8)
+# Location of the snapshot of faculties taken with ricgraph_snapshot.py
+RICGRAPH_SNAPSHOT_PATH = config.get('RICGRAPH-API', 'SnapshotPath',
+                                    fallback=os.path.join(CACHE_DIR, 'ricgraph_snapshot.sqlite'))
+
+# State of earlier runs per faculty (which DOIs were created, skipped or failed)
+SYNC_STATE_PATH = config.get('SYNC', 'Path', fallback=os.path.join(CACHE_DIR, 'sync_state.sqlite'))
+
+# OpenAlex and DataCite metadata cached per DOI for MaxAgeDays, compressed and at most MaxSizeMB (the least
+# recently used DOIs are removed first). With Offline = yes DOIs are only read from the cache.
+DOI_CACHE_PATH = config.get('DOI-CACHE', 'Path', fallback=os.path.join(CACHE_DIR, 'doi_cache.sqlite'))
+DOI_CACHE_MAX_AGE = config.getfloat('DOI-CACHE', 'MaxAgeDays', fallback=30) * 86400
+DOI_CACHE_MAX_SIZE = config.getfloat('DOI-CACHE', 'MaxSizeMB', fallback=512) * 1024 * 1024
+DOI_CACHE_OFFLINE = config.getboolean('DOI-CACHE', 'Offline', fallback=False)
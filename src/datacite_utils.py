@@ -11,6 +11,8 @@
 
 import requests
 import pandas as pd
+from http_session import get_session
+from doi_cache import DATACITE, get_doi_cache
 from concurrent.futures import ThreadPoolExecutor
 
 def get_first_affiliation_name(affiliations):
@@ -25,10 +27,20 @@ def get_first_affiliation_name(affiliations):
     return 'None'
 
 def fetch_data_for_doi(doi):
-    """Fetch and parse data for a single DOI."""
-    response = requests.get(f'https://api.datacite.org/dois/{doi}')
+    """Fetch and parse data for a single DOI (from the DOI cache if possible)."""
+    cache = get_doi_cache(DATACITE)
+    found, data = cache.lookup(doi) if cache is not None else (False, None)
+    if found:
+        return parse_datacite_response(data, doi)
+    if cache is not None and cache.offline:
+        print(f"DOI {doi} is not in the DOI cache (offline)")
+        return None
+
+    response = get_session().get(f'https://api.datacite.org/dois/{doi}')
     if response.status_code == 200:
         data = response.json()['data']['attributes']
+        if cache is not None:
+            cache.set(doi, data)
 
         return parse_datacite_response(data, doi)
     else:
@@ -0,0 +1,130 @@
+# ########################################################################
+#
+# DOI cache - compressed on-disk cache of the OpenAlex and DataCite
+# metadata of DOIs, shared by all scripts and runs
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import json
+import logging
+import threading
+import time
+import zlib
+from response_cache import open_database
+from doi_utils import normalize_doi
+from config import CACHE_ENABLED, DOI_CACHE_PATH, DOI_CACHE_MAX_AGE, DOI_CACHE_MAX_SIZE, DOI_CACHE_OFFLINE
+
+OPENALEX = 'openalex'
+DATACITE = 'datacite'
+NOT_CACHED = 'not in the DOI cache (offline)'
+
+
+class DoiCache:
+    """
+    Metadata of DOIs per source (OpenAlex, DataCite), keyed by normalized DOI and stored zlib compressed
+    in a sqlite database, so test runs and real runs of a faculty download every DOI once.
+
+    Entries older than max_age seconds are fetched again. When the entries of all sources together
+    take more than max_size bytes, the least recently used ones are removed. In offline mode entries
+    do not expire and the callers do not fetch what is not in the cache.
+
+    Parameters:
+    - path (str): Location of the sqlite database.
+    - source (str): Source of the metadata, e.g. OPENALEX or DATACITE.
+    - max_age (float, optional): Maximum age of an entry in seconds. None => entries do not expire.
+    - max_size (float, optional): Maximum total size in bytes of the compressed entries. None => unbounded.
+    - offline (bool): Serve DOIs only from the cache.
+    """
+
+    def __init__(self, path, source, max_age=None, max_size=None, offline=False):
+        self.source = source
+        self.max_age = max_age
+        self.max_size = max_size
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = open_database(path)
+        self._db.executescript(
+            'CREATE TABLE IF NOT EXISTS documents (source TEXT NOT NULL, doi TEXT NOT NULL, data BLOB NOT NULL, '
+            'size INTEGER NOT NULL, created REAL NOT NULL, used REAL NOT NULL, PRIMARY KEY (source, doi));'
+            'CREATE INDEX IF NOT EXISTS documents_used ON documents (used);'
+        )
+        self._size = self.total_size()
+
+    def total_size(self):
+        """Returns the size in bytes of the compressed entries of all sources."""
+        with self._lock:
+            return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM documents').fetchone()[0]
+
+    def _fresh(self, created):
+        return self.offline or self.max_age is None or created + self.max_age > time.time()
+
+    def lookup(self, doi):
+        """Returns (True, metadata) if the DOI is in the cache (and not expired), else (False, None)."""
+        key = normalize_doi(doi)
+        with self._lock:
+            row = self._db.execute('SELECT data, created FROM documents WHERE source = ? AND doi = ?',
+                                   (self.source, key)).fetchone()
+            if row is None or not self._fresh(row[1]):
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._db.execute('UPDATE documents SET used = ? WHERE source = ? AND doi = ?',
+                             (time.time(), self.source, key))
+        return True, json.loads(zlib.decompress(row[0]))
+
+    def set(self, doi, metadata):
+        data = zlib.compress(json.dumps(metadata, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        key = normalize_doi(doi)
+        with self._lock:
+            # a DOI that is set again replaces its entry, so its old size no longer counts
+            self._db.execute('BEGIN')
+            row = self._db.execute('SELECT size FROM documents WHERE source = ? AND doi = ?',
+                                   (self.source, key)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO documents (source, doi, data, size, created, used) '
+                             'VALUES (?, ?, ?, ?, ?, ?)', (self.source, key, data, len(data), now, now))
+            self._db.execute('COMMIT')
+            self._size += len(data) - (row[0] if row else 0)
+            if self.max_size is not None and self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        # other processes write to the same database, so the size is counted again before evicting
+        self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM documents').fetchone()[0]
+        if self._size <= self.max_size:
+            return
+        evicted = []
+        for source, doi, size in self._db.execute('SELECT source, doi, size FROM documents ORDER BY used'):
+            if self._size <= self.max_size:
+                break
+            evicted.append((source, doi))
+            self._size -= size
+        self._db.executemany('DELETE FROM documents WHERE source = ? AND doi = ?', evicted)
+        logging.info(f"DOI cache: evicted {len(evicted)} least recently used entries")
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM documents WHERE source = ?', (self.source,))
+            self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM documents').fetchone()[0]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_doi_cache(source):
+    """Returns the DoiCache of a source for this process, or None if caching is disabled."""
+    if not CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        if source not in _caches:
+            _caches[source] = DoiCache(DOI_CACHE_PATH, source, DOI_CACHE_MAX_AGE, DOI_CACHE_MAX_SIZE,
+                                       DOI_CACHE_OFFLINE)
+        return _caches[source]
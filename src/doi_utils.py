@@ -0,0 +1,25 @@
+# ########################################################################
+#
+# DOI utils - normalization of DOIs, so the DOIs of Ricgraph, OpenAlex
+# and DataCite can be compared and used as keys
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+DOI_PREFIXES = ('https://doi.org/', 'http://doi.org/', 'https://dx.doi.org/', 'http://dx.doi.org/',
+                'doi.org/', 'dx.doi.org/', 'doi:')
+
+
+def normalize_doi(doi):
+    """'https://doi.org/10.1038/ABC', 'doi.org/10.1038/abc ' => '10.1038/abc'; returns '' for None."""
+    if not doi or not isinstance(doi, str):
+        return ''
+    doi = doi.strip().lower()
+    for prefix in DOI_PREFIXES:
+        if doi.startswith(prefix):
+            return doi[len(prefix):]
+    return doi
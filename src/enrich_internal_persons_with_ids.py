@@ -36,6 +36,8 @@ Process:
 3. **Enrichment Check:**
    - The script checks if each person already has the required identifiers in Pure.
    - If an identifier is missing, it prepares to update the person's profile in Pure with the missing information.
+   - With --changed-only, person-roots for which Ricgraph's person/enrich has no suggestions and whose IDs did not
+     change since the previous run (a hash of each person-root's ID set is stored) are skipped.
 
 4. **Person Data Update:**
    - The script generates a JSON object representing the updated person data.
@@ -83,8 +85,15 @@ import requests
 import pandas as pd
 import math
 import json
-from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, ID_URI
+import hashlib
+import os
+from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, ID_URI, RICGRAPH_SNAPSHOT_PATH, CACHE_DIR
 from logging_config import setup_logging
+from pure_client import get_client
+from local_store import PersistentMap
+import ricgraph_snapshot
+import sharding
+from ricgraph_client import get_ricgraph_client
 
 #Setup logger
 
@@ -96,55 +105,45 @@ def is_nan(value):
     """
     return value is None or (isinstance(value, float) and math.isnan(value))
 
-def fetch_personroots(faculty_key):
-
-    try:
-        params = {'key': faculty_key, 'max_nr_items': '0'}
-        url = RIC_BASE_URL + 'get_all_personroot_nodes'
-        response = requests.get(url, params=params)
-        # print(response, faculty_key)
-        response.raise_for_status()
-        return response.json().get("results", [])
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person-roots for faculty {faculty_key}: {e}")
-        return []
-
-def fetch_person_ids(persoonroot_key):
-    try:
-        params = {'key': persoonroot_key, 'category_want': 'person'}
-        url = RIC_BASE_URL + 'get_all_neighbor_nodes'
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json().get("results", [])
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person IDs for person-root {persoonroot_key}: {e}")
-        return []
-
-def checkenrichement(persoonroot_key):
-    try:
-        params = {'key': persoonroot_key, 'source_system': 'pure uu', 'max_nr_items': 1}
-        url = RIC_BASE_URL + 'person/enrich'
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json().get("results", [])
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person IDs for person-root {persoonroot_key}: {e}")
-        return []
-
-def select_persons(faculties):
+def id_set_hash(personids):
+    """Returns a hash of the set of (name, value) ids of a person-root, independent of their order."""
+    ids = sorted({(str(personid.get('name')), str(personid.get('value'))) for personid in personids})
+    return hashlib.sha1(json.dumps(ids).encode('utf-8')).hexdigest()
+
+
+def get_id_hash_store():
+    """Returns the map person-root => hash of its id set at the last enrichment run."""
+    return PersistentMap(os.path.join(CACHE_DIR, 'lookups.sqlite'), 'person_id_hash')
+
+
+def select_persons(faculties, changed_only=False, id_hashes=None):
+    """
+    Returns a dataframe with a row per person-root and a column per id name.
+
+    With changed_only, person-roots for which Ricgraph's person/enrich has no suggestions and whose
+    id set has the same hash as at the previous run (in id_hashes) are skipped. The hashes of the
+    person-roots that were selected are returned as well, so they can be stored after the run.
+    """
     persons = []
+    ricgraph = get_ricgraph_client()
+    new_hashes = {}
+    skipped = 0
 
     for faculty in faculties:
         print(faculty)
         logging.info(f"Processing faculty: {faculty}")
-        personroots = fetch_personroots(faculty)
-
-        for personroot in personroots:
-
-            persoonroot_key = personroot['_key']
-            enrich = checkenrichement(persoonroot_key)
-
-            personids = fetch_person_ids(persoonroot_key)
+        personroots = ricgraph.personroots(faculty)
+
+        def fetch(persoonroot_key):
+            return ricgraph.check_enrichment(persoonroot_key), ricgraph.person_ids(persoonroot_key)
+
+        # the person-roots are fetched in parallel, but processed in order
+        for persoonroot_key, (enrich, personids) in ricgraph.map_personroots(personroots, fetch):
+            id_hash = id_set_hash(personids)
+            if changed_only and not enrich and id_hashes is not None and id_hashes.get(persoonroot_key) == id_hash:
+                skipped += 1
+                continue
+            new_hashes[persoonroot_key] = id_hash
             persons.extend([
                 [persoonroot_key, personid['name'], personid['value']]
                 for personid in personids
@@ -158,11 +157,13 @@ def select_persons(faculties):
     if 'PURE_UUID_PERS' not in persondf.columns:
         persondf['PURE_UUID_PERS'] = pd.NA
 
+    if changed_only:
+        logging.info(f"person-roots without changes skipped:  {skipped}")
     file_path = "person_ids.xlsx"
     persondf.to_excel(file_path, index=False)
-    return persondf
+    return persondf, new_hashes
 
-def update_person(new_ids, data, api_url):
+def update_person(new_ids, data, path):
     for new in new_ids:
         new_identifier = {
             'typeDiscriminator': 'ClassifiedId',
@@ -173,8 +174,9 @@ def update_person(new_ids, data, api_url):
             data['identifiers'].append(new_identifier)
         else:
             data['identifiers'] = [new_identifier]
-    response2 = requests.put(api_url, headers=PURE_HEADERS, json=data)
+    response2 = get_client().put(path, json=data)
     print(response2.status_code)
+    return response2.status_code in [200, 201]
 
 def check_new_ids(row, data):
     identifiers = data.get('identifiers', [])
@@ -208,62 +210,77 @@ def check_new_ids(row, data):
             orcidchange = 'X'
     return new_ids, data, orcidchange, orcid
 
-def find_item_by_uuid(data, target_uuid):
-    items = data.get('items', [])
-    for item in items:
-        if item.get('uuid') == target_uuid:
-            return item
-    return None
-
-def select_faculties(faculty_choice):
-    params = {
-        'value': 'uu faculty',
-    }
-
-    response = requests.get('http://127.0.0.1:3030/api/organization/search', params=params)
-    data = response.json()
-    if faculty_choice.lower() == 'all':
-        selected_faculties = [item['_key'] for item in data["results"]]
-    else:
-        selected_faculties = [faculty_choice]
-
-    return selected_faculties
-
-def main(faculty_choice, test_choice):
-    logging.info(f"start fetching person-roots for {faculty_choice}")
-    logging.info(f"Test run =  {test_choice}")
-    faculties = select_faculties(faculty_choice)
-    person_df = select_persons(faculties)
-
-    id_list = person_df['PURE_UUID_PERS'].tolist()
-
-    json_data = {'uuids': id_list, 'size': 999999, 'offset': 0}
-    headers = PURE_HEADERS
-    url = PURE_BASE_URL + 'persons/search/'
+def process_persons(rows, shard, test_choice):
+    """
+    Fetches the Pure records of the persons in rows (in bulk) and adds the ids that are missing.
+    Also runs a shard of a sharded run in a worker process (see sharding.run_sharded).
 
-    response = requests.post(url, headers=headers, json=json_data)
-    datatotal = response.json()
-    logging.info(f"total persons selected:  {datatotal["count"]}")
-    with open('datatotal.json', "w") as f:
-        json.dump(datatotal, f, indent=4)
+    Returns:
+    - tuple: (counts, failed) with the number of persons selected and updated, and the person-roots
+      whose update failed.
+    """
+    rows_by_uuid = {row['PURE_UUID_PERS']: row for row in rows}
+    json_data = {'uuids': list(rows_by_uuid)}
 
     counter = 0
-
-    for index, row in person_df.iterrows():
-        logging.info(f"checking person:  {row['PURE_UUID_PERS']}")
-        data = find_item_by_uuid(datatotal, row['PURE_UUID_PERS'])
-        if data:
+    total = 0
+    failed = []
+
+    # page through the Pure persons, so only a few pages are in memory at the same time
+    file_path = 'datatotal.jsonl' if shard is None else f'datatotal_{shard}.jsonl'
+    with open(file_path, "w") as f:
+        for data in get_client().iter_search('persons/search/', json_data):
+            total = total + 1
+            f.write(json.dumps(data) + '\n')
+            row = rows_by_uuid.get(data.get('uuid'))
+            if row is None:
+                continue
+            logging.info(f"checking person:  {row['PURE_UUID_PERS']}")
             new_ids, data, orcidchange, orcid = check_new_ids(row, data)
             if new_ids or orcidchange:
 
                 counter = counter + 1
                 logging.info(f"new ids: {new_ids} {orcid}")
-                api_url = PURE_BASE_URL + 'persons/' + row['PURE_UUID_PERS']
-                if test_choice == 'no':
-                    update_person(new_ids, data, api_url)
+                path = 'persons/' + row['PURE_UUID_PERS']
+                if test_choice == 'no' and not update_person(new_ids, data, path):
+                    failed.append(row['person_id'])
 
+    return {'selected': total, 'updated': counter}, failed
 
-    logging.info(f"total persons updated (if no test run):  {counter}")
+
+def main(faculty_choice, test_choice, changed_only=False, processes=1):
+    logging.info(f"start fetching person-roots for {faculty_choice}")
+    logging.info(f"Test run =  {test_choice}")
+    logging.info(f"Changed only =  {changed_only}")
+    faculties = get_ricgraph_client().select_faculties(faculty_choice)
+    id_hashes = get_id_hash_store()
+    person_df, new_hashes = select_persons(faculties, changed_only, id_hashes)
+
+    rows_by_uuid = {row['PURE_UUID_PERS']: row for _, row in person_df.iterrows() if not pd.isna(row['PURE_UUID_PERS'])}
+    if not rows_by_uuid:
+        # an empty uuid list would select all persons in Pure
+        logging.info("no persons to check")
+        return
+
+    if processes > 1:
+        # every person is in exactly one shard
+        shards = [[rows_by_uuid[uuid] for uuid in part] for part in sharding.split(rows_by_uuid, processes)]
+        results = sharding.run_sharded(process_persons, [shard for shard in shards if shard], processes, test_choice)
+        counts = sharding.merge_counts([result and result[0] for result in results])
+        failed = {key for result in results if result for key in result[1]}
+        if None in results:
+            # the persons of a failed shard are checked again next time
+            failed.update(new_hashes)
+    else:
+        counts, failed = process_persons(list(rows_by_uuid.values()), None, test_choice)
+        failed = set(failed)
+
+    logging.info(f"total persons selected:  {counts.get('selected', 0)}")
+    logging.info(f"total persons updated (if no test run):  {counts.get('updated', 0)}")
+
+    # remember the id sets that are now in Pure; test runs and failed updates are checked again next time
+    if test_choice == 'no':
+        id_hashes.set_many((key, id_hash) for key, id_hash in new_hashes.items() if key not in failed)
 
 
 # ########################################################################
@@ -276,9 +293,18 @@ if __name__ == '__main__':
                         default='uu faculty: information & technology services|organization_name',
                         help='Faculty choice or "all"')
     parser.add_argument('test_choice', type=str, nargs='?', default='yes', help='Run in test mode ("yes" or "no")')
+    parser.add_argument('--snapshot', type=str, nargs='?', const=RICGRAPH_SNAPSHOT_PATH, default=None,
+                        help='Read Ricgraph from the snapshot taken with ricgraph_snapshot.py (optionally its path)')
+
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Number of processes the persons are sharded over (1 => no sharding)')
+    parser.add_argument('--changed-only', action='store_true',
+                        help='Skip person-roots without enrichment suggestions whose ids did not change since the last run')
 
     args = parser.parse_args()
+    if args.snapshot:
+        ricgraph_snapshot.use_snapshot(args.snapshot)
 
-    main(args.faculty_choice, args.test_choice)
+    main(args.faculty_choice, args.test_choice, args.changed_only, args.processes)
 
 
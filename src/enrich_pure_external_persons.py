@@ -1,14 +1,16 @@
-import time
 import pandas as pd
 import logging
 from logging_config import setup_logging
 import requests
 import json
 import argparse
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import urllib3
-from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_ID_URI, ORCID_ID_URI, OPENALEX_HEADERS
+from pure_client import get_client
+from openalex_client import get_openalex_client
+import ricgraph_snapshot
+import sharding
+from ricgraph_client import get_ricgraph_client
+from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_ID_URI, ORCID_ID_URI, OPENALEX_HEADERS, RICGRAPH_SNAPSHOT_PATH
 logger = setup_logging('test', level=logging.INFO)
 logger.info("Script to update external persons in pure from ricgraph has started")
 
@@ -45,38 +47,16 @@ def extract_openalex_id(openalex):
         return ''
 
 def get_ro_from_openalex(item):
-    doi = 'doi.org/' + item
-    url = 'https://api.openalex.org/works/' + doi
-    try:
-        response = requests.get(url, headers=OPENALEX_HEADERS)
-        if response.status_code == 200:
-            data = response.json()  # Directly parse JSON response
-            return data
-    except:
-        pass
+    # from the DOI cache if possible, see openalex_client
+    doi, data, error = get_openalex_client().works([item])[0]
+    if error:
+        logging.warning(f"Failed to retrieve data for DOI {item}: {error}")
+    return data
 def get_ro_from_pure(item):
-    retry_strategy = Retry(
-        total=5,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS", "PUT"],
-        backoff_factor=1
-    )
-
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-
-    url = PURE_BASE_URL +"research-outputs/search/"
-    # url = "https://staging.research-portal.uu.nl/ws/api/research-outputs/search/"
-    session = requests.Session()
-    session.mount("https://", adapter)
-    # url = BASE_URL + '/journals/search/'
+    # retries, connection pooling and rate limiting are handled by the shared Pure client
     data = {"searchString": item}
     json_data = json.dumps(data)
-    headers = PURE_HEADERS
-    # response = session.get(url, headers=headers,  data=json_data, verify=False)
-    response = session.post(url, headers=headers, data=json_data)
-    time.sleep(1)  # Adjust the sleep time based on rate limits
-    # Close the session
-    session.close()
+    response = get_client().post("research-outputs/search/", data=json_data)
     data = response.json()
 
     return data
@@ -151,30 +131,13 @@ def identifier_exists(identifiers, new_id, id_type_uri):
             return True
     return False
 def update_externalpersons_pure(persons, test_choice):
-    # Set up retry strategy
-    retry_strategy = Retry(
-        total=5,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS", "PUT"],
-        backoff_factor=1
-    )
-
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-
+    client = get_client()
 
     for index, row in persons.iterrows():
-        session = requests.Session()
-        session.mount("https://", adapter)
         uuid = row['Pure_UUID']
-        headers = {
-            'Accept': 'application/json',
-            'api-key': PURE_API_KEY,
-        }
-
-        url = PURE_BASE_URL + "research-outputs/search/" + 'external-persons/' + uuid
-
+        path = 'external-persons/' + uuid
 
-        response = session.get(url, headers=headers, verify=False)
+        response = client.get(path, headers=headers, verify=False)
         data = response.json()  # Directly parse JSON response
 
         new_openalexid = None
@@ -228,70 +191,26 @@ def update_externalpersons_pure(persons, test_choice):
             if data['identifiers']:  # Ensure identifiers array is not empty
                 logging.info(f"update of uuid {uuid}, orcid, {new_orcid}, alex, {new_openalexid}")
                 if test_choice == 'no':
-                    url = PURE_BASE_URL + "research-outputs/search/" + 'external-persons/' + uuid
-
-                    response = session.put(url, headers=headers, json=data, verify=False)
+                    response = client.put(path, headers=headers, json=data, verify=False)
                     if response.status_code != 200:
                         logging.info(f"Failed to update data for UUID {uuid}: {response.text}")
                     else:
                         print()
                         logging.info(f"Successfully updated data for UUID {uuid}, orcid, {new_orcid}, alex, {new_openalexid}")
             else:
-                logging.info(f"No valid identifiers to update for UUID {uuid}")            # Respect rate limits
-                time.sleep(1)  # Adjust the sleep time based on rate limits
-                # Close the session
-                session.close()
+                logging.info(f"No valid identifiers to update for UUID {uuid}")
 
                     # response = requests.put(api_url, headers=headers, json=data)
 
 
-def select_faculties(faculty_choice):
-    params = {
-        'value': 'uu faculty',
-    }
-    url = RIC_BASE_URL + 'organization/search'
-    response = requests.get(url, params=params)
-    data = response.json()
-    if faculty_choice.lower() == 'all':
-        selected_faculties = [item['_key'] for item in data["results"]]
-    else:
-        selected_faculties = [faculty_choice]
-
-    return selected_faculties
-
-def fetch_personroots(faculty_key):
-    """Fetch person-root nodes for a given faculty."""
-    try:
-        params = {'key': faculty_key, 'max_nr_items': '100'}
-        url = RIC_BASE_URL + 'get_all_personroot_nodes'
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json().get("results", [])
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person-roots for faculty {faculty_key}: {e}")
-        return []
-
-def select_researchoutputs(persoonroot_key):
-    """Fetch person IDs for a given person-ro    ot."""
-    try:
-        params = {'key': persoonroot_key, 'category_want': 'journal article'}
-        url = RIC_BASE_URL + 'get_all_neighbor_nodes'
-        response = requests.get(url, params=params)
-        # response.raise_for_status()
-        return response.json().get("results", [])
-
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person IDs for person-root {persoonroot_key}: {e}")
-        return []
-
-
 def select_persons_researchoutput(selected_faculties):
     persons = []
+    ricgraph = get_ricgraph_client()
 
 
     for faculty in selected_faculties:
         logging.info(f"Processing faculty: {faculty}")
-        personroots = fetch_personroots(faculty)
+        personroots = ricgraph.personroots(faculty, max_nr_items='100')
         new_data = []
 
         for personroot in personroots:
@@ -300,7 +219,7 @@ def select_persons_researchoutput(selected_faculties):
             if not personroot['_key'] == None:
                 personroot_key = personroot['_key']
 
-                outputs = select_researchoutputs(personroot_key)
+                outputs = ricgraph.research_outputs(personroot_key)
                 for output in outputs:
                     doi = 'doi.org/' + output["_key"].split("|")[0]
 
@@ -320,23 +239,35 @@ def mainproces(doi, test_choice):
 
 
 
-def main(faculty_choice, test_choice):
+def process_dois(dois, shard, test_choice):
+    """
+    Matches the authors of the research outputs with these DOIs in OpenAlex and Pure and adds
+    the ids to the external persons. Also runs a shard of a sharded run in a worker process
+    (see sharding.run_sharded).
+    """
+    number = 0
+    for doi in dois:
+        number = number + 1
+        mainproces(doi, test_choice)
+    return {'processed': number}
+
+
+def main(faculty_choice, test_choice, processes=1):
 
     logging.info(f"start fetching person-roots for {faculty_choice}")
     logging.info(f"Test run =  {test_choice}")
-    faculties = select_faculties(faculty_choice)
+    faculties = get_ricgraph_client().select_faculties(faculty_choice)
     researchoutputs = select_persons_researchoutput(faculties)
 
 
     # Loop through each DOI and check if persons can be updated
-    # Get the number of entries
-    # Get the number of elements in the list
-    num_elements = len(researchoutputs)
     logging.info(f"total research output with external persons selected:  {len(researchoutputs)}")
-    number  = 0
-    for doi in researchoutputs:
-        number = number + 1
-        mainproces(doi, test_choice)
+    if processes > 1:
+        shards = sharding.split(researchoutputs, processes)
+        counts = sharding.merge_counts(sharding.run_sharded(process_dois, shards, processes, test_choice))
+    else:
+        counts = process_dois(researchoutputs, None, test_choice)
+    logging.info(f"total research output processed:  {counts.get('processed', 0)}")
 
 # ########################################################################
 # MAIN
@@ -347,7 +278,13 @@ if __name__ == '__main__':
                         default='uu faculty: information & technology services|organization_name',
                         help='Faculty choice or "all"')
     parser.add_argument('test_choice', type=str, nargs='?', default='yes', help='Run in test mode ("yes" or "no")')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Number of processes the DOIs are sharded over (1 => no sharding)')
+    parser.add_argument('--snapshot', type=str, nargs='?', const=RICGRAPH_SNAPSHOT_PATH, default=None,
+                        help='Read Ricgraph from the snapshot taken with ricgraph_snapshot.py (optionally its path)')
 
     args = parser.parse_args()
+    if args.snapshot:
+        ricgraph_snapshot.use_snapshot(args.snapshot)
 
-    main(args.faculty_choice, args.test_choice)
+    main(args.faculty_choice, args.test_choice, args.processes)
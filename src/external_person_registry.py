@@ -0,0 +1,226 @@
+# ########################################################################
+#
+# External person registry - finds or creates the external person in Pure
+# for a co-author, so the same co-author is created only once
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+import requests
+from local_store import PersistentMap
+from person_index import EXTERNAL_PERSONS, extract_identifiers, get_person_index, normalize_identifier
+from pure_client import get_client
+from config import CACHE_DIR, ORCID_ID_URI, OPENALEX_ID_URI
+
+# identifiers that identify a co-author on their own, with the pattern of a valid (normalized) value
+KEY_IDENTIFIERS = {
+    'orcid': re.compile(r'^\d{4}-\d{4}-\d{4}-\d{3}[\dX]$'),
+    'openalex': re.compile(r'^A\d+$'),
+}
+# type and term of these identifiers on a new external person (as in enrich_pure_external_persons.py)
+IDENTIFIER_TYPES = {
+    'orcid': (ORCID_ID_URI, 'ORCID'),
+    'openalex': (OPENALEX_ID_URI, 'Open Alex id'),
+}
+# seconds after which the claim of a worker that did not finish creating an external person is taken over
+CLAIM_TIMEOUT = 300
+CLAIM_POLL_INTERVAL = 0.1
+
+
+def normalize_person_name(first_name, last_name):
+    """'Jan ', 'de  Vries' => 'jan de vries': unicode normalized, case folded and with single spaces."""
+    name = ' '.join(part for part in (first_name, last_name) if isinstance(part, str))
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+
+
+def key_identifiers(person_ids):
+    """Returns {'orcid': <id>, 'openalex': <id>} with the valid, normalized ORCID and OpenAlex id of a co-author."""
+    ids = {str(id_type).lower(): id_value for id_type, id_value in (person_ids or {}).items()}
+    identifiers = {}
+    for kind, pattern in KEY_IDENTIFIERS.items():
+        value = normalize_identifier(ids.get(kind))
+        if pattern.match(value):
+            identifiers[kind] = value
+    return identifiers
+
+
+def registry_key(first_name, last_name, person_ids=None):
+    """
+    Returns the registry key of a co-author: 'orcid:<id>' or 'openalex:<id>' if the co-author has
+    a valid ORCID or OpenAlex id, else 'name:<normalized name>'. Returns None without name and ids.
+    """
+    identifiers = key_identifiers(person_ids)
+    if identifiers:
+        kind, value = next(iter(identifiers.items()))
+        return f"{kind}:{value}"
+    return name_key(first_name, last_name)
+
+
+def name_key(first_name, last_name):
+    """Returns the registry key 'name:<normalized name>' of a co-author, or None without name."""
+    name = normalize_person_name(first_name, last_name)
+    return f"name:{name}" if name else None
+
+
+def external_person_json(first_name, last_name, person_ids=None):
+    """Returns the body of the PUT that creates an external person, with its ORCID and OpenAlex id."""
+    data = {"name": {"firstName": first_name, "lastName": last_name}}
+    identifiers = []
+    for kind, value in key_identifiers(person_ids).items():
+        uri, term = IDENTIFIER_TYPES[kind]
+        identifiers.append({
+            "typeDiscriminator": "ClassifiedId",
+            "id": value,
+            "type": {"uri": uri, "term": {"en_GB": term}}
+        })
+    if identifiers:
+        data["identifiers"] = identifiers
+    return data
+
+
+class ExternalPersonRegistry:
+    """
+    Registry of the external persons created for co-authors, persisted between runs.
+
+    For a co-author that is not yet in the registry, existing external persons are looked up first
+    (in the local person index, then with a search in Pure on identifier and on name) and a new
+    external person, with the ORCID and OpenAlex id of the co-author, is only created if there is none.
+    The worker that looks up and creates a key first claims it in the shared store, so concurrent
+    workers in all processes that meet the same co-author wait for it and create one external person.
+    """
+
+    def __init__(self, client=None, store=None):
+        self.client = client or get_client()
+        # an empty PersistentMap is falsy, so compare with None
+        if store is None:
+            store = PersistentMap(os.path.join(CACHE_DIR, 'lookups.sqlite'), 'external_person')
+        self.store = store
+
+    def find_in_index(self, key):
+        kind, value = key.split(':', 1)
+        index = get_person_index()
+        if not index or kind == 'name':
+            return None
+        uuids = index.lookup(value, EXTERNAL_PERSONS)
+        return uuids[0] if len(uuids) == 1 else None
+
+    def search(self, key, first_name, last_name, person_ids=None):
+        """
+        Searches Pure for an external person with the identifier or (normalized) name of the key.
+        On a name key, persons with another ORCID or OpenAlex id than the co-author are not matched.
+        """
+        kind, value = key.split(':', 1)
+        own_ids = key_identifiers(person_ids)
+        search_string = value if kind != 'name' else ' '.join(part for part in (first_name, last_name) if part)
+        try:
+            response = self.client.post('external-persons/search/', data=json.dumps({"searchString": search_string}))
+        except requests.RequestException as e:
+            logging.error(f"An error occurred while searching external person {search_string}: {e}")
+            return None
+        if response.status_code != 200:
+            logging.error(f"Error searching external person {search_string}: {response.status_code} - {response.text}")
+            return None
+
+        for item in response.json().get('items', []):
+            if kind == 'name':
+                name = item.get('name', {})
+                item_ids = extract_identifiers(item)
+                matches = normalize_person_name(name.get('firstName'), name.get('lastName')) == value and not any(
+                    KEY_IDENTIFIERS[id_kind].match(item_id) and item_id != own_ids[id_kind]
+                    for id_kind in own_ids for item_id in item_ids)
+            else:
+                matches = value in extract_identifiers(item)
+            if matches and item.get('uuid'):
+                return item['uuid']
+        return None
+
+    def create(self, first_name, last_name, person_ids=None):
+        """Creates an external person (with its ORCID and OpenAlex id) in Pure and returns its uuid, or None."""
+        data = external_person_json(first_name, last_name, person_ids)
+        try:
+            response = self.client.put('external-persons/', data=json.dumps(data))
+            if response.status_code in [200, 201]:
+                return response.json().get('uuid')
+            logging.error(f"Error creating external person: {response.status_code} - {response.text}")
+        except requests.RequestException as e:
+            logging.error(f"An error occurred while creating external person: {e}")
+        return None
+
+    def get_or_create(self, first_name, last_name, person_ids=None):
+        """
+        Returns the uuid of the external person for this co-author: from the registry, an existing
+        external person in Pure, or a newly created one. Returns None if creating it failed.
+        """
+        key = registry_key(first_name, last_name, person_ids)
+        if key is None:
+            return self.create(first_name, last_name, person_ids)
+
+        uuid = self.store.get(key)
+        if uuid:
+            return uuid
+
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        while not self.store.claim(key, owner, CLAIM_TIMEOUT):
+            # another worker is looking up or creating this co-author
+            time.sleep(CLAIM_POLL_INTERVAL)
+            uuid = self.store.get(key)
+            if uuid:
+                return uuid
+        try:
+            # the other worker may have stored it between the get and the claim
+            uuid = self.store.get(key)
+            if uuid:
+                return uuid
+
+            uuid = self.find_in_index(key) or self.search(key, first_name, last_name, person_ids)
+            fallback = name_key(first_name, last_name)
+            if not uuid and fallback and fallback != key:
+                # the external person may exist without this id, e.g. created before ids were sent
+                uuid = self.search(fallback, first_name, last_name, person_ids)
+            if uuid:
+                logging.info(f"Existing external person {uuid} found for {key}")
+            else:
+                uuid = self.create(first_name, last_name, person_ids)
+                if uuid:
+                    logging.info(f"Created external person {uuid} for {key}")
+            if uuid:
+                self.store.set(key, uuid)
+            return uuid
+        finally:
+            self.store.release(key, owner)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Returns the ExternalPersonRegistry of this process."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ExternalPersonRegistry()
+        return _registry
+
+
+def create_external_person(first_name, last_name, person_ids=None):
+    """
+    Returns the uuid of the external person in Pure for a co-author, creating it only if the
+    registry and Pure do not have one yet.
+
+    :param first_name, last_name:  first and last names.
+    :param person_ids: dict of identifiers of the co-author (ORCID and OpenAlex ids are used as key).
+    :return: UUID of the (existing or newly created) external person, or None.
+    """
+    return get_registry().get_or_create(first_name, last_name, person_ids)
@@ -0,0 +1,105 @@
+# ########################################################################
+#
+# Http session - pooled, rate limited requests sessions for all external
+# apis (Pure, Ricgraph, OpenAlex, DataCite)
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import logging
+import threading
+import requests
+import rate_limiter
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import RATE_LIMITS
+
+rate_limiter.configure(RATE_LIMITS)
+
+THROTTLE_STATUSES = (429, 503)
+# methods that are retried; a PUT can create an entity in Pure, so retrying it after Pure committed the
+# entity would create a duplicate. Search calls in Pure are read-only POSTs.
+RETRY_METHODS = ("HEAD", "GET", "OPTIONS", "POST")
+# methods retried by a session for updates: a PUT to the uuid of an existing entity can be repeated safely
+UPDATE_RETRY_METHODS = RETRY_METHODS + ("PUT",)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that takes a token from the per-host bucket before every request.
+
+    A 429 or 503 response slows the bucket down, honors the Retry-After header and is retried
+    up to `throttle_retries` times (only for `retry_methods`). Other transient errors are retried by urllib3.
+    """
+
+    def __init__(self, throttle_retries=5, retry_methods=RETRY_METHODS, **kwargs):
+        self.throttle_retries = throttle_retries
+        self.retry_methods = retry_methods
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        bucket = rate_limiter.get_bucket(request.url)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            response = super().send(request, **kwargs)
+            retryable = request.method in self.retry_methods and attempt < self.throttle_retries
+            if response.status_code not in THROTTLE_STATUSES or not retryable:
+                if response.status_code not in THROTTLE_STATUSES:
+                    bucket.recover()
+                else:
+                    bucket.throttle(rate_limiter.parse_retry_after(response.headers.get('Retry-After')))
+                return response
+            retry_after = rate_limiter.parse_retry_after(response.headers.get('Retry-After'))
+            logging.warning(f"{response.status_code} from {request.url}, slowing down (retry after: {retry_after})")
+            bucket.throttle(retry_after)
+            response.close()
+            attempt += 1
+
+
+def make_session(headers=None, pool_size=10, max_retries=5, backoff_factor=1, retry_methods=RETRY_METHODS):
+    """
+    Returns a requests.Session with a connection pool of pool_size that goes through the rate limiter.
+
+    Parameters:
+    - headers (dict, optional): Headers sent with every request of the session.
+    - pool_size (int): Number of connections kept alive per host.
+    - max_retries (int): Number of retries for 429/503 responses and for other transient errors.
+    - backoff_factor (float): Backoff factor between retries of transient errors (1 => 1s, 2s, 4s, ...).
+    - retry_methods (tuple): Methods that are retried; UPDATE_RETRY_METHODS for a session that only
+      updates existing entities.
+    """
+    session = requests.Session()
+    if headers:
+        session.headers.update(headers)
+
+    # connection errors are retried for every method (nothing was sent), read errors and 5xx responses
+    # only for retry_methods
+    retry_strategy = Retry(
+        total=max_retries,
+        status_forcelist=[500, 502, 504],
+        allowed_methods=list(retry_methods),
+        backoff_factor=backoff_factor
+    )
+    adapter = RateLimitedAdapter(throttle_retries=max_retries, retry_methods=retry_methods, pool_connections=pool_size,
+                                 pool_maxsize=pool_size, max_retries=retry_strategy)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the session shared by the calls to Ricgraph, OpenAlex and DataCite of this process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
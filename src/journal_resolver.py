@@ -0,0 +1,145 @@
+# ########################################################################
+#
+# Journal resolver - resolves an ISSN (ISSN, eISSN or ISSN-L) to the uuid
+# of the journal in Pure, using a persisted ISSN index
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+#
+# Usage
+#
+#   python journal_resolver.py      prefetches the ISSNs of all journals in Pure
+#
+# ########################################################################
+
+import json
+import logging
+import os
+import re
+import threading
+import requests
+from local_store import PersistentMap
+from logging_config import setup_logging
+from pure_client import get_client, PureLookupError
+from config import CACHE_DIR, JOURNAL_INDEX_MAX_AGE, JOURNAL_PREFETCH
+
+ISSN_KEYS = ('issns', 'eissns', 'eIssns', 'electronicIssns', 'additionalSearchableIssns')
+
+
+def normalize_issn(issn):
+    """'1234567x', '1234-567X ' => '1234-567X'; returns '' for anything that is not an ISSN."""
+    if not issn or not isinstance(issn, str):
+        return ''
+    compact = re.sub(r'[^0-9Xx]', '', issn).upper()
+    if len(compact) != 8:
+        return ''
+    return f"{compact[:4]}-{compact[4:]}"
+
+
+def journal_issns(item):
+    """Returns all normalized ISSNs (print, electronic, linking) of a Pure journal record."""
+    values = []
+    for key in ISSN_KEYS:
+        for entry in item.get(key, []) or []:
+            values.append(entry.get('issn') or entry.get('value') if isinstance(entry, dict) else entry)
+    for key in ('issn', 'eissn', 'issnL'):
+        if isinstance(item.get(key), str):
+            values.append(item[key])
+    return {issn for issn in (normalize_issn(value) for value in values) if issn}
+
+
+class JournalResolver:
+    """
+    Resolves ISSNs to Pure journal uuids with an in-memory index that is persisted between runs.
+
+    The index is filled lazily (every journal returned by a search adds all its ISSNs) or in bulk
+    with prefetch(). Only exact ISSN matches are returned; ISSNs without a journal in Pure are
+    remembered for the rest of the run only, since the journal may be added to Pure later.
+    """
+
+    def __init__(self, client=None, store=None):
+        self.client = client or get_client()
+        # an empty PersistentMap is falsy, so compare with None
+        if store is None:
+            store = PersistentMap(os.path.join(CACHE_DIR, 'lookups.sqlite'), 'journal_issn', JOURNAL_INDEX_MAX_AGE)
+        self.store = store
+        self._missing = set()
+        self._lock = threading.Lock()
+
+    def add_journal(self, item):
+        uuid = item.get('uuid')
+        issns = journal_issns(item)
+        if uuid and issns:
+            self.store.set_many((issn, uuid) for issn in issns if issn not in self.store)
+        return issns
+
+    def prefetch(self):
+        """Adds the ISSNs of all journals in Pure to the index."""
+        count = 0
+        for item in self.client.iter_search('journals/search/', {}):
+            self.add_journal(item)
+            count += 1
+        logging.info(f"Journal index: prefetched {count} journals, {len(self.store)} ISSNs")
+
+    def resolve(self, issn, strict=False):
+        """
+        Returns the uuid of the journal with this ISSN, or None. With strict a failed search raises
+        PureLookupError instead of returning None.
+        """
+        key = normalize_issn(issn)
+        if not key:
+            return None
+        found, uuid = self.store.lookup(key)
+        if found:
+            return uuid
+        with self._lock:
+            if key in self._missing:
+                return None
+
+        uuid = None
+        try:
+            response = self.client.post('journals/search/', data=json.dumps({"searchString": key}))
+            if response.status_code == 200:
+                for item in response.json().get('items', []):
+                    if key in self.add_journal(item) and uuid is None:
+                        uuid = item.get('uuid')
+            else:
+                logging.error(f"Error searching journal {key}: {response.status_code} - {response.text}")
+                if strict:
+                    raise PureLookupError(f"journal lookup of {key} failed: {response.status_code}")
+                return None
+        except requests.RequestException as e:
+            logging.error(f"An error occurred while searching journal {key}: {e}")
+            if strict:
+                raise PureLookupError(f"journal lookup of {key} failed: {e}") from e
+            return None
+
+        if uuid is None:
+            logging.info(f"No journal in Pure with ISSN {key}")
+            with self._lock:
+                self._missing.add(key)
+        return uuid
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """Returns the JournalResolver of this process; the first call prefetches all journals if [JOURNALS] Prefetch is set."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = JournalResolver()
+            if JOURNAL_PREFETCH:
+                _resolver.prefetch()
+        return _resolver
+
+
+if __name__ == '__main__':
+    logger = setup_logging('journal_resolver', level=logging.INFO)
+    JournalResolver().prefetch()
@@ -0,0 +1,114 @@
+# ########################################################################
+#
+# Local store - small persistent key/value maps (journals, publishers,
+# external persons, ...) shared between runs and processes
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import json
+import threading
+import time
+from response_cache import open_database
+
+
+class PersistentMap:
+    """
+    Map kept in memory and written through to a sqlite table, so it survives between runs.
+
+    Entries written by other processes are picked up on a miss. Entries older than max_age
+    seconds are treated as missing. claim() and release() let one worker (thread or process)
+    compute the value of a key while the others wait for it.
+
+    Parameters:
+    - path (str): Location of the sqlite database (several maps can share one database).
+    - namespace (str): Name of this map within the database.
+    - max_age (float, optional): Maximum age of an entry in seconds. None => entries do not expire.
+    """
+
+    def __init__(self, path, namespace, max_age=None):
+        self.namespace = namespace
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = open_database(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                         'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, updated REAL NOT NULL, '
+                         'PRIMARY KEY (namespace, key))')
+        self._db.execute('CREATE TABLE IF NOT EXISTS claims ('
+                         'namespace TEXT NOT NULL, key TEXT NOT NULL, owner TEXT NOT NULL, claimed REAL NOT NULL, '
+                         'PRIMARY KEY (namespace, key))')
+        self._data = {}
+        for key, value, updated in self._db.execute('SELECT key, value, updated FROM entries WHERE namespace = ?',
+                                                    (namespace,)):
+            self._data[key] = (json.loads(value), updated)
+
+    def _fresh(self, updated):
+        return self.max_age is None or updated + self.max_age > time.time()
+
+    def lookup(self, key):
+        """Returns (True, value) if key is in the map (and not expired), else (False, None)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or not self._fresh(entry[1]):
+                row = self._db.execute('SELECT value, updated FROM entries WHERE namespace = ? AND key = ?',
+                                       (self.namespace, key)).fetchone()
+                if row:
+                    entry = self._data[key] = (json.loads(row[0]), row[1])
+        if entry and self._fresh(entry[1]):
+            return True, entry[0]
+        return False, None
+
+    def get(self, key, default=None):
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def __contains__(self, key):
+        return self.lookup(key)[0]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        now = time.time()
+        rows = [(self.namespace, key, json.dumps(value), now) for key, value in items]
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO entries (namespace, key, value, updated) VALUES (?, ?, ?, ?)',
+                                 rows)
+            for _, key, value, updated in rows:
+                self._data[key] = (json.loads(value), updated)
+
+    def claim(self, key, owner, timeout):
+        """
+        Claims key for owner; returns True if the claim was taken, False if another owner holds it.
+        A claim older than timeout seconds (of a worker that crashed) is taken over.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute('DELETE FROM claims WHERE namespace = ? AND key = ? AND claimed < ?',
+                             (self.namespace, key, now - timeout))
+            cursor = self._db.execute('INSERT OR IGNORE INTO claims (namespace, key, owner, claimed) VALUES (?, ?, ?, ?)',
+                                      (self.namespace, key, owner, now))
+            return cursor.rowcount == 1
+
+    def release(self, key, owner):
+        with self._lock:
+            self._db.execute('DELETE FROM claims WHERE namespace = ? AND key = ? AND owner = ?',
+                             (self.namespace, key, owner))
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM entries WHERE namespace = ?', (self.namespace,))
+            self._data.clear()
@@ -0,0 +1,196 @@
+# ########################################################################
+#
+# OpenAlex client - looks up OpenAlex works by DOI, up to 50 DOIs per
+# request with the doi filter of the works endpoint
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from http_session import get_session
+from doi_utils import normalize_doi
+from doi_cache import OPENALEX, NOT_CACHED, get_doi_cache
+from config import OPENALEX_BASE_URL, OPENALEX_HEADERS, OPENALEX_WORKERS
+
+# maximum number of DOIs in one filter (and the page size, so one page holds all works of a batch)
+BATCH_SIZE = 50
+NOT_FOUND = 'not found in OpenAlex'
+
+# the fields of a work read by openalex_utils.transform_openalex_to_df; only these are downloaded
+WORK_FIELDS = ('id', 'doi', 'title', 'type', 'language', 'publication_date', 'open_access', 'authorships',
+               'keywords', 'primary_location')
+
+
+def batches(items, size=BATCH_SIZE):
+    """Splits items in lists of at most size items, keeping their order."""
+    items = list(items)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def cache_source(select):
+    """Source of the works in the DOI cache; works downloaded with another projection are cached apart."""
+    return f"{OPENALEX}?select={','.join(select)}" if select else OPENALEX
+
+
+def filterable(doi):
+    # ',' separates filters and '|' the values of a filter, so these DOIs are looked up one by one
+    return ',' not in doi and '|' not in doi
+
+
+class OpenAlexClient:
+    """
+    Client for the works endpoint of OpenAlex on the pooled, rate limited session of http_session.
+
+    works() looks up BATCH_SIZE DOIs per request with filter=doi:a|b|c and maps the works OpenAlex
+    returns back to the DOIs asked for, so a faculty with thousands of DOIs costs 50 times fewer requests.
+    Works found are kept in the DOI cache (if given) and DOIs in the cache are not downloaded again.
+    The batches are fetched by `workers` threads; the requests per second to OpenAlex are capped by
+    the rate limiter of the session ([RATE-LIMITS] or [OPENALEX_PURE] RequestsPerSecond).
+
+    Parameters:
+    - base_url (str): Url of the works endpoint ('https://api.openalex.org/works/'). Defaults to OPENALEX_BASE_URL.
+    - session (requests.Session, optional): Session used for the requests.
+    - headers (dict): Headers of the requests, with the mailto of the polite pool.
+    - select (tuple): Fields of the works that are downloaded (select=...); None => whole works.
+    - cache (DoiCache, optional): Cache of the works (with source cache_source(select)). None => not cached.
+    - workers (int): Number of requests in flight at the same time.
+    """
+
+    def __init__(self, base_url=OPENALEX_BASE_URL, session=None, headers=OPENALEX_HEADERS, select=WORK_FIELDS,
+                 cache=None, workers=OPENALEX_WORKERS):
+        self.base_url = base_url
+        self.session = session or get_session()
+        self.headers = headers
+        self.select = select
+        self.cache = cache
+        self.workers = workers
+
+    def map(self, fetch, items):
+        """Returns [fetch(item) for item in items], fetched by self.workers threads."""
+        if self.workers <= 1 or len(items) <= 1:
+            return [fetch(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(fetch, items))
+
+    def get(self, url, params=None):
+        """Returns (json, None) of an OpenAlex request, or (None, error) when it fails."""
+        params = dict(params or {})
+        if self.select:
+            params['select'] = ','.join(self.select)
+        try:
+            response = self.session.get(url, params=params, headers=self.headers)
+        except requests.RequestException as e:
+            return None, f'OpenAlex error: {e}'
+        if response.status_code == 404:
+            return None, NOT_FOUND
+        if response.status_code != 200:
+            return None, f'OpenAlex status {response.status_code}'
+        try:
+            return response.json(), None
+        except ValueError as e:
+            return None, f'OpenAlex error: {e}'
+
+    def work(self, doi):
+        """Returns (work, error) of a single DOI."""
+        return self.get(self.base_url + 'doi.org/' + normalize_doi(doi))
+
+    def batch(self, dois):
+        """
+        Looks up at most BATCH_SIZE DOIs in one request.
+
+        Returns:
+        - dict: normalized DOI => (work, error) for every DOI asked for; error is NOT_FOUND for
+          DOIs OpenAlex has no work for.
+        """
+        keys = list(dict.fromkeys(normalize_doi(doi) for doi in dois))
+        params = {'filter': 'doi:' + '|'.join(keys), 'per-page': BATCH_SIZE}
+        data, error = self.get(self.base_url.rstrip('/'), params)
+        if error:
+            return {key: (None, error) for key in keys}
+
+        found = {}
+        for work in data.get('results', []):
+            key = normalize_doi(work.get('doi'))
+            if key in keys and key not in found:
+                found[key] = (work, None)
+        return {key: found.get(key, (None, NOT_FOUND)) for key in keys}
+
+    def works(self, dois):
+        """
+        Looks up the works of DOIs ('10.1234/abc', 'doi.org/10.1234/abc', 'https://doi.org/...').
+
+        Returns:
+        - list: (doi, work, error) for every DOI, in the order of dois. work is None if the DOI was not
+          found (error NOT_FOUND), the request failed (error describes the failure) or it is not in the
+          cache in offline mode (error NOT_CACHED).
+        """
+        return list(self.iter_works(dois))
+
+    def iter_works(self, dois):
+        """
+        Yields (doi, work, error) for every DOI in the order of dois, like works(), while the works arrive.
+        The DOIs are looked up in chunks of `workers` batches, so only one chunk of works is in memory.
+        """
+        dois = list(dois)
+        chunk_size = BATCH_SIZE * max(self.workers, 1)
+        found = cached = requests_made = 0
+        for start in range(0, len(dois), chunk_size):
+            chunk = dois[start:start + chunk_size]
+            results, chunk_cached, chunk_requests = self.lookup(chunk)
+            cached += chunk_cached
+            requests_made += chunk_requests
+            for doi in chunk:
+                work, error = results[normalize_doi(doi)]
+                found += work is not None
+                yield doi, work, error
+        logging.info(f"OpenAlex: {found} of {len(dois)} DOIs found, "
+                     f"{cached} from the cache and the others in {requests_made} requests")
+
+    def lookup(self, dois):
+        """Returns (normalized DOI => (work, error), number of DOIs from the cache, number of requests)."""
+        results = {}
+        if self.cache is not None:
+            for doi in dois:
+                found, work = self.cache.lookup(doi)
+                if found:
+                    results[normalize_doi(doi)] = (work, None)
+        cached = len(results)
+        if self.cache is not None and self.cache.offline:
+            for doi in dois:
+                results.setdefault(normalize_doi(doi), (None, NOT_CACHED))
+
+        missing = list(dict.fromkeys(normalize_doi(doi) for doi in dois if normalize_doi(doi) not in results))
+        parts = batches(key for key in missing if filterable(key))
+        for result in self.map(self.batch, parts):
+            results.update(self.store(result))
+        singles = [key for key in missing if not filterable(key)]
+        results.update(self.store(dict(zip(singles, self.map(self.work, singles)))))
+        return results, cached, len(parts) + len(singles)
+
+    def store(self, results):
+        """Adds the works found to the cache; returns results."""
+        if self.cache is not None:
+            for key, (work, error) in results.items():
+                if work is not None:
+                    self.cache.set(key, work)
+        return results
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openalex_client():
+    """Returns the OpenAlexClient of this process."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAlexClient(cache=get_doi_cache(cache_source(WORK_FIELDS)))
+        return _client
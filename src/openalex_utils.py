@@ -1,6 +1,9 @@
 import pandas as pd
 import json
+import gzip
+from functools import lru_cache
 from nameparser import HumanName
+from nameparser.config import CONSTANTS
 from datetime import datetime
 import pathlib
 # import ricgraph as rcg
@@ -8,7 +11,8 @@ import requests
 import configparser
 import os
 import logging
-from config import DEFAULTS
+from openalex_client import get_openalex_client
+from config import DEFAULTS, OPENALEX_HARVEST_COMPRESS, OPENALEX_NAME_MEMO_SIZE
 
 
 
@@ -52,32 +56,56 @@ from config import DEFAULTS
 #     'report': rcg.ROTYPE_REPORT
 # }
 
-def get_jsons_from_open_alex(dois):
-    OPENALEX_HEADERS = {'Accept': 'application/json',
-                        # The following will be read in __main__
-                        'User-Agent': 'mailto:d.h.j.grotebeverborg@uu.nl'
-                        }
-    OPENALEX_MAX_RECS_TO_HARVEST = 1
-    all_responses = []
-
-
-    for item in dois:
-        doi = 'doi.org/'  +  item
-        url = 'https://api.openalex.org/works/' + doi
-        try:
-            response = requests.get(url, headers=OPENALEX_HEADERS)
-            if response.status_code == 200:
-                all_responses.append(response.json())
-            else:
-                print(f"Failed to retrieve data for DOI {item}. Status code: {response.status_code}")
-        except requests.exceptions.RequestException as e:
-            print(f"An error occurred while fetching data for DOI {item}: {e}")
+def harvest_path(name):
+    """Returns the file name of a harvest: <name>.jsonl, or <name>.jsonl.gz if [OPENALEX_PURE] CompressHarvest is set."""
+    return name + ('.jsonl.gz' if OPENALEX_HARVEST_COMPRESS else '.jsonl')
+
+
+def open_harvest(path, mode='r'):
+    """Opens a harvest file for reading ('r') or writing ('w'); gzip compressed if path ends with .gz."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def write_harvest(works, path):
+    """Writes works to a harvest file, one json object per line, while they arrive; returns the number written."""
+    count = 0
+    with open_harvest(path, 'w') as f:
+        for work in works:
+            f.write(json.dumps(work, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def read_harvest(path):
+    """Yields the works of a harvest file one by one."""
+    with open_harvest(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
 
-    # Write all responses to a JSON file
-    with open('all_responses.json', 'w', encoding='utf-8') as f:
-        json.dump(all_responses, f, ensure_ascii=False, indent=4)
+def get_jsons_from_open_alex(dois, path=None):
+    """
+    Fetches the works of the DOIs from OpenAlex into the harvest file path (all_responses.jsonl by default).
 
-    return all_responses
+    Returns:
+    - generator: the works, read lazily from the harvest file (see read_harvest); iterate it once,
+      e.g. with iter_openalex_records or iter_openalex_chunks, instead of indexing it like a list.
+    """
+    path = path or harvest_path('all_responses')
+
+    def found_works():
+        # up to 50 DOIs per request, see openalex_client
+        for item, work, error in get_openalex_client().iter_works(dois):
+            if work is not None:
+                yield work
+            else:
+                print(f"Failed to retrieve data for DOI {item}: {error}")
+
+    write_harvest(found_works(), path)
+    return read_harvest(path)
 
 def extract_journal_issn(publication):
     primary_location = publication.get('primary_location', {})
@@ -101,57 +129,140 @@ def extract_open_access(open_access):
     return status
 
 
-def transform_openalex_to_df(openalex_data):
-    processed_publications = []
-    not_processed_publications = []
-
-    if not isinstance(openalex_data, list):
+# fields a publication needs to be transformed
+REQUIRED_FIELDS = ('title', 'type', 'doi', 'year', 'contributors')
+# number of records per DataFrame of iter_openalex_chunks
+CHUNK_SIZE = 1000
+
+
+class Rejects:
+    """Sink of the publications that are not transformed; keeps only their OpenAlex id and the reason."""
+
+    def __init__(self):
+        self.items = []
+
+    def add(self, publication_id, reason):
+        logging.info(f"Publication ID {publication_id} not processed. {reason}")
+        self.items.append((publication_id, reason))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def to_df(self):
+        return pd.DataFrame(self.items, columns=['id', 'reason'])
+
+
+# The fields read here are the ones downloaded from OpenAlex (openalex_client.WORK_FIELDS), add new ones there
+def transform_publication(publication):
+    """Returns (record, None) for an OpenAlex work, or (None, reason) if it misses required fields."""
+    title = publication.get('title')
+    print(title)
+    publication_date = publication.get('publication_date', '')
+    year, month, day = extract_date_components(publication_date)
+    values = {
+        'title': title,
+        'type': publication.get('type'),
+        'doi': publication.get('doi'),
+        'year': year,
+        'contributors': parse_contributors(publication.get('authorships', [])),
+    }
+    missing_fields = [field for field in REQUIRED_FIELDS if not values[field]]
+    if missing_fields:
+        return None, f"Missing fields: {' '.join(missing_fields)}"
+
+    return {
+        'research_output_id': publication.get('id', 'No id'),
+        'title': title,
+        'type': values['type'],
+        'peer_review': DEFAULTS['peer_review'],
+        'doi': values['doi'],
+        'publication_date': publication_date,
+        'submission_year': year,
+        'publication_year': year,
+        'publication_month': month,
+        'publication_day': day,
+        'contributors': values['contributors'],
+        'keywords': extract_keywords(publication),
+        'journal_issn': extract_journal_issn(publication),
+        'language_term': 'Undefined/Unknown',
+        'language_uri': DEFAULTS['language_uri'],
+        'visibility_key': DEFAULTS['visibility_key'],
+        'workflow_step': DEFAULTS['workflow_step']
+    }, None
+
+
+def iter_openalex_records(openalex_data, rejects=None):
+    """
+    Yields the records of the OpenAlex works that can be transformed, one at a time.
+
+    Parameters:
+    - openalex_data: a single work, or a list or generator (e.g. read_harvest) of works.
+    - rejects (Rejects, optional): receives the id and reason of the works that are not transformed.
+    """
+    if isinstance(openalex_data, dict):
         openalex_data = [openalex_data]
 
     for publication in openalex_data:
+        record, reason = transform_publication(publication)
+        if record is not None:
+            yield record
+        elif rejects is not None:
+            rejects.add(publication.get('id', 'Unknown'), reason)
+        else:
+            logging.info(f"Publication ID {publication.get('id', 'Unknown')} not processed. {reason}")
+
+
+def iter_openalex_chunks(openalex_data, chunk_size=CHUNK_SIZE, rejects=None):
+    """Yields the records of iter_openalex_records as DataFrames of at most chunk_size rows."""
+    chunk = []
+    for record in iter_openalex_records(openalex_data, rejects):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk)
 
-        title = publication.get('title')
-        print(title)
-        type = publication.get('type')
-        doi = publication.get('doi')
-        language = publication.get('language')
-        publication_date = publication.get('publication_date', '')
-        year, month, day = extract_date_components(publication_date)
-        open_access =  extract_open_access(publication.get('open_access'))
-        contributors = parse_contributors(publication.get('authorships', []))
-        keywords = extract_keywords(publication)
-        issn = extract_journal_issn(publication)
-        if not all([title, type, doi, year, contributors]):
-            reason = "Missing fields: "
-            missing_fields = [field for field in ["title", "type", "doi", "year", "contributors"] if not locals()[field]]
-            logging.info(f"Publication ID {publication.get('id', 'Unknown')} not processed. {reason}{' '.join(missing_fields)}")
-            not_processed_publications.append(publication)
-            continue
-
-        processed_publications.append({
-            'research_output_id': publication.get('id', 'No id'),
-            'title': title,
-            'type': type,
-            'peer_review': DEFAULTS['peer_review'],
-            'doi': doi,
-            'publication_date': publication_date,
-            'submission_year': year,
-            'publication_year': year,
-            'publication_month': month,
-            'publication_day': day,
-            'contributors': contributors,
-            'keywords': keywords,
-            'journal_issn': issn,
-            'language_term': 'Undefined/Unknown',
-            'language_uri': DEFAULTS['language_uri'],
-            'visibility_key': DEFAULTS['visibility_key'],
-            'workflow_step': DEFAULTS['workflow_step']
-        })
 
-    df_processed = pd.DataFrame(processed_publications)
-    df_not_processed = pd.DataFrame(not_processed_publications)
+def transform_openalex_to_df(openalex_data):
+    """
+    Transforms OpenAlex works to a DataFrame of research outputs.
+
+    Returns:
+    - tuple: (df_processed, df_not_processed); df_not_processed has the id and reason of the works
+      that are not transformed.
+    """
+    rejects = Rejects()
+    df_processed = pd.DataFrame(list(iter_openalex_records(openalex_data, rejects)))
+    return df_processed, rejects.to_df()
+
+def is_plain_name_part(part):
+    """True for a word that nameparser can only take as a first or last name (no title, prefix, suffix, ...)."""
+    word = part.lower()
+    return (len(part) > 1 and part.isalpha()
+            and word not in CONSTANTS.titles and word not in CONSTANTS.prefixes
+            and word not in CONSTANTS.conjunctions and word not in CONSTANTS.suffix_acronyms
+            and word not in CONSTANTS.suffix_not_acronyms
+            and not CONSTANTS.regexes.roman_numeral.match(part))
+
+
+@lru_cache(maxsize=OPENALEX_NAME_MEMO_SIZE)
+def split_name(name):
+    """
+    Returns (first name, last name) of an author display name, as nameparser.HumanName splits it.
+
+    A plain 'First Last' name is split without nameparser; the last OPENALEX_NAME_MEMO_SIZE names
+    are remembered, since the same authors recur in the works of a faculty.
+    """
+    parts = name.split(' ') if isinstance(name, str) else []
+    if len(parts) == 2 and is_plain_name_part(parts[0]) and is_plain_name_part(parts[1]):
+        return parts[0], parts[1]
+    human_name = HumanName(name)
+    return human_name.first, human_name.last
 
-    return df_processed, df_not_processed
 
 def parse_contributors(contributors):
     parsed_contributors = []
@@ -162,10 +273,8 @@ def parse_contributors(contributors):
         orcid = extract_orcid_id(author_details.get('orcid', ''))
         openalex_id = author_details.get('id', 'No OpenAlex ID')
 
-        # Parse the name using nameparser
-        human_name = HumanName(name)
-        first_name = human_name.first
-        last_name = human_name.last
+        # Parse the name using nameparser (memoized, see split_name)
+        first_name, last_name = split_name(name)
 
 
         # Create a dictionary of IDs
@@ -0,0 +1,179 @@
+# ########################################################################
+#
+# Person index - local index from identifiers (ORCID, Scopus, OpenAlex,
+# the ids in ID_URI) to the uuid of Pure persons and external persons
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+#
+# Usage
+#
+#   python person_index.py      (re)builds the index from Pure
+#
+# ########################################################################
+
+import json
+import logging
+import os
+import threading
+import time
+from pure_client import get_client
+from response_cache import open_database
+from logging_config import setup_logging
+from config import ID_URI, CACHE_DIR, PERSON_INDEX_ENABLED, PERSON_INDEX_MAX_AGE
+
+PERSONS = 'persons'
+EXTERNAL_PERSONS = 'external-persons'
+
+
+def normalize_identifier(value):
+    """
+    Normalizes an identifier for the index: url prefixes are removed and the id is upper cased,
+    so 'https://orcid.org/0000-0002-1825-009x' and '0000-0002-1825-009X' are the same key.
+    """
+    if value is None:
+        return ''
+    value = str(value).strip()
+    if '://' in value or value.lower().startswith(('orcid.org/', 'openalex.org/')):
+        value = value.rstrip('/').split('/')[-1]
+    return value.upper()
+
+
+def extract_identifiers(item):
+    """Returns the normalized identifiers of a Pure (external) person record."""
+    known_uris = set(ID_URI.values())
+    identifiers = set()
+    if item.get('orcid'):
+        identifiers.add(normalize_identifier(item['orcid']))
+    for entry in item.get('identifiers', []):
+        value = entry.get('id') or entry.get('value')
+        if not value:
+            continue
+        if entry.get('type', {}).get('uri') in known_uris or entry.get('idSource'):
+            identifiers.add(normalize_identifier(value))
+    identifiers.discard('')
+    return identifiers
+
+
+def reduce_record(item):
+    """Keeps the part of a person record that construct_person_detail needs (uuid, name and association periods)."""
+    return {
+        'uuid': item.get('uuid'),
+        'name': item.get('name', {}),
+        'staffOrganizationAssociations': [
+            {'period': assoc.get('period', {}), 'organization': {'uuid': assoc.get('organization', {}).get('uuid')}}
+            for assoc in item.get('staffOrganizationAssociations', [])
+        ]
+    }
+
+
+class PersonIndex:
+    """
+    Index from normalized identifier to person uuid, stored in a sqlite database.
+
+    The index is built once by paging through all Pure persons and external persons and can be
+    refreshed when it gets older than PERSON_INDEX_MAX_AGE. For every person the uuid, name and
+    raw association periods are kept, so person details can be constructed without calling Pure.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = open_database(path)
+        self._db.executescript(
+            'CREATE TABLE IF NOT EXISTS persons (uuid TEXT PRIMARY KEY, kind TEXT NOT NULL, record TEXT NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS identifiers (value TEXT NOT NULL, uuid TEXT NOT NULL, kind TEXT NOT NULL, '
+            'PRIMARY KEY (value, uuid));'
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);'
+        )
+
+    def built_at(self):
+        """Returns the time (epoch seconds) the index was last built, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'built_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def is_stale(self, max_age=PERSON_INDEX_MAX_AGE):
+        built_at = self.built_at()
+        return built_at is None or built_at + max_age < time.time()
+
+    def build(self, client=None, kinds=(PERSONS, EXTERNAL_PERSONS)):
+        """(Re)builds the index by paging through all persons and external persons in Pure."""
+        client = client or get_client()
+        for kind in kinds:
+            rows = []
+            identifiers = []
+            for item in client.iter_search(f'{kind}/search/', {}):
+                uuid = item.get('uuid')
+                if not uuid:
+                    continue
+                rows.append((uuid, kind, json.dumps(reduce_record(item))))
+                identifiers.extend((value, uuid, kind) for value in extract_identifiers(item))
+
+            with self._lock:
+                self._db.execute('BEGIN')
+                self._db.execute('DELETE FROM persons WHERE kind = ?', (kind,))
+                self._db.execute('DELETE FROM identifiers WHERE kind = ?', (kind,))
+                self._db.executemany('INSERT OR REPLACE INTO persons (uuid, kind, record) VALUES (?, ?, ?)', rows)
+                self._db.executemany('INSERT OR IGNORE INTO identifiers (value, uuid, kind) VALUES (?, ?, ?)', identifiers)
+                self._db.execute('COMMIT')
+            logging.info(f"Person index: {len(rows)} {kind}, {len(identifiers)} identifiers")
+
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built_at', ?)", (str(time.time()),))
+
+    def refresh(self, max_age=PERSON_INDEX_MAX_AGE):
+        """Rebuilds the index if it was never built or is older than max_age seconds."""
+        if self.is_stale(max_age):
+            logging.info("Person index is missing or stale, rebuilding it from Pure")
+            self.build()
+
+    def lookup(self, id_value, kind=PERSONS):
+        """Returns the uuids of the persons (of kind) that have this identifier."""
+        with self._lock:
+            rows = self._db.execute('SELECT uuid FROM identifiers WHERE value = ? AND kind = ?',
+                                    (normalize_identifier(id_value), kind)).fetchall()
+        return [row[0] for row in rows]
+
+    def record(self, uuid, kind=PERSONS):
+        """Returns the stored record (uuid, name, staffOrganizationAssociations) of a person, or None."""
+        with self._lock:
+            row = self._db.execute('SELECT record FROM persons WHERE uuid = ? AND kind = ?', (uuid, kind)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_person_index():
+    """
+    Returns the person index of this process if it is enabled and has been built, else None
+    (callers then fall back to searching Pure).
+    """
+    global _index
+    if not PERSON_INDEX_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = PersonIndex(os.path.join(CACHE_DIR, 'person_index.sqlite'))
+    return _index if _index.built_at() else None
+
+
+def refresh_person_index():
+    """Builds the person index if it is enabled and missing or stale (see PERSON_INDEX_MAX_AGE)."""
+    global _index
+    if not PERSON_INDEX_ENABLED:
+        return
+    with _index_lock:
+        if _index is None:
+            _index = PersonIndex(os.path.join(CACHE_DIR, 'person_index.sqlite'))
+    _index.refresh()
+
+
+if __name__ == '__main__':
+    logger = setup_logging('person_index', level=logging.INFO)
+    PersonIndex(os.path.join(CACHE_DIR, 'person_index.sqlite')).build()
@@ -0,0 +1,117 @@
+# ########################################################################
+#
+# Publisher resolver - resolves a publisher name to the uuid of the
+# publisher in Pure, using a persisted name index
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+#
+# Usage
+#
+#   python publisher_resolver.py      prefetches the names of all publishers in Pure
+#
+# ########################################################################
+
+import json
+import logging
+import os
+import threading
+import unicodedata
+import requests
+from local_store import PersistentMap
+from logging_config import setup_logging
+from pure_client import get_client
+from config import CACHE_DIR, DEFAULTS, PUBLISHER_INDEX_MAX_AGE, PUBLISHER_PREFETCH
+
+
+def normalize_publisher_name(name):
+    """'  Zenodo ', 'ZENODO' => 'zenodo': unicode normalized, case folded and with single spaces."""
+    if not name or not isinstance(name, str):
+        return ''
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+
+
+class PublisherResolver:
+    """
+    Resolves publisher names to Pure publisher uuids with an in-memory map that is persisted between runs.
+
+    Names are matched after normalization (see normalize_publisher_name). A name without a publisher
+    in Pure is stored as well and resolves to the default publisher (DEFAULTS['publisher']), so the
+    handful of publishers that dominate DataCite imports are searched only once.
+    """
+
+    def __init__(self, client=None, store=None):
+        self.client = client or get_client()
+        # an empty PersistentMap is falsy, so compare with None
+        if store is None:
+            store = PersistentMap(os.path.join(CACHE_DIR, 'lookups.sqlite'), 'publisher_name', PUBLISHER_INDEX_MAX_AGE)
+        self.store = store
+
+    def add_publisher(self, item):
+        uuid = item.get('uuid')
+        key = normalize_publisher_name(item.get('name'))
+        if uuid and key and self.store.get(key) is None:
+            self.store.set(key, uuid)
+        return key
+
+    def prefetch(self):
+        """Adds the names of all publishers in Pure to the map."""
+        count = 0
+        for item in self.client.iter_search('publishers/search/', {}):
+            self.add_publisher(item)
+            count += 1
+        logging.info(f"Publisher index: prefetched {count} publishers")
+
+    def resolve(self, publisher):
+        """Returns the uuid of the publisher with this name, or the default publisher if there is none in Pure."""
+        key = normalize_publisher_name(publisher)
+        if not key:
+            return DEFAULTS['publisher']
+        found, uuid = self.store.lookup(key)
+        if found:
+            return uuid or DEFAULTS['publisher']
+
+        data = {"searchString": publisher}
+        try:
+            response = self.client.post('publishers/search/', data=json.dumps(data))
+        except requests.RequestException as e:
+            logging.error(f"An error occurred while searching for publisher: {publisher}: {e}")
+            return None
+        if response.status_code != 200:
+            logging.error(f"Error searching for publisher {publisher}: {response.status_code} - {response.text}")
+            return DEFAULTS['publisher']
+
+        uuid = None
+        for item in response.json().get('items', []):
+            if self.add_publisher(item) == key and uuid is None:
+                uuid = item.get('uuid')
+
+        if uuid is None:
+            logging.info(f"No publisher in Pure named {publisher}, using the default publisher")
+            self.store.set(key, None)
+            return DEFAULTS['publisher']
+        return uuid
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """Returns the PublisherResolver of this process; the first call prefetches all publishers if [PUBLISHERS] Prefetch is set."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = PublisherResolver()
+            if PUBLISHER_PREFETCH:
+                _resolver.prefetch()
+        return _resolver
+
+
+if __name__ == '__main__':
+    logger = setup_logging('publisher_resolver', level=logging.INFO)
+    PublisherResolver().prefetch()
@@ -4,6 +4,7 @@ import logging
 from datetime import datetime
 import configparser
 import os
+import external_person_registry
 # Load configuration settings from config.ini
 config_path = 'config.ini'
 if not os.path.exists(config_path):
@@ -155,31 +156,14 @@ def get_pure_person_details(contributor, headers):
 
 def create_external_person(contributor, headers):
     """
-    Creates an external person in the Pure system.
+    Returns the uuid of the external person for a contributor (see external_person_registry).
 
-    :param contributor: A dictionary containing contributor's first and last names.
-    :param headers: Headers to be used for the API request.
-    :return: UUID of the newly created external person.
+    :param contributor: A dictionary containing contributor's first and last names (and optionally 'ids').
+    :param headers: Not used anymore, the registry uses the shared Pure client.
+    :return: UUID of the existing or newly created external person.
     """
-
-    url = "https://staging.research-portal.uu.nl/ws/api/external-persons"
-    # url = BASE_URL + '/external-persons'
-
-    data = {"name": {"firstName": contributor['first_name'], "lastName": contributor['last_name']}}
-    json_data = json.dumps(data)
-
-    try:
-        response = requests.put(url, headers=headers, data=json_data)
-
-        if response.status_code in [200, 201]:
-            external_person = response.json()
-            return external_person.get('uuid')
-        else:
-            logging.error(f"Error creating external person: {response.status_code} - {response.text}")
-    except requests.RequestException as e:
-        logging.error(f"An error occurred while creating external person: {e}")
-
-    return None
+    return external_person_registry.create_external_person(contributor['first_name'], contributor['last_name'],
+                                                           contributor.get('ids'))
 
 
 def get_contributors_details(contributors, headers, ref_date):
@@ -0,0 +1,237 @@
+# ########################################################################
+#
+# Pure async - asyncio client for the CRUD api of pure, used to resolve
+# all contributors of one output concurrently
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import asyncio
+import json
+import logging
+import aiohttp
+import pure_persons
+import rate_limiter
+from http_session import THROTTLE_STATUSES, RETRY_METHODS
+from pure_client import CachedResponse, PureLookupError, entity_type, get_cache
+from config import PURE_BASE_URL, PURE_HEADERS, PURE_ASYNC_CONCURRENCY, PURE_MAX_RETRIES, PURE_BACKOFF_FACTOR
+
+# a request times out with asyncio.TimeoutError, which is not an aiohttp.ClientError
+REQUEST_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class AsyncResponse:
+    """Minimal response object with the same attributes the sync code uses (status_code, text, json())."""
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncPureClient:
+    """
+    Asyncio client for the Pure CRUD api, to be used as an async context manager.
+
+    At most `concurrency` requests are in flight at the same time and every request takes a
+    token from the same per-host rate limiter as the sync PureClient. Requests that fail with
+    429 or a 5xx status are retried, except PUTs, which create entities; 429 and 503 also slow
+    the rate limiter down. Searches and writes use the same response cache as the sync PureClient;
+    the sqlite cache is read and written in a thread, so it does not block the event loop.
+    """
+
+    def __init__(self, base_url=PURE_BASE_URL, headers=None, concurrency=PURE_ASYNC_CONCURRENCY,
+                 max_retries=PURE_MAX_RETRIES, backoff_factor=PURE_BACKOFF_FACTOR, cache=None):
+        self.base_url = base_url
+        self.cache = cache if cache is not None else get_cache()
+        self.headers = headers or PURE_HEADERS
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        self._session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+
+    def url(self, path):
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return self.base_url + path.lstrip('/')
+
+    async def request(self, method, path, **kwargs):
+        url = self.url(path)
+        bucket = rate_limiter.get_bucket(url)
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await bucket.acquire_async()
+                async with self._session.request(method, url, **kwargs) as response:
+                    status = response.status
+                    text = await response.text()
+                    retry_after = rate_limiter.parse_retry_after(response.headers.get('Retry-After'))
+            if status in THROTTLE_STATUSES:
+                bucket.throttle(retry_after)
+            else:
+                bucket.recover()
+            retryable = method in RETRY_METHODS and attempt < self.max_retries
+            if status not in (429, 500, 502, 503, 504) or not retryable:
+                return AsyncResponse(status, text)
+            if status not in THROTTLE_STATUSES:
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+            attempt += 1
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        body = kwargs.get('json', kwargs.get('data'))
+        if self.cache:
+            cached = await asyncio.to_thread(self.cache.get, path, body)
+            if cached is not None:
+                return CachedResponse(cached)
+
+        response = await self.request('POST', path, **kwargs)
+        if self.cache and response.status_code == 200:
+            await asyncio.to_thread(self.cache.set, path, body, response.text)
+        return response
+
+    async def put(self, path, **kwargs):
+        response = await self.request('PUT', path, **kwargs)
+        if self.cache and response.status_code in [200, 201]:
+            await asyncio.to_thread(self.cache.invalidate, entity_type(path))
+        return response
+
+
+async def search_person_record(client, name, person_ids):
+    """
+    Async variant of pure_persons.search_person_record: same search order (uuid, identifiers, name),
+    but the requests are made through an AsyncPureClient. Returns (record, failed).
+    """
+    failed = False
+    if person_ids and 'uuid' in person_ids:
+        uuid = person_ids['uuid']
+        try:
+            response = await client.get('persons/' + uuid)
+            if response.status_code == 200:
+                logging.info(f"Person found with UUID: {uuid}")
+                return response.json(), failed
+        except REQUEST_ERRORS as e:
+            failed = True
+            logging.error(f"An error occurred while getting person {uuid}: {e!r}")
+
+    if person_ids:
+        for id_type, id_value in person_ids.items():
+            if id_type.lower() == 'orcid':
+                id_value = pure_persons.extract_orcid(id_value)
+            try:
+                response = await client.post('persons/search/', data=json.dumps({"searchString": id_value}))
+                if response.status_code == 200:
+                    items = response.json().get('items', [])
+                    if len(items) == 1:
+                        logging.info(f"Person found with {id_type}: {id_value}")
+                        return items[0], failed
+                    elif items:
+                        logging.warning(f"Multiple or no persons found for {id_type}, {id_value}")
+                else:
+                    failed = True
+                    logging.error(f"Error searching for {id_type}: {response.status_code} - {response.text}")
+            except REQUEST_ERRORS as e:
+                failed = True
+                logging.error(f"An error occurred while searching for {id_type}: {e!r}")
+
+    if name is not None:
+        try:
+            response = await client.post('persons/search/', data=json.dumps({"searchString": name}))
+            if response.status_code == 200:
+                items = response.json().get('items', [])
+                if len(items) == 1:
+                    item = items[0]
+                    logging.info(f"Person {item.get('name', {}).get('firstName')} {item.get('name', {}).get('lastName')} found for name: {name}")
+                    return item, failed
+                elif items:
+                    logging.warning(f"Multiple persons found for name: {name}")
+                else:
+                    logging.warning(f"no persons found for name: {name}")
+            else:
+                failed = True
+                logging.error(f"Error searching for {name}: {response.status_code} - {response.text}")
+        except REQUEST_ERRORS as e:
+            failed = True
+            logging.error(f"An error occurred while searching for {name}: {e!r}")
+
+    return None, failed
+
+
+async def find_person(client, name, person_ids, date, strict=False):
+    """
+    Async variant of pure_persons.find_person: same lookup order (memo, person index, Pure)
+    and the same result, but Pure is searched through an AsyncPureClient.
+    """
+    ref_date = None
+    if date:
+        ref_date = pure_persons.parse_date(date)
+
+    key = pure_persons.PersonMemo.key(name, person_ids)
+    memoized, record = pure_persons.person_memo.get(key)
+    if not memoized:
+        record = pure_persons.find_record_in_index(person_ids)
+        failed = False
+        if not record:
+            record, failed = await search_person_record(client, name, person_ids)
+        if record or not failed:
+            pure_persons.person_memo.put(key, record)
+        elif strict:
+            raise PureLookupError(f"person lookup of {name} failed")
+
+    if not record:
+        return None
+    return pure_persons.construct_person_detail(record, ref_date)
+
+
+async def _find_persons(lookups, concurrency, strict):
+    async with AsyncPureClient(concurrency=concurrency) as client:
+        # one failing lookup does not cancel the lookups of the other contributors
+        found = await asyncio.gather(*(find_person(client, name, person_ids, date, strict)
+                                       for name, person_ids, date in lookups), return_exceptions=True)
+    results = []
+    for (name, _, _), person_details in zip(lookups, found):
+        if isinstance(person_details, Exception):
+            logging.error(f"An error occurred while looking up {name}: {person_details!r}")
+            if strict:
+                if isinstance(person_details, PureLookupError):
+                    raise person_details
+                raise PureLookupError(f"person lookup of {name} failed: {person_details!r}")
+            person_details = None
+        results.append(person_details)
+    return results
+
+
+def find_persons(lookups, concurrency=PURE_ASYNC_CONCURRENCY, strict=False):
+    """
+    Resolves a list of persons concurrently.
+
+    Parameters:
+    - lookups (list of tuple): (name, person_ids, date) for every person, as for pure_persons.find_person.
+    - concurrency (int): Maximum number of Pure requests in flight.
+    - strict (bool): Raise PureLookupError (after all lookups are done) if a lookup failed.
+
+    Returns:
+    - list: The person details (or None) for every lookup, in the order of the lookups. A lookup
+      that raised is logged and gives None, as a failed search does in pure_persons.find_person.
+    """
+    if not lookups:
+        return []
+    return asyncio.run(_find_persons(lookups, concurrency, strict))
@@ -0,0 +1,181 @@
+# ########################################################################
+#
+# Pure client - shared http client for the CRUD api of pure
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from http_session import make_session, UPDATE_RETRY_METHODS
+from response_cache import ResponseCache
+from config import PURE_BASE_URL, PURE_HEADERS, PURE_POOL_SIZE, PURE_MAX_RETRIES, PURE_BACKOFF_FACTOR, \
+    CACHE_DIR, CACHE_ENABLED, PURE_CACHE_TTLS, PURE_PAGE_SIZE, PURE_PREFETCH, PURE_MAX_CONCURRENT_PUTS
+
+
+class PureLookupError(Exception):
+    """A search in Pure failed (http error or no connection), so a missing result is not definitive."""
+
+
+class CachedResponse:
+    """Response served from the response cache, with the attributes the callers use (status_code, text, json())."""
+
+    from_cache = True
+
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def entity_type(path):
+    """'external-persons/1234' => 'external-persons'"""
+    return path.strip('/').split('/')[0]
+
+
+def is_update(path):
+    """'external-persons/1234' => True (an existing entity), 'external-persons/' => False (creates one)"""
+    return len(path.strip('/').split('/')) > 1
+
+
+class PureClient:
+    """
+    Client for the Pure CRUD api that owns one pooled requests.Session.
+
+    All modules talk to Pure through this client, so connections (and their TLS handshakes)
+    are reused between calls instead of being opened for every lookup. Requests go through
+    the per-host rate limiter (see http_session).
+
+    Searches (POSTs) are answered from the response cache when possible; a successful PUT
+    invalidates the cached searches of that entity type. A PUT that creates an entity is not retried
+    (Pure may have created it already); a PUT that updates an existing entity goes through a second
+    session that retries it.
+
+    Parameters:
+    - base_url (str): Base url of the Pure api, paths are resolved relative to this url.
+    - headers (dict, optional): Headers sent with every request. Defaults to PURE_HEADERS.
+    - pool_size (int): Number of connections kept alive in the pool.
+    - max_retries (int): Number of retries for failed requests.
+    - backoff_factor (float): Backoff factor between retries (1 => 1s, 2s, 4s, ...).
+    - cache (ResponseCache, optional): Cache for search responses. None disables caching.
+    - max_puts (int): Maximum number of PUTs in flight at the same time, shared by all threads.
+    """
+
+    def __init__(self, base_url=PURE_BASE_URL, headers=None, pool_size=PURE_POOL_SIZE,
+                 max_retries=PURE_MAX_RETRIES, backoff_factor=PURE_BACKOFF_FACTOR, cache=None,
+                 max_puts=PURE_MAX_CONCURRENT_PUTS):
+        self.base_url = base_url
+        self.session = make_session(headers or PURE_HEADERS, pool_size, max_retries, backoff_factor)
+        self.update_session = make_session(headers or PURE_HEADERS, pool_size, max_retries, backoff_factor,
+                                           UPDATE_RETRY_METHODS)
+        self.cache = cache
+        self._put_slots = threading.BoundedSemaphore(max(1, max_puts))
+
+    def url(self, path):
+        """Returns the full url for a path relative to the base url (full urls are returned as is)."""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return self.base_url + path.lstrip('/')
+
+    def get(self, path, **kwargs):
+        return self.session.get(self.url(path), **kwargs)
+
+    def post(self, path, use_cache=True, **kwargs):
+        body = kwargs.get('json', kwargs.get('data'))
+        if self.cache and use_cache:
+            cached = self.cache.get(path, body)
+            if cached is not None:
+                return CachedResponse(cached)
+
+        response = self.session.post(self.url(path), **kwargs)
+        if self.cache and use_cache and response.status_code == 200:
+            self.cache.set(path, body, response.text)
+        return response
+
+    def put(self, path, retry=None, **kwargs):
+        """PUTs to Pure; retry (default: only for updates of an existing entity) retries throttling and 5xx errors."""
+        if retry is None:
+            retry = is_update(path)
+        session = self.update_session if retry else self.session
+        with self._put_slots:
+            response = session.put(self.url(path), **kwargs)
+        if self.cache and response.status_code in [200, 201]:
+            self.cache.invalidate(entity_type(path))
+        return response
+
+    def iter_search(self, path, body=None, page_size=PURE_PAGE_SIZE, prefetch=PURE_PREFETCH, use_cache=False):
+        """
+        Yields the items of a Pure search one by one, fetching the results page by page.
+
+        While the items of one page are processed, the next `prefetch` pages are already
+        being fetched, so at most prefetch + 1 pages are held in memory.
+
+        Parameters:
+        - path (str): Search endpoint, e.g. 'persons/search/'.
+        - body (dict, optional): Search body; size and offset are set by the iterator.
+        - page_size (int): Number of items per page.
+        - prefetch (int): Number of pages fetched ahead.
+        - use_cache (bool): Whether pages may be served from the response cache.
+        """
+        body = dict(body or {})
+
+        def fetch(offset):
+            response = self.post(path, use_cache=use_cache, json=dict(body, size=page_size, offset=offset))
+            if response.status_code != 200:
+                logging.error(f"Error fetching {path} at offset {offset}: {response.status_code} - {response.text}")
+                response.raise_for_status()
+            return response.json()
+
+        first_page = fetch(0)
+        count = first_page.get('count', 0)
+        logging.info(f"{path}: {count} items")
+        yield from first_page.get('items', [])
+
+        offsets = iter(range(page_size, count, page_size))
+        with ThreadPoolExecutor(max_workers=max(1, prefetch)) as executor:
+            pending = deque(executor.submit(fetch, offset) for offset in islice(offsets, max(1, prefetch)))
+            while pending:
+                page = pending.popleft().result()
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    pending.append(executor.submit(fetch, next_offset))
+                yield from page.get('items', [])
+
+    def close(self):
+        self.session.close()
+        self.update_session.close()
+
+
+_client = None
+_cache = None
+_client_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the response cache shared by the Pure clients of this process, or None if caching is disabled."""
+    global _cache
+    with _client_lock:
+        if _cache is None and CACHE_ENABLED:
+            _cache = ResponseCache(os.path.join(CACHE_DIR, 'pure_responses.sqlite'), PURE_CACHE_TTLS)
+        return _cache
+
+
+def get_client():
+    """Returns the PureClient shared by all modules of this process (created on first use)."""
+    global _client
+    cache = get_cache()
+    with _client_lock:
+        if _client is None:
+            _client = PureClient(cache=cache)
+        return _client
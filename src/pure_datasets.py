@@ -34,12 +34,16 @@ import configparser
 import os
 import logging
 import pure_persons
+import pure_async
+import publisher_resolver
+from external_person_registry import create_external_person
 import yoda_utils
 import datacite_utils
 import logging.handlers
+from pure_client import get_client
 from pathlib import Path
 from datetime import datetime
-from config import PURE_BASE_URL, DEFAULTS, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL, PURE_HEADERS, TYPE_URI
+from config import PURE_BASE_URL, DEFAULTS, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL, PURE_HEADERS, TYPE_URI, PURE_ASYNC_CONCURRENCY
 
 def setup_logging():
     """Sets up the logging configuration."""
@@ -98,8 +102,7 @@ def format_doi(doi):
 
 def request_dataset_by_uuid(uuid):
     """Request dataset details by UUID."""
-    api_url = f"{PURE_BASE_URL}data-sets/{uuid}"
-    response = requests.get(api_url, headers=PURE_HEADERS)
+    response = get_client().get(f"data-sets/{uuid}")
     if response.status_code == 200:
         return response.json()
     else:
@@ -110,8 +113,7 @@ def search_dataset_by_string(search_string):
     search_string = format_doi(search_string)
     data = {"searchString": search_string}
     json_data = json.dumps(data)
-    api_url = f"{PURE_BASE_URL}data-sets/search/"
-    response = requests.post(api_url, headers=PURE_HEADERS, data=json_data)
+    response = get_client().post("data-sets/search/", data=json_data)
     if response.status_code == 200:
         return response.json().get('items', [])
     else:
@@ -128,27 +130,6 @@ def find_dataset(uuid, search_string):
         items = search_dataset_by_string(search_string)
         return [item['uuid'] for item in items if 'uuid' in item]
 
-def create_external_person(first_name, last_name):
-    """
-    Creates an external person in the Pure system.
-    :param first_name, last_name:  first and last names.
-    :return: UUID of the newly created external person.
-    """
-    api_url = PURE_BASE_URL + 'external-persons/'
-    data = {"name": {"firstName": first_name, "lastName": last_name}}
-    json_data = json.dumps(data)
-
-    try:
-        response = requests.put(api_url, headers=PURE_HEADERS, data=json_data)
-        if response.status_code in [200, 201]:
-            external_person = response.json()
-            return external_person.get('uuid')
-        else:
-            logging.error(f"Error creating external person: {response.status_code} - {response.text}")
-    except requests.RequestException as e:
-        logging.error(f"An error occurred while creating external person: {e}")
-
-    return None
 def get_contributors_details(contributors, date, title, test):
     """
        Processes a list of contributors to find detailed information about each.
@@ -178,7 +159,6 @@ def get_contributors_details(contributors, date, title, test):
          an error if it fails to create an external person.
        """
     persons = {}
-    found_internal_person = False
 
     for contributor in contributors:
 
@@ -193,12 +173,34 @@ def get_contributors_details(contributors, date, title, test):
         if person_details:
             person_details['type'] = contributor['type']
             persons[name] = person_details
-            found_internal_person = True
         else:
             logging.info(f"No internal person found for {name}")
 
+    return add_external_persons(contributors, persons, title, test)
+def get_contributors_details_async(contributors, date, title, test, concurrency=PURE_ASYNC_CONCURRENCY):
+    """
+    Same as get_contributors_details, but all contributors of the dataset are resolved
+    concurrently (at most `concurrency` Pure requests in flight).
+    """
+    lookups = [(contributor['name'], {id_info['id']: id_info['value'] for id_info in contributor['person_ids']}, date)
+               for contributor in contributors]
+    found = pure_async.find_persons(lookups, concurrency)
 
-    if found_internal_person:
+    persons = {}
+    for contributor, person_details in zip(contributors, found):
+        if person_details:
+            person_details['type'] = contributor['type']
+            persons[contributor['name']] = person_details
+        else:
+            logging.info(f"No internal person found for {contributor['name']}")
+
+    return add_external_persons(contributors, persons, title, test)
+def add_external_persons(contributors, persons, title, test):
+    """
+    Second pass of get_contributors_details: creates external persons for the contributors
+    that were not found in Pure, but only if at least one internal person was found.
+    """
+    if persons:
         # Process external persons
         for contributor in contributors:
             contributor_id = contributor['name']
@@ -207,7 +209,8 @@ def get_contributors_details(contributors, date, title, test):
                 logging.info(f"Creating external person for {contributor_id}.")
                 first_name, last_name = split_name(contributor['name'])
                 if test =='no':
-                    external_person_uuid = external_person_uuid = create_external_person(first_name, last_name)
+                    person_ids = {id_info['id']: id_info['value'] for id_info in contributor['person_ids']}
+                    external_person_uuid = create_external_person(first_name, last_name, person_ids)
 
                     if external_person_uuid:
                         logging.info(f'Created external person: {external_person_uuid}')
@@ -331,36 +334,8 @@ def format_organizations_from_contributors(contributors):
         managing_org = default_uuid
     return formatted_organizations, managing_org
 def find_publisher(publisher):
-    data = {"searchString": publisher}
-    publisher_id =  None
-    json_data = json.dumps(data)
-    api_url = PURE_BASE_URL + 'publishers/search/'
-    try:
-        response = requests.post(api_url, headers=PURE_HEADERS, data=json_data)
-
-        if response.status_code == 200:
-            data = response.json()
-            items = data.get('items', [])
-            if items:
-                for item in items:
-                    uuid = item.get('uuid')
-                    name = item.get('name')
-                    if name == publisher:
-                        publisher_uuid = uuid
-                        return publisher_uuid
-                if not publisher_id:
-                    publisher_uuid = DEFAULTS['publisher']
-            else:
-                publisher_uuid = DEFAULTS['publisher']
-            return publisher_uuid
-
-        else:
-    #         default publisher
-            publisher_uuid = DEFAULTS['publisher']
-            return publisher_uuid
-
-    except requests.RequestException as e:
-        logging.error(f"An error occurred while searching for publisher: {publisher}: {e}")
+    """Returns the uuid of the publisher in Pure with this (normalized) name, or the default publisher."""
+    return publisher_resolver.get_resolver().resolve(publisher)
 def format_description(description):
 
     description_object = {
@@ -400,13 +375,12 @@ def construct_dataset_json(row):
         }
     return dataset
 def create_dataset(dataset_json):
-    url = PURE_BASE_URL + 'data-sets'
     json_data = json.dumps(dataset_json)
     # Write to a new file
     # with open('datasssa.json', 'w') as file:
     #     file.write(json_data)
     # Make the put request
-    response = requests.put(url, headers=PURE_HEADERS, data=json_data)
+    response = get_client().put('data-sets', data=json_data)
     if response.status_code in [200, 201]:
         data = response.json()
         logging.info(f"created dataset: {response.status_code} - {data['uuid']}")
@@ -16,19 +16,17 @@ from datetime import datetime, time
 import configparser
 import os
 import logging
-from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL
+import threading
+from collections import OrderedDict
+from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL, PERSON_MEMO_SIZE
 from logging_config import setup_logging
+from pure_client import get_client, PureLookupError
+from person_index import get_person_index
 from dateutil import parser
 from pathlib import Path
 
 logger = setup_logging('update datasets', level=logging.INFO)
 
-headers = {
-    "Content-Type": "application/json",
-    "accept": "application/json",
-    "api-key": PURE_API_KEY
-}
-
 def parse_date(date_string):
 
     try:
@@ -95,42 +93,89 @@ def construct_person_detail(data, ref_date=None):
         "associationsUUIDs": associationsUUIDs,
     }
 
-def find_person(name, person_ids, date):
+class PersonMemo:
     """
-    Searches for and retrieves detailed information about a person from an API.
+    Per-run memo of find_person: maps (name, identifiers) to the raw Pure person record
+    (or None if no unique person was found), so repeat authors cost no http calls.
+    The person details for a specific date are constructed locally from the raw record.
 
     Parameters:
-    - name (str): The name of the person to be searched. if none => the module will not try to find person on name
-    - person_ids (dict): A dictionary of identifiers for the person (e.g., UUID, other IDs).
-    - date (str): A date string used for filtering data. if None => all association ids will be collected
-    - apikey (str): API key for authentication with the API.
-      (Note that the header of the api-call contain the apikey that is loaded in the top of this script)
+    - maxsize (int): Maximum number of entries; the least recently used entry is evicted first.
+      0 or None => unbounded.
+    """
 
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
 
-    Returns:
-    - dict: A dictionary containing detailed information about the person if a unique match is found.
-    - str: A message indicating no unique person was found if no match or multiple matches are found.
+    @staticmethod
+    def key(name, person_ids):
+        return name, tuple(sorted((str(id_type), str(id_value)) for id_type, id_value in (person_ids or {}).items()))
+
+    def get(self, key):
+        """Returns (True, record) for a memoized lookup, else (False, None)."""
+        with self._lock:
+            if key not in self._records:
+                return False, None
+            self._records.move_to_end(key)
+            return True, self._records[key]
+
+    def put(self, key, record):
+        with self._lock:
+            self._records[key] = record
+            self._records.move_to_end(key)
+            if self.maxsize and len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+person_memo = PersonMemo(PERSON_MEMO_SIZE)
+
+
+def find_record_in_index(person_ids):
     """
-    ref_date = None
+    Looks up a person in the local person index (see person_index.py).
 
-    if date:
-        # ref_date = datetime.strptime(date, "%Y-%m-%d")
-        ref_date = parse_date(date)
+    Parameters:
+    - person_ids (dict): A dictionary of identifiers for the person (e.g., UUID, other IDs).
 
+    Returns:
+    - dict: The raw person record if one of the identifiers belongs to exactly one internal person, else None.
+    """
+    index = get_person_index()
+    if not index or not person_ids:
+        return None
+
+    # the uuid is tried first, as in find_person
+    for id_type, id_value in sorted(person_ids.items(), key=lambda item: item[0] != 'uuid'):
+        uuids = [id_value] if id_type == 'uuid' else index.lookup(id_value)
+        record = index.record(uuids[0]) if len(uuids) == 1 else None
+        if record:
+            logging.info(f"Person found in index with {id_type}: {id_value}")
+            return record
+    return None
+
+def search_person_record(name, person_ids):
+    """
+    Searches Pure for a person on UUID, then on each of the identifiers and finally on name.
 
-    person_detail = None
+    Returns:
+    - tuple: (record, failed) with the raw person record of the unique match (or None), and
+      whether a request failed, in which case a missing record is not definitive.
+    """
+    failed = False
     if person_ids and 'uuid' in person_ids:
 
         uuid = person_ids['uuid']
-        api_url = PURE_BASE_URL + 'persons/' + uuid
 
-        response = requests.get(api_url, headers=headers)
+        response = get_client().get('persons/' + uuid)
         if response.status_code == 200:
-            data = response.json()
-            person_detail = construct_person_detail(data, ref_date)
-            if person_detail:
-                logging.info(f"Person found with UUID: {person_ids['uuid']}")
-                return person_detail
+            logging.info(f"Person found with UUID: {person_ids['uuid']}")
+            return response.json(), failed
 
     if person_ids:
         for id_type, id_value in person_ids.items():
@@ -138,35 +183,31 @@ def find_person(name, person_ids, date):
                         id_value = extract_orcid(id_value)
                     data = {"searchString": id_value}
                     json_data = json.dumps(data)
-                    api_url = PURE_BASE_URL + 'persons/search/'
                     try:
-                        response = requests.post(api_url, headers=headers, data=json_data)
+                        response = get_client().post('persons/search/', data=json_data)
                         if response.status_code == 200:
                             data = response.json()
                             items = data.get('items', [])
 
                             if items:
                                 if len(items) == 1:
-
-                                    item = items[0]
-
-                                    person_detail = construct_person_detail(item, ref_date)
                                     logging.info(f"Person found with {id_type}: {id_value}")
-                                    return person_detail
+                                    return items[0], failed
                                 else:
                                     logging.warning(f"Multiple or no persons found for {id_type}, {id_value}")
                         else:
+                            failed = True
                             logging.error(f"Error searching for {id_type}: {response.status_code} - {response.text}")
                     except requests.RequestException as e:
+                        failed = True
                         logging.error(f"An error occurred while searching for {id_type}: {e}")
 
-    if not person_detail and name is not None:
+    if name is not None:
 
         data = {"searchString": name}
         json_data = json.dumps(data)
-        api_url = PURE_BASE_URL + 'persons/search/'
         try:
-            response = requests.post(api_url, headers=headers, data=json_data)
+            response = get_client().post('persons/search/', data=json_data)
             if response.status_code == 200:
                 data = response.json()
                 items = data.get('items', [])
@@ -174,11 +215,9 @@ def find_person(name, person_ids, date):
                 if items:
                     if len(items) == 1:
                         item = items[0]
+                        logging.info(f"Person {item.get('name', {}).get('firstName')} {item.get('name', {}).get('lastName')} found for name: {name}")
 
-                        person_detail = construct_person_detail(item, ref_date)
-                        logging.info(f"Person {person_detail['firstName']} {person_detail['lastName']} found for name: {name}")
-
-                        return person_detail
+                        return item, failed
                     else:
                         logging.warning(f"Multiple persons found for name: {name}")
                 else:
@@ -187,12 +226,59 @@ def find_person(name, person_ids, date):
 
 
             else:
+                failed = True
                 logging.error(f"Error searching for {name}: {response.status_code} - {response.text}")
 
         except requests.RequestException as e:
+            failed = True
             logging.error(f"An error occurred while searching for {name}: {e}")
 
-    return (person_detail)
+    return None, failed
+
+def find_person(name, person_ids, date, strict=False):
+    """
+    Searches for and retrieves detailed information about a person from an API.
+
+    The raw person record is looked up in the per-run memo first, then in the local person
+    index and only then searched in Pure. The associations are filtered on date locally, so the
+    same person on outputs with different dates is fetched only once.
+
+    Parameters:
+    - name (str): The name of the person to be searched. if none => the module will not try to find person on name
+    - person_ids (dict): A dictionary of identifiers for the person (e.g., UUID, other IDs).
+    - date (str): A date string used for filtering data. if None => all association ids will be collected
+    - strict (bool): Raise PureLookupError instead of returning None when no person was found because
+      a search failed.
+    - apikey (str): API key for authentication with the API.
+      (Note that the header of the api-call contain the apikey that is loaded in the top of this script)
+
+
+    Returns:
+    - dict: A dictionary containing detailed information about the person if a unique match is found.
+    - str: A message indicating no unique person was found if no match or multiple matches are found.
+    """
+    ref_date = None
+
+    if date:
+        # ref_date = datetime.strptime(date, "%Y-%m-%d")
+        ref_date = parse_date(date)
+
+    key = PersonMemo.key(name, person_ids)
+    memoized, record = person_memo.get(key)
+    if not memoized:
+        # answer from the local person index if possible, Pure is only searched on a miss
+        record = find_record_in_index(person_ids)
+        failed = False
+        if not record:
+            record, failed = search_person_record(name, person_ids)
+        if record or not failed:
+            person_memo.put(key, record)
+        elif strict:
+            raise PureLookupError(f"person lookup of {name} failed")
+
+    if not record:
+        return None
+    return construct_person_detail(record, ref_date)
 
 
 from datetime import datetime
@@ -36,74 +36,73 @@ import configparser
 import os
 import logging
 import pure_persons
+import pure_async
+import journal_resolver
+from external_person_registry import create_external_person
 import openalex_utils
 import logging.handlers
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pure_client import get_client, PureLookupError
+from http_session import get_session
 from dateutil import parser
-from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL, PURE_HEADERS
+from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL, PURE_HEADERS, PURE_ASYNC_CONCURRENCY, \
+    PURE_WORKERS, PURE_ASYNC_CONTRIBUTORS
 
 def get_researchoutput(uuid):
-    headers = PURE_HEADERS
-    api_url = PURE_BASE_URL + 'research-outputs/' + uuid
-    response = requests.get(api_url, headers=headers)
+    response = get_client().get('research-outputs/' + uuid)
     if response.status_code == 200:
         data = response.json()
         return data
     else:
         logging.error(f"Error searching for research output {uuid}: {response.status_code} - {response.text}")
 
-def create_external_person(first_name, last_name):
-    """
-    Creates an external person in the Pure system.
+def get_contributors_details(contributors, ref_date, test):
+    persons = {}
 
-    :param first_name, last_name:  first and last names.
-    :return: UUID of the newly created external person.
-    """
-    api_url = PURE_BASE_URL + 'external-persons/'
-    url = "https://staging.research-portal.uu.nl/ws/api/external-persons"
+    # First pass: Check for internal persons
+    for contributor in contributors:
 
-    data = {"name": {"firstName": first_name, "lastName": last_name}}
-    json_data = json.dumps(data)
+        contributor_id = contributor['name']
+        # a failed search raises PureLookupError, so no external person is created for an internal person
+        person_details = pure_persons.find_person(contributor['name'], contributor['ids'], ref_date, strict=True)
 
-    try:
-        response = requests.put(api_url, headers=PURE_HEADERS, data=json_data)
+        # None marks a contributor that needs an external person
+        persons[contributor_id] = person_details if person_details else None
 
-        if response.status_code in [200, 201]:
-            external_person = response.json()
-            return external_person.get('uuid')
-        else:
-            logging.error(f"Error creating external person: {response.status_code} - {response.text}")
-    except requests.RequestException as e:
-        logging.error(f"An error occurred while creating external person: {e}")
+    return add_external_persons(contributors, persons, test)
 
-    return None
 
+def get_contributors_details_async(contributors, ref_date, test, concurrency=PURE_ASYNC_CONCURRENCY):
+    """
+    Same as get_contributors_details, but all contributors of the output are resolved
+    concurrently (at most `concurrency` Pure requests in flight).
+    """
+    lookups = [(contributor['name'], contributor['ids'], ref_date) for contributor in contributors]
+    found = pure_async.find_persons(lookups, concurrency, strict=True)
 
-def get_contributors_details(contributors, ref_date, test):
     persons = {}
-    found_internal_person = False
-
-    # First pass: Check for internal persons and mark if any are found
-    for contributor in contributors:
+    for contributor, person_details in zip(contributors, found):
+        persons[contributor['name']] = person_details if person_details else None
 
-        contributor_id = contributor['name']
-        person_details = pure_persons.find_person(contributor['name'], contributor['ids'], ref_date)
+    return add_external_persons(contributors, persons, test)
 
-        if person_details:
-            persons[contributor_id] = person_details
-            found_internal_person = True
-        else:
-            # Mark as None for now
-            persons[contributor_id] = None
 
+def add_external_persons(contributors, persons, test):
+    """
+    Second pass of get_contributors_details: creates external persons for the contributors
+    that were not found in Pure, but only if at least one internal person was found.
+    """
+    found_internal_person = any(persons.values())
 
-            # Second pass: Create external persons only if an internal person is found
     if found_internal_person:
         for contributor in contributors:
             contributor_id = contributor['name']
             if persons[contributor_id] is None:  # This contributor needs an external person
                 logging.debug(f"Creating external person for {contributor_id}.")
                 if test == 'no':
-                    external_person_uuid = create_external_person(contributor['first_name'],contributor['last_name'])
+                    external_person_uuid = create_external_person(contributor['first_name'], contributor['last_name'],
+                                                                  contributor['ids'])
 
                     if external_person_uuid:
                         logging.debug(f'Created external person: {external_person_uuid}')
@@ -142,28 +141,12 @@ def parse_keywords(keywords):
 
     return data
 
-def get_journal_uuid(issn):
-    url = "https://staging.research-portal.uu.nl/ws/api/journals/search/"
-    # url = BASE_URL + '/journals/search/'
-    data = {"searchString": issn}
-    json_data = json.dumps(data)
-    headers = PURE_HEADERS
-    response = requests.post(url, headers=headers, data=json_data)
-    data = response.json()
-    items = data.get('items', [])
-
-    if items:
-        for item in items:
-
-            journal_uuid = item['uuid']
-
-        if not journal_uuid:
-            journal_uuid = None
-    else:
-        journal_uuid = None
-
-
-    return journal_uuid
+def get_journal_uuid(issn, strict=False):
+    """
+    Returns the uuid of the journal in Pure with exactly this ISSN (ISSN, eISSN or ISSN-L), or None.
+    With strict a failed search raises PureLookupError.
+    """
+    return journal_resolver.get_resolver().resolve(issn, strict)
 
 
 def construct_research_output_json(row):
@@ -331,21 +314,21 @@ def format_contributors(contributors_data):
 
 
 def create_research_output(research_output_json):
-    url = " https://staging.research-portal.uu.nl/ws/api/research-outputs"
+    """Creates the research output in Pure and returns its uuid, or None if that failed."""
     json_data = json.dumps(research_output_json)
-    # Open a file for writing
-    with open('test123.json', 'w') as file:
-        json.dump(json_data, file, indent=4)
     # Make the put request
-    headers = PURE_HEADERS
-    response = requests.put(url, headers=headers, data=json_data)
+    try:
+        response = get_client().put('research-outputs', data=json_data)
+    except requests.RequestException as e:
+        logging.error(f"An error occurred while creating research output: {e}")
+        return None
     if response.status_code in [200, 201]:
         logging.info(f"created researchoutput: {response.status_code} - {response.text}")
+        return response.json().get('uuid')
     else:
         logging.error(f"Error creating research output: {response.status_code} - {response.text}")
 
-
-    return 'test'
+    return None
 
 
 def get_supervisors(supervisors, ref_date):
@@ -371,7 +354,8 @@ def get_supervisors(supervisors, ref_date):
             supervisor_id = supervisor['name']
             if persons[supervisor_id] is None:  # This contributor needs an external person
                 logging.info(f"Creating external person for {supervisor_id}.")
-                external_person_uuid = create_external_person(supervisor['first_name'], supervisor['last_name'])
+                external_person_uuid = create_external_person(supervisor['first_name'], supervisor['last_name'],
+                                                              supervisor['ids'])
 
                 if external_person_uuid:
                     logging.info(f'Created external person: {external_person_uuid}')
@@ -407,7 +391,7 @@ def unique_fields_per_type(row):
             else:
                 # Process article type
 
-                row['journal'] = get_journal_uuid(row['journal_issn'])
+                row['journal'] = get_journal_uuid(row['journal_issn'], strict=True)
                 if row['journal'] == None:
                     error = True
                     logging.error(f"No ISSN for {row['title']}")
@@ -443,35 +427,87 @@ def format_rest(row):
     return row
 
 
-def df_to_pure(df, test):
-    error = 0
-    succes = 0
-    for _, row in df.iterrows():
-        print('processing', row['title'])
-        contributors_details = get_contributors_details(row['contributors'], row['publication_date'], test)
-
-        if contributors_details:
-            row['parsed_contributors'] = format_contributors(contributors_details)
-            row['parsed_organizations'], row['managing_org'] = format_organizations_from_contributors(
-                contributors_details)
-            row = format_rest(row)
-            row, error = unique_fields_per_type(row)
-            if error == False:
-                # Construct the research output JSON
-                research_output_json = construct_research_output_json(row)
-                succes = succes +1
-                if test == 'no':
-                    uuid_ro = create_research_output(research_output_json)
-                else:
-                    error = error + 1
+def process_research_output(row, test, async_contributors=PURE_ASYNC_CONTRIBUTORS):
+    """
+    Resolves the contributors and journal of one research output, formats it and (if test is 'no')
+    creates it in Pure. With async_contributors the contributors are resolved concurrently
+    (get_contributors_details_async).
+
+    Returns:
+    - tuple: (status, row, reason) with status 'created', 'tested' (complete, but not created in test
+      mode), 'skipped' (no internal contributors or missing fields) or 'failed' (Pure did not accept
+      it, or a person or journal search in Pure failed, so the output may be created by a later run).
+    """
+    logging.info(f"processing {row['title']}")
+    resolve = get_contributors_details_async if async_contributors else get_contributors_details
+    try:
+        contributors_details = resolve(row['contributors'], row['publication_date'], test)
+        if not contributors_details:
+            logging.warning(f"skipped research output {row['research_output_id']}.")
+            return 'skipped', row, 'no internal contributors'
+
+        row['parsed_contributors'] = format_contributors(contributors_details)
+        row['parsed_organizations'], row['managing_org'] = format_organizations_from_contributors(
+            contributors_details)
+        row = format_rest(row)
+        row, error = unique_fields_per_type(row)
+    except PureLookupError as e:
+        logging.warning(f"failed research output {row['research_output_id']}: {e}")
+        return 'failed', row, str(e)
+    if error:
+        logging.warning(f"skipped research output {row['research_output_id']}, missing fields.")
+        return 'skipped', row, 'missing fields'
+
+    # Construct the research output JSON
+    research_output_json = construct_research_output_json(row)
+    if test != 'no':
+        return 'tested', row, None
+    if create_research_output(research_output_json) is None:
+        return 'failed', row, 'not accepted by Pure'
+    return 'created', row, None
+
+
+def df_to_pure(df, test, workers=PURE_WORKERS, on_result=None, async_contributors=PURE_ASYNC_CONTRIBUTORS):
+    """
+    Processes all research outputs in df (see process_research_output).
 
+    With workers > 1 the outputs are processed in a pool of that many threads, so the Pure calls of
+    one output overlap with those of the others; the number of PUTs in flight is capped by the Pure
+    client (MaxConcurrentPuts). The results are counted in the calling thread, in the order of df,
+    and passed to on_result(status, row, reason) if given. async_contributors is passed on to
+    process_research_output. An output whose processing raises is reported as 'failed' with the
+    error as reason, and the other outputs are still processed.
 
+    Returns:
+    - Counter: number of research outputs per status.
+    """
+    rows = (row for _, row in df.iterrows())
+    counts = Counter()
+
+    def process(row):
+        try:
+            return process_research_output(row, test, async_contributors)
+        except Exception as e:
+            logging.exception(f"research output {row['research_output_id']}: error while processing")
+            return 'failed', row, f'error: {e}'
+
+    def count(results):
+        for status, row, reason in results:
+            counts[status] += 1
+            logging.info(f"research output {row['research_output_id']}: {status} {reason or ''}")
+            if on_result:
+                on_result(status, row, reason)
+
+    if workers <= 1:
+        count(process(row) for row in rows)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            count(executor.map(process, rows))
 
-        else:
-            logging.warning(f"skipped research output {row['research_output_id']}.")
-            error = error + 1
-    print(error, ' errors, see log for more info')
-    print(succes, ' successes')
+    logging.info(f"research outputs: {dict(counts)}")
+    print(counts['skipped'] + counts['failed'], ' errors, see log for more info')
+    print(counts['created'] + counts['tested'], ' successes')
+    return counts
 
 
 def main():
@@ -490,7 +526,7 @@ def main():
     # Loop through each DOI and make a request
     for doi in dois:
         url = 'https://api.openalex.org/works/' + doi
-        response = requests.get(url, headers=OPENALEX_HEADERS)
+        response = get_session().get(url, headers=OPENALEX_HEADERS)
 
         if response.status_code == 200:
             openalex_data = response.json()
@@ -499,7 +535,7 @@ def main():
             print(f"Failed to retrieve data for DOI: {doi}")
 
     df, errors = openalex_utils.transform_openalex_to_df(all_openalex_data)
-    df_to_pure(df)
+    df_to_pure(df, 'yes')
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,175 @@
+# ########################################################################
+#
+# Rate limiter - adaptive token bucket per host, shared by all calls to
+# Pure, Ricgraph, OpenAlex and DataCite
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+DEFAULT_RATE = 10.0     # requests per second
+DEFAULT_BURST = 20      # requests that may be sent at once after an idle period
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out `rate` tokens per second, with at most `burst` tokens saved up.
+
+    The bucket adapts to the server: throttle() (called after a 429 or 503) halves the rate
+    and pauses the bucket for the Retry-After period, recover() (called after a successful
+    request) slowly raises the rate back to its configured maximum.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate else self.max_rate / 16
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Takes a token and returns the number of seconds to wait before it may be used."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after=None):
+        """Slows down after a 429/503 response; retry_after (seconds) pauses the bucket."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def recover(self):
+        """Raises the rate again after a successful response (additive increase)."""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class NoLimit:
+    """
+    Bucket of a host without a rate limit (e.g. a Ricgraph on the local network): requests never
+    wait for a token, only for the Retry-After period of a 429 or 503 response.
+    """
+
+    def __init__(self):
+        self.blocked_until = 0.0
+
+    def reserve(self):
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after=None):
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def recover(self):
+        pass
+
+
+_limits = {}
+_buckets = {}
+_buckets_lock = threading.Lock()
+# number of processes that share the rate limits of the hosts (see share)
+_processes = 1
+
+
+def configure(limits):
+    """
+    Sets the rate limits per host.
+
+    Parameters:
+    - limits (dict): host => (rate, burst), or None for a host that is not rate limited.
+      The host 'default' applies to all hosts that are not listed.
+    """
+    with _buckets_lock:
+        _limits.clear()
+        _limits.update(limits)
+        _buckets.clear()
+
+
+def share(processes):
+    """
+    Gives this process 1/processes of the rate and burst of every host, for runs that are sharded over
+    `processes` processes (see sharding.run_sharded), so together they stay within the limits.
+    """
+    global _processes
+    with _buckets_lock:
+        _processes = max(1, processes)
+        _buckets.clear()
+
+
+def get_bucket(url):
+    """Returns the token bucket shared by all requests to the host of url."""
+    host = urlparse(url).hostname or url
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            limit = _limits[host] if host in _limits else _limits.get('default', (DEFAULT_RATE, DEFAULT_BURST))
+            if limit is None:
+                bucket = NoLimit()
+            else:
+                rate, burst = limit
+                bucket = TokenBucket(rate / _processes, max(1.0, burst / _processes))
+            _buckets[host] = bucket
+        return bucket
+
+
+def parse_retry_after(value):
+    """Returns the Retry-After header (seconds or an http date) in seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,102 @@
+# ########################################################################
+#
+# Response cache - persistent sqlite cache of Pure search responses, with
+# a ttl per endpoint and invalidation on writes
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def open_database(path):
+    """
+    Opens (and creates) a sqlite database in WAL mode, so several runs can read and write it at the same time.
+    The connection may be shared between threads; callers serialize access with their own lock.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+def normalize_endpoint(endpoint):
+    """'/persons/search/' => 'persons/search'"""
+    return endpoint.strip('/')
+
+
+def normalize_body(body):
+    """Returns a canonical json string of a request body (dict or json string), so equal searches get equal keys."""
+    if body is None:
+        return ''
+    if isinstance(body, (bytes, str)):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return body.decode() if isinstance(body, bytes) else body
+    return json.dumps(body, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+class ResponseCache:
+    """
+    Cache of api responses, keyed by endpoint plus the normalized request body.
+
+    Parameters:
+    - path (str): Location of the sqlite database.
+    - ttls (dict): endpoint => time to live in seconds. Endpoints without a ttl (or ttl 0) are not cached.
+    """
+
+    def __init__(self, path, ttls):
+        self.ttls = {normalize_endpoint(endpoint): ttl for endpoint, ttl in ttls.items()}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = open_database(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'endpoint TEXT NOT NULL, body TEXT NOT NULL, response TEXT NOT NULL, created REAL NOT NULL, '
+                         'PRIMARY KEY (endpoint, body))')
+
+    def ttl(self, endpoint):
+        return self.ttls.get(normalize_endpoint(endpoint), 0)
+
+    def get(self, endpoint, body):
+        """Returns the cached response text, or None if it is not cached or expired."""
+        ttl = self.ttl(endpoint)
+        if not ttl:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT response, created FROM responses WHERE endpoint = ? AND body = ?',
+                                   (normalize_endpoint(endpoint), normalize_body(body))).fetchone()
+            if row and row[1] + ttl > time.time():
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def set(self, endpoint, body, response):
+        if not self.ttl(endpoint):
+            return
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses (endpoint, body, response, created) VALUES (?, ?, ?, ?)',
+                             (normalize_endpoint(endpoint), normalize_body(body), response, time.time()))
+
+    def invalidate(self, entity_type):
+        """Removes all cached searches of an entity type, e.g. 'external-persons' => 'external-persons/search'."""
+        with self._lock:
+            self._db.execute('DELETE FROM responses WHERE endpoint = ? OR endpoint LIKE ?',
+                             (normalize_endpoint(entity_type), normalize_endpoint(entity_type) + '/%'))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
@@ -0,0 +1,211 @@
+# ########################################################################
+#
+# Ricgraph client - pooled and cached access to the Ricgraph api, shared
+# by the import and enrichment scripts
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import json
+import logging
+import os
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from http_session import get_session
+from local_store import PersistentMap
+from doi_utils import normalize_doi
+from config import RIC_BASE_URL, FACULTY_PREFIX, CACHE_DIR, CACHE_ENABLED, RICGRAPH_CACHE_MAX_AGE, \
+    RICGRAPH_WORKERS
+
+RESEARCH_OUTPUT = 'journal article'
+DATA_SET = 'data set'
+PERSON = 'person'
+# max_nr_items of the neighbor requests ('0' => all), the same for the live walk and the snapshot,
+# so both give the same DOIs for a person-root with many outputs
+NEIGHBOR_MAX_NR_ITEMS = '0'
+
+
+def node_doi(node):
+    """'10.1234/abc|doi' => '10.1234/abc'"""
+    return node["_key"].split("|")[0]
+
+
+class DoiSet:
+    """
+    Ordered, deduplicated set of the DOIs found while walking the person-roots of Ricgraph.
+
+    A DOI found for several person-roots (co-authors in the same faculty) is kept once, in the
+    order it was first found, with its provenance: the faculties, person-roots and _source systems it
+    was found with. DOIs are compared after normalization. `raw` counts every DOI that was added.
+    """
+
+    def __init__(self):
+        self.raw = 0
+        self._dois = {}
+
+    def add(self, doi, personroot_key, sources=(), faculty=None):
+        self.raw += 1
+        entry = self._dois.setdefault(normalize_doi(doi), {'doi': doi, 'faculties': [], 'personroots': [],
+                                                           'sources': set(), 'count': 0})
+        entry['count'] += 1
+        if faculty is not None and faculty not in entry['faculties']:
+            entry['faculties'].append(faculty)
+        if personroot_key not in entry['personroots']:
+            entry['personroots'].append(personroot_key)
+        entry['sources'].update(sources or ())
+
+    def provenance(self, doi):
+        """Returns {'doi', 'faculties', 'personroots', 'sources', 'count'} of a DOI in the set, or None."""
+        return self._dois.get(normalize_doi(doi))
+
+    def filter(self, predicate):
+        """Returns a DoiSet with the DOIs whose provenance matches predicate (raw counts the kept DOIs)."""
+        subset = DoiSet()
+        for key, entry in self._dois.items():
+            if predicate(entry):
+                subset._dois[key] = entry
+                subset.raw += entry['count']
+        return subset
+
+    def __iter__(self):
+        return (entry['doi'] for entry in self._dois.values())
+
+    def __len__(self):
+        return len(self._dois)
+
+    def __contains__(self, doi):
+        return normalize_doi(doi) in self._dois
+
+
+class RicgraphClient:
+    """
+    Client for the Ricgraph api on the pooled, rate limited session of http_session.
+
+    The results of get_all_neighbor_nodes are cached per (key, category_want) in memory and in a
+    sqlite database for RICGRAPH_CACHE_MAX_AGE seconds, so the datasets and research output imports
+    run back to back on the same faculty walk the graph only once. Failed requests are not cached.
+
+    Parameters:
+    - base_url (str): Base url of the Ricgraph api. Defaults to RIC_BASE_URL.
+    - session (requests.Session, optional): Session used for the requests.
+    - store (PersistentMap, optional): On-disk cache of neighbor nodes. None => in memory only.
+    """
+
+    def __init__(self, base_url=RIC_BASE_URL, session=None, store=None):
+        self.base_url = base_url
+        self.session = session or get_session()
+        self.store = store
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint, params):
+        """Returns the results of a Ricgraph api call; raises requests.RequestException when it fails."""
+        response = self.session.get(self.base_url + endpoint, params=params)
+        response.raise_for_status()
+        return response.json().get("results", [])
+
+    def faculties(self):
+        """Returns the faculty nodes (organizations whose name starts with FACULTY_PREFIX)."""
+        return self.get('organization/search', {'value': FACULTY_PREFIX})
+
+    def select_faculties(self, faculty_choice):
+        """Returns the keys of all faculties for 'all', else the chosen faculty key."""
+        if faculty_choice.lower() == 'all':
+            return [item['_key'] for item in self.faculties()]
+        return [faculty_choice]
+
+    def personroots(self, faculty_key, max_nr_items='0'):
+        """Fetch person-root nodes for a given faculty (max_nr_items '0' => all)."""
+        try:
+            return self.get('get_all_personroot_nodes', {'key': faculty_key, 'max_nr_items': max_nr_items})
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Error fetching person-roots for faculty {faculty_key}: {e}")
+            return []
+
+    def neighbor_nodes(self, key, category_want):
+        """Returns the neighbor nodes of category_want of a node, from the cache if possible."""
+        # the limit is part of the key, so nodes cached with Ricgraph's default limit are not reused
+        cache_key = json.dumps([key, category_want, NEIGHBOR_MAX_NR_ITEMS])
+        with self._lock:
+            if cache_key in self._nodes:
+                return self._nodes[cache_key]
+        if self.store is not None:
+            found, nodes = self.store.lookup(cache_key)
+            if found:
+                with self._lock:
+                    self._nodes[cache_key] = nodes
+                return nodes
+
+        try:
+            nodes = self.get('get_all_neighbor_nodes', {'key': key, 'category_want': category_want,
+                                                        'max_nr_items': NEIGHBOR_MAX_NR_ITEMS})
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Error fetching {category_want} nodes for {key}: {e}")
+            return []
+        with self._lock:
+            self._nodes[cache_key] = nodes
+        if self.store is not None:
+            self.store.set(cache_key, nodes)
+        return nodes
+
+    def map_personroots(self, personroots, fetch, workers=RICGRAPH_WORKERS):
+        """
+        Yields (personroot_key, fetch(personroot_key)) for the person-roots with a key.
+
+        With workers > 1 the person-roots are fetched in a pool of that many threads, but the
+        results are yielded in the order of personroots, so logs and output files stay reproducible.
+        """
+        keys = [personroot['_key'] for personroot in personroots if personroot.get('_key') is not None]
+        if workers <= 1:
+            for key in keys:
+                yield key, fetch(key)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from zip(keys, executor.map(fetch, keys))
+
+    def research_outputs(self, personroot_key):
+        return self.neighbor_nodes(personroot_key, RESEARCH_OUTPUT)
+
+    def datasets(self, personroot_key):
+        return self.neighbor_nodes(personroot_key, DATA_SET)
+
+    def person_ids(self, personroot_key):
+        return self.neighbor_nodes(personroot_key, PERSON)
+
+    def check_enrichment(self, personroot_key, source_system='pure uu'):
+        """Returns the enrichment suggestions of Ricgraph for a person-root (not cached)."""
+        try:
+            return self.get('person/enrich', {'key': personroot_key, 'source_system': source_system,
+                                              'max_nr_items': 1})
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Error fetching enrichment for person-root {personroot_key}: {e}")
+            return []
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ricgraph_client():
+    """Returns the RicgraphClient of this process, with an on-disk cache unless caching is disabled."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            store = None
+            if CACHE_ENABLED:
+                store = PersistentMap(os.path.join(CACHE_DIR, 'ricgraph.sqlite'), 'neighbor_nodes',
+                                      RICGRAPH_CACHE_MAX_AGE)
+            _client = RicgraphClient(store=store)
+        return _client
+
+
+def set_ricgraph_client(client):
+    """Replaces the RicgraphClient of this process (e.g. by one that reads a snapshot)."""
+    global _client
+    with _client_lock:
+        _client = client
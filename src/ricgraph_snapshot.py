@@ -0,0 +1,181 @@
+# ########################################################################
+#
+# Ricgraph snapshot - walks the person-roots of a faculty once and stores
+# their neighbor nodes of all categories in a local sqlite file, which the
+# import and enrichment scripts can read instead of calling Ricgraph
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+#
+# Usage
+#
+#   python ricgraph_snapshot.py <faculty key|all>      (re)takes the snapshot of the faculty
+#
+# The scripts read the snapshot with the option --snapshot.
+#
+# ########################################################################
+
+import argparse
+import json
+import logging
+import threading
+import time
+import requests
+from collections import defaultdict
+from logging_config import setup_logging
+from response_cache import open_database
+from ricgraph_client import RicgraphClient, set_ricgraph_client, RESEARCH_OUTPUT, DATA_SET, PERSON, \
+    NEIGHBOR_MAX_NR_ITEMS
+from config import RICGRAPH_SNAPSHOT_PATH
+
+# neighbor categories stored in the snapshot
+SNAPSHOT_CATEGORIES = (RESEARCH_OUTPUT, DATA_SET, PERSON)
+
+
+class RicgraphSnapshot:
+    """
+    Local copy of the person-roots of faculties and their neighbor nodes, stored in a sqlite database.
+
+    take() walks a faculty once: for every person-root all neighbor nodes are fetched with a single
+    get_all_neighbor_nodes call and split on category, so the research outputs, datasets and person
+    ids of a person-root cost one request instead of three.
+    """
+
+    def __init__(self, path=RICGRAPH_SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = open_database(path)
+        self._db.executescript(
+            'CREATE TABLE IF NOT EXISTS faculties (faculty TEXT PRIMARY KEY, taken_at REAL NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS personroots (faculty TEXT NOT NULL, position INTEGER NOT NULL, '
+            'personroot TEXT NOT NULL, PRIMARY KEY (faculty, position));'
+            'CREATE TABLE IF NOT EXISTS nodes (personroot TEXT NOT NULL, category TEXT NOT NULL, nodes TEXT NOT NULL, '
+            'PRIMARY KEY (personroot, category));'
+        )
+
+    def take(self, faculty, ricgraph=None):
+        """Walks the person-roots of a faculty and replaces the snapshot of that faculty."""
+        ricgraph = ricgraph or RicgraphClient()
+        personroots = ricgraph.personroots(faculty)
+
+        def fetch(personroot_key):
+            try:
+                return ricgraph.get('get_all_neighbor_nodes',
+                                    {'key': personroot_key, 'max_nr_items': NEIGHBOR_MAX_NR_ITEMS})
+            except (requests.RequestException, ValueError) as e:
+                logging.error(f"Error fetching neighbor nodes for {personroot_key}: {e}")
+                return None
+
+        keys = []
+        failed = []
+        rows = []
+        for personroot_key, neighbors in ricgraph.map_personroots(personroots, fetch):
+            keys.append(personroot_key)
+            if neighbors is None:
+                # not stored, so the scripts fetch this person-root from Ricgraph
+                failed.append((personroot_key,))
+                continue
+            by_category = defaultdict(list)
+            for node in neighbors:
+                by_category[node.get('category')].append(node)
+            rows.extend((personroot_key, category, json.dumps(by_category[category]))
+                        for category in SNAPSHOT_CATEGORIES)
+
+        with self._lock:
+            self._db.execute('BEGIN')
+            # the nodes of the previous person-roots of the faculty that no other faculty has, and
+            # the old nodes of the person-roots that failed, must not be read from the snapshot
+            self._db.execute('DELETE FROM nodes WHERE personroot IN (SELECT personroot FROM personroots WHERE faculty = ?) '
+                             'AND personroot NOT IN (SELECT personroot FROM personroots WHERE faculty != ?)',
+                             (faculty, faculty))
+            self._db.executemany('DELETE FROM nodes WHERE personroot = ?', failed)
+            self._db.execute('DELETE FROM personroots WHERE faculty = ?', (faculty,))
+            self._db.executemany('INSERT INTO personroots (faculty, position, personroot) VALUES (?, ?, ?)',
+                                 [(faculty, position, key) for position, key in enumerate(keys)])
+            self._db.executemany('INSERT OR REPLACE INTO nodes (personroot, category, nodes) VALUES (?, ?, ?)', rows)
+            self._db.execute('INSERT OR REPLACE INTO faculties (faculty, taken_at) VALUES (?, ?)', (faculty, time.time()))
+            self._db.execute('COMMIT')
+        logging.info(f"Ricgraph snapshot of {faculty}: {len(keys)} person-roots, {len(failed)} not stored")
+
+    def faculties(self):
+        """Returns the faculty keys in the snapshot."""
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT faculty FROM faculties ORDER BY faculty')]
+
+    def taken_at(self, faculty):
+        """Returns the time (epoch seconds) the snapshot of a faculty was taken, or None."""
+        with self._lock:
+            row = self._db.execute('SELECT taken_at FROM faculties WHERE faculty = ?', (faculty,)).fetchone()
+        return row[0] if row else None
+
+    def personroots(self, faculty):
+        """Returns the person-roots of a faculty as nodes ({'_key': ...}), or None if it is not in the snapshot."""
+        if self.taken_at(faculty) is None:
+            return None
+        with self._lock:
+            rows = self._db.execute('SELECT personroot FROM personroots WHERE faculty = ? ORDER BY position',
+                                    (faculty,)).fetchall()
+        return [{'_key': row[0]} for row in rows]
+
+    def neighbor_nodes(self, personroot_key, category_want):
+        """Returns the stored neighbor nodes of a person-root, or None if they are not in the snapshot."""
+        with self._lock:
+            row = self._db.execute('SELECT nodes FROM nodes WHERE personroot = ? AND category = ?',
+                                   (personroot_key, category_want)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class SnapshotRicgraphClient(RicgraphClient):
+    """
+    RicgraphClient that answers from a RicgraphSnapshot. Faculties, person-roots and categories
+    that are not in the snapshot are fetched from Ricgraph as usual.
+    """
+
+    def __init__(self, snapshot, **kwargs):
+        super().__init__(**kwargs)
+        self.snapshot = snapshot
+
+    def select_faculties(self, faculty_choice):
+        if faculty_choice.lower() == 'all' and self.snapshot.faculties():
+            return self.snapshot.faculties()
+        return super().select_faculties(faculty_choice)
+
+    def personroots(self, faculty_key, max_nr_items='0'):
+        personroots = self.snapshot.personroots(faculty_key)
+        if personroots is None:
+            logging.info(f"Faculty {faculty_key} is not in the Ricgraph snapshot, fetching it from Ricgraph")
+            return super().personroots(faculty_key, max_nr_items)
+        limit = int(max_nr_items or 0)
+        return personroots[:limit] if limit > 0 else personroots
+
+    def neighbor_nodes(self, key, category_want):
+        nodes = self.snapshot.neighbor_nodes(key, category_want)
+        if nodes is None:
+            return super().neighbor_nodes(key, category_want)
+        return nodes
+
+
+def use_snapshot(path=RICGRAPH_SNAPSHOT_PATH):
+    """Makes get_ricgraph_client() of this process answer from the snapshot at path."""
+    logging.info(f"Reading Ricgraph from the snapshot {path}")
+    set_ricgraph_client(SnapshotRicgraphClient(RicgraphSnapshot(path)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Take a snapshot of faculties in Ricgraph')
+    parser.add_argument('faculty_choice', type=str, nargs='?',
+                        default='uu faculty: information & technology services|organization_name',
+                        help='Faculty choice or "all"')
+    parser.add_argument('--path', type=str, default=RICGRAPH_SNAPSHOT_PATH, help='Location of the snapshot file')
+    args = parser.parse_args()
+
+    logger = setup_logging('ricgraph_snapshot', level=logging.INFO)
+    # the snapshot is always taken from live Ricgraph, not from the neighbor node cache
+    ricgraph = RicgraphClient()
+    snapshot = RicgraphSnapshot(args.path)
+    for faculty in ricgraph.select_faculties(args.faculty_choice):
+        snapshot.take(faculty, ricgraph)
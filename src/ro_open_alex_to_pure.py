@@ -38,7 +38,10 @@ def get_dois_from_csv(filename):
 
 dois = get_dois_from_csv('output.csv')
 
-responses = openalex_utils.get_jsons_from_open_alex(dois)
-df, errors = openalex_utils.transform_openalex_to_df(responses)
-pure_researchoutputs.df_to_pure(df)
-print(df.head(), errors.head())
\ No newline at end of file
+# the works are read lazily from the harvest file and processed in DataFrames of at most CHUNK_SIZE rows
+works = openalex_utils.get_jsons_from_open_alex(dois)
+rejects = openalex_utils.Rejects()
+for df in openalex_utils.iter_openalex_chunks(works, rejects=rejects):
+    pure_researchoutputs.df_to_pure(df, 'no')
+    print(df.head())
+print(rejects.to_df().head())
@@ -0,0 +1,91 @@
+# ########################################################################
+#
+# Sharding - runs the fetching and submission of a run in several
+# processes, each with a shard of the DOIs (or persons) of the run
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import hashlib
+import logging
+import logging.handlers
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import rate_limiter
+
+
+def shard_of(key, shards):
+    """Returns the shard (0 .. shards - 1) of a DOI or uuid; stable between runs and processes."""
+    digest = hashlib.md5(str(key).lower().encode('utf-8')).hexdigest()
+    return int(digest, 16) % shards
+
+
+def split(keys, shards):
+    """Splits keys in `shards` lists on hash, keeping the order of keys within each shard."""
+    parts = [[] for _ in range(shards)]
+    for key in keys:
+        parts[shard_of(key, shards)].append(key)
+    return parts
+
+
+def _init_worker(queue, level, processes):
+    # the processes share the rate limit of every host
+    rate_limiter.share(processes)
+    # all records of the worker go to the queue, the parent writes them to its own handlers
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(queue))
+    root.setLevel(level)
+
+
+def run_sharded(func, shards, processes, *args):
+    """
+    Calls func(shard, index, *args) for every shard in a pool of `processes` processes.
+
+    The processes are started with 'spawn', so every shard has its own Pure and Ricgraph clients
+    and connection pools. Every process gets 1/processes of the rate limit of each host, so the
+    run as a whole keeps to the configured limits. Lookups that create entities (external persons)
+    are deduplicated between the processes by the claims in the shared lookups database.
+    Log records of the shards are written by the handlers of this process.
+    func must be a module level function.
+
+    Returns:
+    - list: the results of the shards in the order of shards; None for a shard that failed.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    root = logging.getLogger()
+    listener = logging.handlers.QueueListener(queue, *root.handlers, respect_handler_level=True)
+    listener.start()
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_init_worker, initargs=(queue, root.level, processes)) as executor:
+            futures = [executor.submit(func, shard, index, *args) for index, shard in enumerate(shards)]
+            for index, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logging.error(f"Shard {index} failed: {e}")
+                    results.append(None)
+    finally:
+        listener.stop()
+    return results
+
+
+def merge_counts(results):
+    """Adds up the counters returned by the shards; failed shards are counted as 'failed shards'."""
+    totals = Counter()
+    for index, counts in enumerate(results):
+        if counts is None:
+            totals['failed shards'] += 1
+            continue
+        logging.info(f"Shard {index}: {dict(counts)}")
+        totals.update(counts)
+    return totals
@@ -0,0 +1,66 @@
+# ########################################################################
+#
+# Sync state - per faculty record of the DOIs handled by earlier runs, so
+# a rerun only processes new and previously failed DOIs
+#
+# ########################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 David Grote Beverborg
+# ########################################################################
+
+import threading
+import time
+from doi_utils import normalize_doi
+from response_cache import open_database
+from config import SYNC_STATE_PATH
+
+CREATED = 'created'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+# DOIs with these statuses are not processed again (unless a full rescan is asked for)
+HANDLED = (CREATED, SKIPPED)
+
+
+class SyncState:
+    """
+    Records per faculty and (normalized) DOI the status of the last run that processed it
+    (created, skipped or failed), the reason and when, in a sqlite database.
+    """
+
+    def __init__(self, path=SYNC_STATE_PATH):
+        self._lock = threading.Lock()
+        self._db = open_database(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS sync (faculty TEXT NOT NULL, doi TEXT NOT NULL, '
+                         'status TEXT NOT NULL, reason TEXT, updated REAL NOT NULL, PRIMARY KEY (faculty, doi))')
+
+    def record(self, faculty, doi, status, reason=None):
+        self.record_many([(faculty, doi, status, reason)])
+
+    def record_many(self, rows):
+        """Records (faculty, doi, status, reason) rows; an earlier status of the same DOI is replaced."""
+        now = time.time()
+        rows = [(faculty, normalize_doi(doi), status, reason, now) for faculty, doi, status, reason in rows]
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO sync (faculty, doi, status, reason, updated) '
+                                 'VALUES (?, ?, ?, ?, ?)', rows)
+
+    def status(self, faculty, doi):
+        """Returns (status, reason, updated) of a DOI in a faculty, or None if it was never processed."""
+        with self._lock:
+            return self._db.execute('SELECT status, reason, updated FROM sync WHERE faculty = ? AND doi = ?',
+                                    (faculty, normalize_doi(doi))).fetchone()
+
+    def handled(self, faculties):
+        """Returns the normalized DOIs that were created or skipped in any of the faculties."""
+        faculties = list(faculties)
+        if not faculties:
+            return set()
+        placeholders = ', '.join('?' * len(faculties))
+        with self._lock:
+            rows = self._db.execute(f'SELECT doi FROM sync WHERE faculty IN ({placeholders}) '
+                                    f'AND status IN ({", ".join("?" * len(HANDLED))})',
+                                    faculties + list(HANDLED)).fetchall()
+        return {row[0] for row in rows}
@@ -4,9 +4,15 @@ import logging
 import requests
 import datacite_utils
 import pure_datasets as puda
+import person_index
+import sharding
 import sys
 import argparse
-from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL
+from collections import Counter
+import ricgraph_snapshot
+from ricgraph_client import get_ricgraph_client, DoiSet, node_doi
+from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL, RICGRAPH_SNAPSHOT_PATH, \
+    PURE_ASYNC_CONTRIBUTORS
 from logging_config import setup_logging
 
 logger = setup_logging('update datasets', level=logging.INFO)
@@ -25,71 +31,30 @@ def print_faculty_list(faculty_list):
         print(f"{idx}. {faculty['value']}")
     print("all. All Faculties")
 
-def fetch_personroots(faculty_key):
-    """Fetch person-root nodes for a given faculty."""
-    try:
-        params = {'key': faculty_key, 'max_nr_items': '9999'}
-        response = requests.get('http://127.0.0.1:3030/api/get_all_personroot_nodes', params=params)
-        response.raise_for_status()
-        return response.json().get("results", [])
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person-roots for faculty {faculty_key}: {e}")
-        return []
-
-def select_faculties(faculty_choice):
-    params = {
-        'value': 'uu faculty',
-    }
-
-    response = requests.get('http://127.0.0.1:3030/api/organization/search', params=params)
-    data = response.json()
-
-
-    if faculty_choice.lower() == 'all':
-        selected_faculties = [item['_key'] for item in data["results"]]
-    else:
-        selected_faculties = [faculty_choice]
-
-    return selected_faculties
-
 def select_persons_datasets(faculties):
-    persons = []
-
+    """
+    Returns a DoiSet with the DOIs of the datasets of the person-roots of the faculties; every DOI
+    is in the set once, with the person-roots and source systems it was found with.
+    """
+    ricgraph = get_ricgraph_client()
+    data = DoiSet()
 
     for faculty in faculties:
         logging.info(f"Processing faculty: {faculty}")
 
-        personroots = fetch_personroots(faculty)
-        data = []
-        for persoonroot in personroots:
-            if not persoonroot['_key'] == None:
-                persoonroot_key = persoonroot['_key']
-                datasets = select_datasets(persoonroot_key)
-
-                for set in datasets:
+        personroots = ricgraph.personroots(faculty, max_nr_items='9999')
+        # the person-roots are fetched in parallel, but processed in order
+        for persoonroot_key, datasets in ricgraph.map_personroots(personroots, ricgraph.datasets):
+            for set in datasets:
 
+                doi = node_doi(set)
+                if doi not in data:
                     print(set["_key"], set["_source"])
-                    doi = set["_key"].split("|")[0]
-                    data.append(doi)
+                data.add(doi, persoonroot_key, set["_source"], faculty)
 
     return data
 
 
-def select_datasets(persoonroot_key):
-
-
-    """Fetch person IDs for a given person-ro    ot."""
-    try:
-
-        params = {'key': persoonroot_key, 'category_want': 'data set'}
-
-        response = requests.get('http://127.0.0.1:3030/api/get_all_neighbor_nodes', params=params)
-
-        # response.raise_for_status()
-        return response.json().get("results", [])
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person IDs for person-root {persoonroot_key}: {e}")
-        return []
 def test_or_not(datasets):
     number_of_datasets = len(datasets)
     print(f"{number_of_datasets} are not in pure but are in ricgraph")
@@ -98,26 +63,25 @@ def test_or_not(datasets):
     return choice
 
 
-def main(faculty_choice, test_choice):
-    # Set logging level to INFO for this script
-    logger = setup_logging('update_datasets_from_ricgraph', level=logging.INFO)
-    logger.info("Script to update datasets in pure from ricgraph has started")
-    faculties = select_faculties(faculty_choice)
+def process_dois(dois, shard, test_choice, async_contributors=PURE_ASYNC_CONTRIBUTORS):
+    """
+    Fetches the datasets with these DOIs from DataCite and creates the ones that are not yet in Pure.
+    Also runs a shard of a sharded run in a worker process (see sharding.run_sharded).
+    With async_contributors the contributors of a dataset are resolved concurrently (see pure_async.py).
 
-    datasets = select_persons_datasets(faculties)
-    # datasets = select_datasets(persons)
-
-    # test = test_or_not(datasets)
-    df = datacite_utils.get_df_from_datacite(datasets)
+    Returns:
+    - Counter: number of datasets created and skipped.
+    """
+    df = datacite_utils.get_df_from_datacite(list(dois))
 
     # Define the file path
-    print("downloaded all datasets to excel in datasets.xlsx")
-    file_path = "datasets.xlsx"
+    file_path = "datasets.xlsx" if shard is None else f"datasets_{shard}.xlsx"
+    print(f"downloaded all datasets to excel in {file_path}")
     # Save the dataframe to an Excel file
     df.to_excel(file_path, index=False)
 
-    created = 0
-    ignored = 0
+    counts = Counter(created=0, skipped=0)
+    resolve = puda.get_contributors_details_async if async_contributors else puda.get_contributors_details
     for _, row in df.iterrows():
 
         already_in_pure = puda.find_dataset(None, row['doi'])
@@ -125,10 +89,10 @@ def main(faculty_choice, test_choice):
         if already_in_pure:
             logging.info(f"dataset with doi: {row['doi']}, already in pure")
             print("skipped ", row['doi'], ' , is already in pure')
-            ignored += 1
+            counts['skipped'] += 1
         else:
             print(row['persons'])
-            contributors_details = puda.get_contributors_details(row['persons'], row['publication_year'], row['title'], test_choice)
+            contributors_details = resolve(row['persons'], row['publication_year'], row['title'], test_choice)
             if contributors_details and not already_in_pure:
                 row['parsed_contributors'] = puda.format_contributors(contributors_details)
                 row['parsed_organizations'], row['managing_org'] = puda.format_organizations_from_contributors(
@@ -140,13 +104,39 @@ def main(faculty_choice, test_choice):
                     uuid_ds = puda.create_dataset(dataset_json)
                     if not uuid_ds == 'error':
                         print('created dataset: ', uuid_ds)
-                        created += 1
+                        counts['created'] += 1
                     else:
-                        ignored += 1
+                        counts['skipped'] += 1
                         print('error creating dataset: ', row['title'])
             else:
-                ignored += 1
-    print(f"Process completed. created datasets: {created}, skipped: {ignored}")
+                counts['skipped'] += 1
+    return counts
+
+
+def main(faculty_choice, test_choice, processes=1, async_contributors=PURE_ASYNC_CONTRIBUTORS):
+    # Set logging level to INFO for this script
+    logger = setup_logging('update_datasets_from_ricgraph', level=logging.INFO)
+    logger.info("Script to update datasets in pure from ricgraph has started")
+    faculties = get_ricgraph_client().select_faculties(faculty_choice)
+    # persons are resolved from the local index where possible
+    person_index.refresh_person_index()
+
+    datasets = select_persons_datasets(faculties)
+    logger.info(f"DOIs of datasets in Ricgraph: {datasets.raw} found, {len(datasets)} unique")
+    # datasets = select_datasets(persons)
+
+    # test = test_or_not(datasets)
+    if processes > 1:
+        # every DOI is in exactly one shard, so a DOI of several faculties is still created once
+        shards = sharding.split(datasets, processes)
+        logger.info(f"Processing {len(datasets)} DOIs in {processes} processes")
+        counts = sharding.merge_counts(sharding.run_sharded(process_dois, shards, processes, test_choice,
+                                                            async_contributors))
+    else:
+        counts = process_dois(datasets, None, test_choice, async_contributors)
+
+    print(f"Process completed. DOIs found: {datasets.raw}, unique: {len(datasets)}, "
+          f"created datasets: {counts['created']}, skipped: {counts['skipped']}")
 
 # ########################################################################
 # MAIN
@@ -158,7 +148,15 @@ if __name__ == '__main__':
                         default='uu faculty: information & technology services|organization_name',
                         help='Faculty choice or "all"')
     parser.add_argument('test_choice', type=str, nargs='?', default='yes', help='Run in test mode ("yes" or "no")')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Number of processes the DOIs are sharded over (1 => no sharding)')
+    parser.add_argument('--snapshot', type=str, nargs='?', const=RICGRAPH_SNAPSHOT_PATH, default=None,
+                        help='Read Ricgraph from the snapshot taken with ricgraph_snapshot.py (optionally its path)')
+    parser.add_argument('--async-contributors', action='store_true', default=PURE_ASYNC_CONTRIBUTORS,
+                        help='Resolve the contributors of a dataset concurrently')
 
     args = parser.parse_args()
+    if args.snapshot:
+        ricgraph_snapshot.use_snapshot(args.snapshot)
     print('test:', args.test_choice)
-    main(args.faculty_choice, args.test_choice)
+    main(args.faculty_choice, args.test_choice, args.processes, args.async_contributors)
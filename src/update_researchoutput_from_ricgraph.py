@@ -1,10 +1,20 @@
 import logging
 import argparse
+from collections import Counter
+import pandas as pd
 import openalex_utils
 import requests
 import pure_researchoutputs as pure
+import person_index
+import sharding
+import sync_state
+from doi_utils import normalize_doi
+from openalex_client import get_openalex_client
+import ricgraph_snapshot
+from ricgraph_client import get_ricgraph_client, DoiSet, node_doi
 from logging_config import setup_logging
-from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL
+from config import PURE_BASE_URL, PURE_API_KEY, PURE_HEADERS, RIC_BASE_URL, OPENALEX_HEADERS, OPENALEX_BASE_URL, PURE_WORKERS, RICGRAPH_SNAPSHOT_PATH, \
+    PURE_ASYNC_CONTRIBUTORS
 
 # steps:
 # - get list of faculties
@@ -20,83 +30,41 @@ def print_faculty_list(faculty_list):
         print(f"{idx}. {faculty['value']}")
     print("all. All Faculties")
 
-def fetch_personroots(faculty_key):
-    """Fetch person-root nodes for a given faculty."""
-    try:
-        params = {'key': faculty_key, 'max_nr_items': '0'}
-        url = RIC_BASE_URL + 'get_all_personroot_nodes'
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json().get("results", [])
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person-roots for faculty {faculty_key}: {e}")
-        return []
-
-def select_faculties(faculty_choice):
-    params = {
-        'value': 'uu faculty',
-    }
-
-    response = requests.get('http://127.0.0.1:3030/api/organization/search', params=params)
-    data = response.json()
-
-    if faculty_choice.lower() == 'all':
-        selected_faculties = [item['_key'] for item in data["results"]]
-    else:
-        selected_faculties = [faculty_choice]
-
-    return selected_faculties
-
-
-
 def select_persons_researchoutput(selected_faculties):
-    persons = []
+    """
+    Returns the DOIs of the research outputs of the person-roots of the selected faculties as three
+    DoiSets: not yet in Pure, already in Pure, and all. Every DOI is in a set once, with the
+    person-roots and source systems it was found with.
+    """
+    ricgraph = get_ricgraph_client()
     print("You have selected:")
-    new_data = []
-    duplicates = []
-    all_data = []
+    all_data = DoiSet()
     for faculty in selected_faculties:
         print(faculty)
 
         logging.info(f"Processing faculty: {faculty}")
 
-        personroots = fetch_personroots(faculty)
-
+        personroots = ricgraph.personroots(faculty)
 
-        for personroot in personroots:
-            logging.info(f"RICgraph - Processing person: {personroot}")
 
-            if not personroot['_key'] == None:
-                personroot_key = personroot['_key']
+        # the person-roots are fetched in parallel, but processed in order
+        for personroot_key, outputs in ricgraph.map_personroots(personroots, ricgraph.research_outputs):
+            logging.info(f"RICgraph - Processing person: {personroot_key}")
 
-                outputs = select_researchoutputs(personroot_key)
-                for output in outputs:
-                    doi = 'doi.org/' + output["_key"].split("|")[0]
-                    all_data.append(doi)
+            for output in outputs:
+                doi = 'doi.org/' + node_doi(output)
+                if doi in all_data:
+                    logging.info(f"RICgraph - Publication {doi} already selected")
+                else:
                     logging.info(f"RICgraph - Processing publication: {doi}")
-                    if 'Pure-uu' not in output["_source"]:
-                        new_data.append(doi)
-                        print(output["_key"], output["_source"])
+                    print(output["_key"], output["_source"])
+                all_data.add(doi, personroot_key, output["_source"], faculty)
 
-                    else:
-                        duplicates.append(doi)
-                        print(output["_key"], ' already in pure')
+    new_data = all_data.filter(lambda entry: 'Pure-uu' not in entry['sources'])
+    duplicates = all_data.filter(lambda entry: 'Pure-uu' in entry['sources'])
     return new_data, duplicates, all_data
 
 
-def select_researchoutputs(persoonroot_key):
-    """Fetch person IDs for a given person-ro    ot."""
-    try:
-        params = {'key': persoonroot_key, 'category_want': 'journal article'}
-        response = requests.get('http://127.0.0.1:3030/api/get_all_neighbor_nodes', params=params)
-        # response.raise_for_status()
-        return response.json().get("results", [])
-
-    except requests.RequestException as e:
-        logging.error(f"Error fetching person IDs for person-root {persoonroot_key}: {e}")
-        return []
-
-
 def test_or_not(researchoutputs, duplicates, all_data):
     number_of_researchoutput = len(researchoutputs)
     print(f"{len(all_data)} are in ricgraph")
@@ -106,38 +74,133 @@ def test_or_not(researchoutputs, duplicates, all_data):
     choice = input("enter yes or no ")
     return choice
 
-def main(faculty_choice, test_choice):
+def process_dois(dois, shard, test_choice, workers, faculties_of=None, provenance=None,
+                 async_contributors=PURE_ASYNC_CONTRIBUTORS):
+    """
+    Fetches the research outputs with these DOIs from OpenAlex and creates them in Pure.
+    Also runs a shard of a sharded run in a worker process (see sharding.run_sharded).
+
+    Parameters:
+    - dois (iterable): DOIs ('doi.org/...') to process.
+    - shard (int or None): Number of the shard when the run is sharded (used in the name of ro.xlsx).
+    - faculties_of (dict, optional): Normalized DOI => faculties it was found for. If given (and this is
+      not a test run) the status of every DOI is recorded per faculty in the sync state as soon as it
+      is known. Failed OpenAlex and Pure lookups are recorded as failed, so the next run retries them.
+    - provenance (DoiSet, optional): Where the DOIs were found, used in the log of failed DOIs.
+    - async_contributors (bool): Resolve the contributors of an output concurrently (see pure_async.py).
+
+    Returns:
+    - Counter: number of research outputs per status of df_to_pure, plus 'not in openalex'.
+    """
+    dois = list(dois)
+    not_found = 0
+    # the status of a DOI is recorded as soon as it is known, so an interrupted run keeps what it did
+    state = sync_state.SyncState() if faculties_of is not None and test_choice == 'no' else None
+    recorded = set()
+
+    def record(doi, status, reason):
+        key = normalize_doi(doi)
+        recorded.add(key)
+        if state is not None and status != 'tested':
+            state.record_many((faculty, key, status, reason) for faculty in faculties_of.get(key, []))
+
+    # OpenAlex id => DOI of the works found, to record the works the transform rejects
+    found = {}
+
+    def found_works():
+        nonlocal not_found
+        # up to 50 DOIs per OpenAlex request, in the order of dois
+        for doi, openalex_data, error in get_openalex_client().iter_works(dois):
+            if openalex_data is not None:
+                found[openalex_data.get('id')] = doi
+                yield openalex_data
+                continue
+            not_found += 1
+            record(doi, sync_state.FAILED, error)
+            print(f"Failed to retrieve data for DOI: {doi}")
+            found_for = provenance.provenance(doi)['personroots'] if provenance is not None else ''
+            logging.warning(f"Failed to retrieve data for DOI {doi} ({error}) {found_for}")
+
+    # the works are written to the harvest file while they arrive and read back one by one
+    harvest = openalex_utils.harvest_path("ro_openalex" if shard is None else f"ro_openalex_{shard}")
+    openalex_utils.write_harvest(found_works(), harvest)
+
+    def on_result(status, row, reason):
+        record(row['doi'], status, reason)
+
+    rejects = openalex_utils.Rejects()
+
+    def record_rejects():
+        for openalex_id, reason in rejects:
+            if openalex_id in found:
+                # OpenAlex has the work, but without all needed fields
+                record(found[openalex_id], sync_state.SKIPPED, f'{reason} in OpenAlex')
+        rejects.items.clear()
+
+    # the works are transformed and processed in DataFrames of at most CHUNK_SIZE rows, which are
+    # appended to the Excel file
+    file_path = "ro.xlsx" if shard is None else f"ro_{shard}.xlsx"
+    print(f"downloaded all publications in {harvest}, writing them to {file_path}")
+    counts = Counter()
+    with pd.ExcelWriter(file_path) as writer:
+        startrow = 0
+        for df in openalex_utils.iter_openalex_chunks(openalex_utils.read_harvest(harvest), rejects=rejects):
+            df.to_excel(writer, index=False, header=startrow == 0, startrow=startrow)
+            startrow += len(df) + (startrow == 0)
+            record_rejects()
+            for doi in df.loc[df['journal_issn'].isna(), 'doi']:
+                record(doi, sync_state.SKIPPED, 'no journal ISSN')
+            df = df.dropna(subset=['journal_issn'])
+            counts.update(pure.df_to_pure(df, test_choice, workers, on_result, async_contributors))
+        if startrow == 0:
+            # no work could be transformed, the Excel file is empty
+            pd.DataFrame().to_excel(writer, index=False)
+    record_rejects()
+    counts['not in openalex'] += not_found
+
+    for doi in dois:
+        if normalize_doi(doi) not in recorded:
+            # the outcome of this DOI is unknown, so the next run processes it again
+            record(doi, sync_state.FAILED, 'not processed')
+    return counts
+
+
+def main(faculty_choice, test_choice, workers=PURE_WORKERS, processes=1, full=False,
+         async_contributors=PURE_ASYNC_CONTRIBUTORS):
     # Set logging level to INFO for this script
     logger = setup_logging('update_researchoutput_from_ricgraph', level=logging.INFO)
     logger.info("Script to update researchoutput in pure from ricgraph has started")
 
-    faculties = select_faculties(faculty_choice)
+    faculties = get_ricgraph_client().select_faculties(faculty_choice)
+    # persons are resolved from the local index where possible
+    person_index.refresh_person_index()
 
     researchoutputs, duplicates, all_data = select_persons_researchoutput(faculties)
+    logger.info(f"DOIs in Ricgraph: {all_data.raw} found, {len(all_data)} unique")
+    logger.info(f"DOIs not in Pure: {researchoutputs.raw} found, {len(researchoutputs)} unique")
+    logger.info(f"DOIs already in Pure: {duplicates.raw} found, {len(duplicates)} unique")
     # test = test_or_not(researchoutputs, duplicates, all_data)
 
-    all_openalex_data = []
-
-    # Loop through each DOI and make a request
-    for doi in researchoutputs:
-        url = OPENALEX_BASE_URL + doi
-        response = requests.get(url, headers=OPENALEX_HEADERS)
-
-        if response.status_code == 200:
-            openalex_data = response.json()
-            all_openalex_data.append(openalex_data)
-        else:
-            print(f"Failed to retrieve data for DOI: {doi}")
-
-    df, errors = openalex_utils.transform_openalex_to_df(all_openalex_data)
+    if not full:
+        # DOIs created or skipped by an earlier run are not processed again, failed ones are retried
+        handled = sync_state.SyncState().handled(faculties)
+        new = researchoutputs.filter(lambda entry: normalize_doi(entry['doi']) not in handled)
+        logger.info(f"DOIs handled by an earlier run: {len(researchoutputs) - len(new)}, to process: {len(new)}")
+        researchoutputs = new
+    faculties_of = {normalize_doi(doi): researchoutputs.provenance(doi)['faculties'] for doi in researchoutputs}
+
+    if processes > 1:
+        # every DOI is in exactly one shard, so a DOI of several faculties is still created once
+        shards = sharding.split(researchoutputs, processes)
+        logger.info(f"Processing {len(researchoutputs)} DOIs in {processes} processes")
+        counts = sharding.merge_counts(sharding.run_sharded(process_dois, shards, processes, test_choice, workers,
+                                                            faculties_of, None, async_contributors))
+    else:
+        counts = process_dois(researchoutputs, None, test_choice, workers, faculties_of, researchoutputs,
+                              async_contributors)
 
-    # Define the file path
-    print("downloaded all publications in ro.xlsx")
-    file_path = "ro.xlsx"
-    # Save the dataframe to an Excel file
-    df.to_excel(file_path, index=False)
-    df = df.dropna(subset=['journal_issn'])
-    pure.df_to_pure(df, test_choice)
+    logger.info(f"Summary: DOIs found {all_data.raw}, unique {len(all_data)}, processed {len(researchoutputs)}, "
+                f"research outputs {dict(counts)}")
     logger.info("Script to update researchoutput in pure from ricgraph has ended")
 
 # ########################################################################
@@ -150,6 +213,18 @@ if __name__ == '__main__':
                         default='uu faculty: information & technology services|organization_name',
                         help='Faculty choice or "all"')
     parser.add_argument('test_choice', type=str, nargs='?', default='yes', help='Run in test mode ("yes" or "no")')
+    parser.add_argument('--full', action='store_true',
+                        help='Process all DOIs, also the ones created or skipped by an earlier run')
+    parser.add_argument('--snapshot', type=str, nargs='?', const=RICGRAPH_SNAPSHOT_PATH, default=None,
+                        help='Read Ricgraph from the snapshot taken with ricgraph_snapshot.py (optionally its path)')
+    parser.add_argument('--workers', type=int, default=PURE_WORKERS,
+                        help='Number of research outputs processed at the same time')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Number of processes the DOIs are sharded over (1 => no sharding)')
+    parser.add_argument('--async-contributors', action='store_true', default=PURE_ASYNC_CONTRIBUTORS,
+                        help='Resolve the contributors of a research output concurrently')
 
     args = parser.parse_args()
-    main(args.faculty_choice, args.test_choice)
+    if args.snapshot:
+        ricgraph_snapshot.use_snapshot(args.snapshot)
+    main(args.faculty_choice, args.test_choice, args.workers, args.processes, args.full, args.async_contributors)
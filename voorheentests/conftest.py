@@ -0,0 +1,110 @@
+"""
+Shared fakes of the Pure client and of the http sessions of the OpenAlex and Ricgraph clients,
+so the tests do not call the apis.
+
+The fixtures return factories:
+- fake_client(items): Pure client that answers every search with items and every PUT with a new uuid.
+- fake_session(respond): session whose get(url, params) is recorded in .calls and answered by respond(url, params).
+- openalex_session(known, status_code): fake_session that answers like the works endpoint of OpenAlex
+  for the DOIs in known.
+- ricgraph_session(nodes): fake_session that answers like the Ricgraph api with the nodes(url, params).
+"""
+import json
+import threading
+import pytest
+import requests
+
+
+class FakeResponse:
+    """Response with the attributes the code under test uses: status_code, text, json() and raise_for_status()."""
+
+    def __init__(self, data=None, status_code=200, text=''):
+        self.data = data
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+class FakeClient:
+    """
+    Pure client that answers every search with `items` and every PUT with a new uuid ('ext-1', 'ext-2', ...).
+    The searches and PUTs are counted (and the PUT bodies kept), also when several workers share the client.
+    """
+
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.searches = 0
+        self.puts = 0
+        self.put_bodies = []
+        self._lock = threading.Lock()
+
+    def post(self, path, **kwargs):
+        with self._lock:
+            self.searches += 1
+        return FakeResponse({"count": len(self.items), "items": self.items})
+
+    def put(self, path, **kwargs):
+        with self._lock:
+            self.puts += 1
+            self.put_bodies.append(json.loads(kwargs['data']) if 'data' in kwargs else kwargs.get('json'))
+            return FakeResponse({"uuid": f"ext-{self.puts}"}, 201)
+
+
+class FakeSession:
+    """Session that records every get as (url, params) and answers it with respond(url, params)."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None):
+        with self._lock:
+            self.calls.append((url, dict(params) if params is not None else None))
+        return self.respond(url, params)
+
+
+def openalex_work(doi):
+    return {'id': 'W' + doi, 'doi': 'https://doi.org/' + doi}
+
+
+def openalex_works(known, status_code=200):
+    """Returns a respond function for FakeSession that answers like the works endpoint for the DOIs in known."""
+
+    def respond(url, params):
+        if status_code != 200:
+            return FakeResponse(status_code=status_code)
+        if 'filter' not in params:
+            doi = url.split('doi.org/', 1)[1]
+            return FakeResponse(openalex_work(doi)) if doi in known else FakeResponse(status_code=404)
+        dois = params['filter'][len('doi:'):].split('|')
+        # OpenAlex returns the works in its own order
+        return FakeResponse({'results': [openalex_work(doi) for doi in reversed(dois) if doi in known]})
+
+    return respond
+
+
+@pytest.fixture
+def fake_client():
+    return FakeClient
+
+
+@pytest.fixture
+def fake_session():
+    return FakeSession
+
+
+@pytest.fixture
+def openalex_session():
+    return lambda known, status_code=200: FakeSession(openalex_works(known, status_code))
+
+
+@pytest.fixture
+def ricgraph_session():
+    return lambda nodes: FakeSession(lambda url, params: FakeResponse({"results": nodes(url, params)}))
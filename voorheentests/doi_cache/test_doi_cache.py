@@ -0,0 +1,57 @@
+"""
+Tests for the DOI cache.
+
+Metadata is cached per source and normalized DOI, expires after max_age, the least recently used
+DOIs are removed when the cache grows over max_size, and offline mode ignores the age.
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to sys.path to find doi_cache
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from doi_cache import DoiCache, OPENALEX, DATACITE
+
+
+def test_metadata_is_keyed_by_normalized_doi_and_source(tmp_path):
+    path = str(tmp_path / 'doi_cache.sqlite')
+    cache = DoiCache(path, OPENALEX)
+    cache.set('https://doi.org/10.1/ABC', {'title': 'A title'})
+
+    assert cache.lookup('doi.org/10.1/abc') == (True, {'title': 'A title'})
+    assert DoiCache(path, OPENALEX).lookup('10.1/abc') == (True, {'title': 'A title'})
+    assert DoiCache(path, DATACITE).lookup('10.1/abc') == (False, None)
+
+
+def test_expired_metadata_is_served_in_offline_mode_only(tmp_path):
+    path = str(tmp_path / 'doi_cache.sqlite')
+    DoiCache(path, OPENALEX).set('10.1/abc', {'title': 'A title'})
+    time.sleep(0.05)
+
+    assert DoiCache(path, OPENALEX, max_age=0.01).lookup('10.1/abc') == (False, None)
+    assert DoiCache(path, OPENALEX, max_age=0.01, offline=True).lookup('10.1/abc') == (True, {'title': 'A title'})
+
+
+def test_least_recently_used_dois_are_evicted(tmp_path):
+    path = str(tmp_path / 'doi_cache.sqlite')
+    cache = DoiCache(path, OPENALEX)
+    cache.set('10.1/a', {'title': 'a'})
+    entry_size = cache.total_size()
+
+    cache = DoiCache(path, OPENALEX, max_size=2.5 * entry_size)
+    cache.set('10.1/b', {'title': 'b'})
+    time.sleep(0.01)
+    cache.lookup('10.1/a')
+    cache.set('10.1/c', {'title': 'c'})
+
+    assert cache.lookup('10.1/b') == (False, None)
+    assert cache.lookup('10.1/a')[0] and cache.lookup('10.1/c')[0]
+    assert cache.total_size() <= 2.5 * entry_size
+
+
+def test_setting_a_doi_again_does_not_grow_the_cache(tmp_path):
+    cache = DoiCache(str(tmp_path / 'doi_cache.sqlite'), OPENALEX)
+    for _ in range(3):
+        cache.set('10.1/a', {'title': 'a'})
+    assert cache._size == cache.total_size()
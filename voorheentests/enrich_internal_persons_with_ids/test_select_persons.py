@@ -0,0 +1,56 @@
+"""
+Tests for selecting the person-roots of the internal-person enrichment.
+
+In changed-only mode a person-root is skipped if Ricgraph's person/enrich has no suggestions
+and the hash of its id set is the same as at the previous run.
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find enrich_internal_persons_with_ids
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import enrich_internal_persons_with_ids as enrich
+
+
+class FakeRicgraph:
+    def __init__(self, personids, suggestions):
+        self.personids = personids
+        self.suggestions = suggestions
+
+    def personroots(self, faculty):
+        return [{'_key': key} for key in self.personids]
+
+    def check_enrichment(self, key):
+        return self.suggestions.get(key, [])
+
+    def person_ids(self, key):
+        return self.personids[key]
+
+    def map_personroots(self, personroots, fetch):
+        for personroot in personroots:
+            yield personroot['_key'], fetch(personroot['_key'])
+
+
+def test_id_set_hash_ignores_order():
+    a = [{'name': 'ORCID', 'value': '1'}, {'name': 'PURE_UUID_PERS', 'value': 'u1'}]
+    assert enrich.id_set_hash(a) == enrich.id_set_hash(list(reversed(a)))
+    assert enrich.id_set_hash(a) != enrich.id_set_hash(a[:1])
+
+
+def test_changed_only_skips_unchanged_person_roots(monkeypatch, tmp_path):
+    personids = {
+        'root1': [{'name': 'PURE_UUID_PERS', 'value': 'u1'}, {'name': 'ORCID', 'value': '1'}],
+        'root2': [{'name': 'PURE_UUID_PERS', 'value': 'u2'}],
+        'root3': [{'name': 'PURE_UUID_PERS', 'value': 'u3'}],
+    }
+    ricgraph = FakeRicgraph(personids, {'root3': [{'_key': 'suggestion'}]})
+    monkeypatch.setattr(enrich, 'get_ricgraph_client', lambda: ricgraph)
+    monkeypatch.chdir(tmp_path)
+
+    previous = {key: enrich.id_set_hash(ids) for key, ids in personids.items()}
+    personids['root2'].append({'name': 'ORCID', 'value': '2'})
+
+    person_df, new_hashes = enrich.select_persons(['faculty'], changed_only=True, id_hashes=previous)
+    assert list(person_df['person_id']) == ['root2', 'root3']
+    assert set(new_hashes) == {'root2', 'root3'}
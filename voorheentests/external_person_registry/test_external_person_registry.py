@@ -0,0 +1,118 @@
+"""
+Tests for the external person registry.
+
+A co-author is keyed on ORCID or OpenAlex id when present and on the normalized name otherwise.
+Existing external persons in Pure are reused (found on id or, failing that, on name), and a co-author
+is created only once, with its ids, also when workers in several processes meet the same co-author.
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add src directory to sys.path to find external_person_registry
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import pytest
+import external_person_registry
+from external_person_registry import ExternalPersonRegistry, registry_key
+from local_store import PersistentMap
+from config import ID_URI
+
+
+@pytest.fixture
+def registry_for(tmp_path, monkeypatch):
+    monkeypatch.setattr(external_person_registry, 'get_person_index', lambda: None)
+    return lambda client: ExternalPersonRegistry(client, PersistentMap(str(tmp_path / 'lookups.sqlite'), 'external_person'))
+
+
+def test_registry_key():
+    assert registry_key('Jane', 'Smith', {'ORCID': 'https://orcid.org/0000-0002-1825-009x'}) == 'orcid:0000-0002-1825-009X'
+    assert registry_key('Jane', 'Smith', {'OpenAlex': 'https://openalex.org/A123'}) == 'openalex:A123'
+    assert registry_key(' Jane', 'SMITH ', {'OpenAlex': 'No OpenAlex ID'}) == 'name:jane smith'
+    assert registry_key(None, None) is None
+
+
+def test_co_author_is_created_once(registry_for, fake_client):
+    client = fake_client()
+    registry = registry_for(client)
+    assert registry.get_or_create('Jane', 'Smith') == 'ext-1'
+    assert registry.get_or_create('jane', 'smith') == 'ext-1'
+    assert client.puts == 1
+
+
+def test_existing_external_person_is_reused(registry_for, fake_client):
+    client = fake_client([{"uuid": "existing", "name": {"firstName": "Jane", "lastName": "Smith"}}])
+    registry = registry_for(client)
+    assert registry.get_or_create('Jane', 'Smith') == 'existing'
+    assert client.puts == 0
+
+
+def test_concurrent_workers_create_one_person(registry_for, fake_client):
+    client = fake_client()
+    registry = registry_for(client)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_or_create('Jane', 'Smith', {'ORCID': '0000-0002-1825-0097'})))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert set(results) == {'ext-1'}
+    assert client.puts == 1
+
+
+def test_ids_are_sent_when_created(registry_for, fake_client):
+    client = fake_client()
+    registry_for(client).get_or_create('Jane', 'Smith', {'ORCID': 'https://orcid.org/0000-0002-1825-0097',
+                                                        'OpenAlex': 'https://openalex.org/A123'})
+    identifiers = {entry['id'] for entry in client.put_bodies[0]['identifiers']}
+    assert identifiers == {'0000-0002-1825-0097', 'A123'}
+    assert client.put_bodies[0]['name'] == {'firstName': 'Jane', 'lastName': 'Smith'}
+
+
+def test_orcid_and_openalex_id_have_their_own_type():
+    data = external_person_registry.external_person_json('Jane', 'Smith', {'ORCID': '0000-0002-1825-0097',
+                                                                            'OpenAlex': 'A123'})
+    uris = {entry['id']: entry['type']['uri'] for entry in data['identifiers']}
+    assert uris == {'0000-0002-1825-0097': ID_URI['ORCID'], 'A123': ID_URI['OPENALEX']}
+    assert ID_URI['ORCID'] != ID_URI['OPENALEX']
+
+
+def test_id_miss_falls_back_to_name(registry_for, fake_client):
+    client = fake_client([{"uuid": "existing", "name": {"firstName": "Jane", "lastName": "Smith"}}])
+    assert registry_for(client).get_or_create('Jane', 'Smith', {'ORCID': '0000-0002-1825-0097'}) == 'existing'
+    assert client.puts == 0
+
+
+def test_name_match_with_other_id_is_not_reused(registry_for, fake_client):
+    client = fake_client([{"uuid": "other", "name": {"firstName": "Jane", "lastName": "Smith"},
+                           "orcid": "0000-0001-0000-0001"}])
+    assert registry_for(client).get_or_create('Jane', 'Smith', {'ORCID': '0000-0002-1825-0097'}) == 'ext-1'
+
+
+def test_processes_sharing_the_store_create_one_person(tmp_path, monkeypatch, fake_client):
+    # every registry has its own connection to the store, like the registries of the sharded processes
+    monkeypatch.setattr(external_person_registry, 'get_person_index', lambda: None)
+    client = fake_client()
+    put = client.put
+    client.put = lambda path, **kwargs: time.sleep(0.2) or put(path, **kwargs)
+    registries = [ExternalPersonRegistry(client, PersistentMap(str(tmp_path / 'lookups.sqlite'), 'external_person'))
+                  for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda registry=registry: results.append(registry.get_or_create('Jane', 'Smith')))
+               for registry in registries]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['ext-1'] * 4
+    assert client.puts == 1
+
+
+def test_stale_claim_is_taken_over(registry_for, fake_client, monkeypatch):
+    client = fake_client()
+    registry = registry_for(client)
+    assert registry.store.claim('name:jane smith', 'crashed worker', 300)
+    monkeypatch.setattr(external_person_registry, 'CLAIM_TIMEOUT', 0)
+    assert registry.get_or_create('Jane', 'Smith') == 'ext-1'
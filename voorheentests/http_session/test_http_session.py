@@ -0,0 +1,80 @@
+"""
+Tests for the retry policy of the shared sessions.
+
+Throttled (429/503) GETs and search POSTs are retried; a PUT that creates an entity in Pure is
+never retried, neither on throttling nor on 5xx responses. A PUT that updates an existing entity
+goes through a session that retries it.
+"""
+import io
+import sys
+from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+
+# Add src directory to sys.path to find http_session
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import rate_limiter
+from http_session import RateLimitedAdapter, make_session, UPDATE_RETRY_METHODS
+from pure_client import PureClient
+
+
+def fake_send(statuses, sent):
+    def send(adapter, request, **kwargs):
+        sent.append(request.method)
+        response = requests.Response()
+        response.status_code = statuses[min(len(sent), len(statuses)) - 1]
+        response.headers['Retry-After'] = '0'
+        response.raw = io.BytesIO(b'')
+        return response
+    return send
+
+
+def test_throttled_get_is_retried(monkeypatch):
+    rate_limiter.configure({'default': (1000, 1000)})
+    sent = []
+    monkeypatch.setattr(HTTPAdapter, 'send', fake_send([503, 429, 200], sent))
+    request = requests.Request('GET', 'http://pure.test/ws/api/persons').prepare()
+
+    assert RateLimitedAdapter().send(request).status_code == 200
+    assert sent == ['GET', 'GET', 'GET']
+
+
+def test_throttled_put_is_not_retried(monkeypatch):
+    rate_limiter.configure({'default': (1000, 1000)})
+    sent = []
+    monkeypatch.setattr(HTTPAdapter, 'send', fake_send([503, 200], sent))
+    request = requests.Request('PUT', 'http://pure.test/ws/api/research-outputs').prepare()
+
+    assert RateLimitedAdapter().send(request).status_code == 503
+    assert sent == ['PUT']
+
+
+def test_put_is_not_retried_on_server_errors():
+    retries = make_session().get_adapter('https://pure.test').max_retries
+    assert not retries.is_retry('PUT', 502)
+    assert retries.is_retry('GET', 502) and retries.is_retry('POST', 502)
+
+
+def test_throttled_update_put_is_retried(monkeypatch):
+    rate_limiter.configure({'default': (1000, 1000)})
+    sent = []
+    monkeypatch.setattr(HTTPAdapter, 'send', fake_send([503, 200], sent))
+    request = requests.Request('PUT', 'http://pure.test/ws/api/persons/p1').prepare()
+
+    assert RateLimitedAdapter(retry_methods=UPDATE_RETRY_METHODS).send(request).status_code == 200
+    assert sent == ['PUT', 'PUT']
+    retries = make_session(retry_methods=UPDATE_RETRY_METHODS).get_adapter('https://pure.test').max_retries
+    assert retries.is_retry('PUT', 502)
+
+
+def test_only_updates_of_existing_entities_are_retried(monkeypatch):
+    rate_limiter.configure({'default': (1000, 1000)})
+    sent = []
+    monkeypatch.setattr(HTTPAdapter, 'send', fake_send([503, 503, 503, 200], sent))
+    client = PureClient(base_url='http://pure.test/ws/api/', backoff_factor=0)
+
+    assert client.put('research-outputs', json={}).status_code == 503
+    assert client.put('external-persons/', json={}).status_code == 503
+    assert client.put('external-persons/e1', json={}).status_code == 200
+    assert sent == ['PUT', 'PUT', 'PUT', 'PUT']
@@ -0,0 +1,54 @@
+"""
+Tests for the persistent maps used for the journal, publisher and external person lookups.
+
+Entries are kept in memory, written through to sqlite and shared between instances.
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find local_store
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from local_store import PersistentMap
+
+
+def test_values_survive_between_instances(tmp_path):
+    path = str(tmp_path / 'lookups.sqlite')
+    PersistentMap(path, 'journal_issn').set('1234-5678', 'uuid-1')
+    assert PersistentMap(path, 'journal_issn').get('1234-5678') == 'uuid-1'
+
+
+def test_namespaces_are_separate(tmp_path):
+    path = str(tmp_path / 'lookups.sqlite')
+    PersistentMap(path, 'journal_issn').set('key', 'journal')
+    assert 'key' not in PersistentMap(path, 'publisher_name')
+
+
+def test_none_is_a_stored_value(tmp_path):
+    store = PersistentMap(str(tmp_path / 'lookups.sqlite'), 'publisher_name')
+    store.set('unknown publisher', None)
+    assert store.lookup('unknown publisher') == (True, None)
+
+
+def test_entries_written_by_other_instance_are_found(tmp_path):
+    path = str(tmp_path / 'lookups.sqlite')
+    first = PersistentMap(path, 'journal_issn')
+    PersistentMap(path, 'journal_issn').set('1234-5678', 'uuid-1')
+    assert first.get('1234-5678') == 'uuid-1'
+
+
+def test_expired_entries_are_missing(tmp_path):
+    store = PersistentMap(str(tmp_path / 'lookups.sqlite'), 'journal_issn', max_age=-1)
+    store.set('1234-5678', 'uuid-1')
+    assert store.lookup('1234-5678') == (False, None)
+
+
+def test_claim_is_held_by_one_owner(tmp_path):
+    path = str(tmp_path / 'lookups.sqlite')
+    first, second = PersistentMap(path, 'external_person'), PersistentMap(path, 'external_person')
+    assert first.claim('name:jane smith', 'worker-1', timeout=300)
+    assert not second.claim('name:jane smith', 'worker-2', timeout=300)
+    second.release('name:jane smith', 'worker-2')
+    assert not second.claim('name:jane smith', 'worker-2', timeout=300)
+    first.release('name:jane smith', 'worker-1')
+    assert second.claim('name:jane smith', 'worker-2', timeout=300)
@@ -0,0 +1,109 @@
+"""
+Tests for the OpenAlex client.
+
+DOIs are looked up 50 per request with filter=doi:a|b|c; the works are mapped back to the DOIs
+asked for, in their order, and DOIs without a work are reported as not found.
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find openalex_client
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from openalex_client import OpenAlexClient, BATCH_SIZE, NOT_FOUND, WORK_FIELDS
+
+
+def test_works_are_fetched_in_batches_and_mapped_back(openalex_session):
+    dois = [f'doi.org/10.1/{number}' for number in range(120)]
+    session = openalex_session({f'10.1/{number}' for number in range(120) if number % 7})
+    client = OpenAlexClient('https://api.openalex.org/works/', session=session)
+
+    found = client.works(dois)
+
+    assert len(session.calls) == 3
+    url, params = session.calls[0]
+    assert url == 'https://api.openalex.org/works'
+    assert params['per-page'] == BATCH_SIZE
+    assert params['filter'].count('|') == BATCH_SIZE - 1
+    assert [doi for doi, _, _ in found] == dois
+    for number, (doi, work, error) in enumerate(found):
+        if number % 7:
+            assert work['id'] == f'W10.1/{number}' and error is None
+        else:
+            assert work is None and error == NOT_FOUND
+
+
+def test_dois_that_do_not_fit_a_filter_are_fetched_one_by_one(openalex_session):
+    session = openalex_session({'10.1/a,b', '10.1/c'})
+    client = OpenAlexClient('https://api.openalex.org/works/', session=session)
+
+    found = client.works(['10.1/A,B', 'https://doi.org/10.1/C'])
+
+    assert [work['id'] for _, work, _ in found] == ['W10.1/a,b', 'W10.1/c']
+    assert session.calls[1][0] == 'https://api.openalex.org/works/doi.org/10.1/a,b'
+
+
+def test_failed_batches_are_returned_as_data(openalex_session):
+    client = OpenAlexClient('https://api.openalex.org/works/', session=openalex_session(set(), status_code=500))
+
+    assert client.works(['10.1/a', '10.1/b']) == [('10.1/a', None, 'OpenAlex status 500'),
+                                                  ('10.1/b', None, 'OpenAlex status 500')]
+
+
+def test_only_the_transformed_fields_are_selected(openalex_session):
+    session = openalex_session({'10.1/a'})
+    OpenAlexClient('https://api.openalex.org/works/', session=session).works(['10.1/a', '10.1/a,b'])
+
+    for _, params in session.calls:
+        assert params['select'].split(',') == list(WORK_FIELDS)
+
+    session = openalex_session({'10.1/a'})
+    OpenAlexClient('https://api.openalex.org/works/', session=session, select=None).works(['10.1/a'])
+    assert 'select' not in session.calls[0][1]
+
+
+def test_cached_works_are_not_downloaded_again(tmp_path, openalex_session):
+    from doi_cache import DoiCache, NOT_CACHED
+    from openalex_client import cache_source
+
+    path = str(tmp_path / 'doi_cache.sqlite')
+    cache = DoiCache(path, cache_source(WORK_FIELDS))
+    OpenAlexClient('https://api.openalex.org/works/', session=openalex_session({'10.1/a'}), cache=cache).works(['10.1/a'])
+
+    session = openalex_session({'10.1/a', '10.1/b'})
+    found = OpenAlexClient('https://api.openalex.org/works/', session=session, cache=cache).works(['10.1/A', '10.1/b'])
+    assert [work['id'] for _, work, _ in found] == ['W10.1/a', 'W10.1/b']
+    assert session.calls[0][1]['filter'] == 'doi:10.1/b'
+
+    offline = DoiCache(path, cache_source(WORK_FIELDS), offline=True)
+    session = openalex_session({'10.1/c'})
+    found = OpenAlexClient('https://api.openalex.org/works/', session=session, cache=offline).works(['10.1/a', '10.1/c'])
+    assert found[1] == ('10.1/c', None, NOT_CACHED)
+    assert session.calls == []
+
+
+def test_concurrent_batches_keep_the_order_of_the_dois(openalex_session):
+    import random
+    import time
+
+    dois = [f'10.1/{number}' for number in range(400)]
+    session = openalex_session(set(dois[::2]))
+    respond = session.respond
+    # the batches are answered in random order
+    session.respond = lambda url, params: time.sleep(random.uniform(0, 0.02)) or respond(url, params)
+    found = OpenAlexClient('https://api.openalex.org/works/', session=session, workers=4).works(dois)
+
+    assert len(session.calls) == 8
+    assert [doi for doi, _, _ in found] == dois
+    assert [work['id'] for _, work, _ in found if work] == ['W' + doi for doi in dois[::2]]
+
+
+def test_iter_works_yields_chunk_by_chunk(openalex_session):
+    dois = [f'10.1/{number}' for number in range(250)]
+    session = openalex_session(set(dois))
+    works = OpenAlexClient('https://api.openalex.org/works/', session=session, workers=2).iter_works(dois)
+
+    first = next(works)
+    assert first[0] == '10.1/0' and len(session.calls) == 2
+    assert [doi for doi, _, _ in works] == dois[1:]
+    assert len(session.calls) == 5
@@ -0,0 +1,62 @@
+"""
+Microbenchmark of parse_contributors on a large authorship list.
+
+Compares splitting every display name with nameparser.HumanName (as parse_contributors did before)
+with split_name, cold (empty memo) and warm (names seen in earlier works of the faculty).
+
+    python voorheentests/openalex_utils/benchmark_parse_contributors.py [authorships] [distinct names]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+from nameparser import HumanName
+
+# Add src directory to sys.path to find openalex_utils
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from openalex_utils import split_name, parse_contributors
+
+FIRST_NAMES = ['Jan', 'Maria', 'Wei', 'Anna', 'Pieter', 'Sophie', 'Mohammed', 'Léa', 'Lars', 'Yuki', 'J.', 'Jean-Luc']
+LAST_NAMES = ['Vries', 'de Vries', 'Jansen', 'Wang', 'Müller', 'Smith', 'van den Berg', 'Tanaka', 'Bakker', "O'Brien"]
+
+
+def make_authorships(count, distinct, seed=1):
+    random.seed(seed)
+    names = [f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}{'' if number < 20 else number}"
+             for number in range(distinct)]
+    return [{'author': {'display_name': random.choice(names), 'orcid': None, 'id': f'https://openalex.org/A{number}'}}
+            for number in range(count)]
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(count=50000, distinct=5000):
+    authorships = make_authorships(count, distinct)
+    names = [authorship['author']['display_name'] for authorship in authorships]
+
+    def with_humanname():
+        for name in names:
+            human_name = HumanName(name)
+            human_name.first, human_name.last
+
+    baseline = timed(with_humanname)
+    split_name.cache_clear()
+    cold = timed(lambda: parse_contributors(authorships))
+    warm = timed(lambda: parse_contributors(authorships))
+    split_name.cache_clear()
+    names_only = timed(lambda: [split_name(name) for name in names])
+
+    print(f"{count} authorships, {distinct} distinct names")
+    print(f"HumanName per authorship:      {baseline:.3f}s")
+    print(f"split_name, empty memo:        {names_only:.3f}s ({baseline / names_only:.1f}x)")
+    print(f"parse_contributors, cold memo: {cold:.3f}s")
+    print(f"parse_contributors, warm memo: {warm:.3f}s")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,39 @@
+"""
+Tests for the OpenAlex harvest.
+
+The works are written to a json lines file (gzip compressed for .gz) while they arrive and read
+back lazily, one work at a time.
+"""
+import gzip
+import sys
+import types
+from pathlib import Path
+
+# Add src directory to sys.path to find openalex_utils
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import openalex_utils
+from openalex_client import OpenAlexClient
+
+
+def test_harvest_round_trip(tmp_path):
+    works = [{'id': 'W1', 'title': 'Één'}, {'id': 'W2', 'title': 'Two'}]
+    for name in ('harvest.jsonl', 'harvest.jsonl.gz'):
+        path = str(tmp_path / name)
+        assert openalex_utils.write_harvest(iter(works), path) == 2
+        reader = openalex_utils.read_harvest(path)
+        assert isinstance(reader, types.GeneratorType)
+        assert list(reader) == works
+
+    with gzip.open(tmp_path / 'harvest.jsonl.gz', 'rt', encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+
+
+def test_get_jsons_writes_the_works_found(tmp_path, monkeypatch, openalex_session):
+    client = OpenAlexClient('https://api.openalex.org/works/', session=openalex_session({'10.1/a', '10.1/b'}))
+    monkeypatch.setattr(openalex_utils, 'get_openalex_client', lambda: client)
+    path = str(tmp_path / 'all_responses.jsonl')
+
+    works = openalex_utils.get_jsons_from_open_alex(['10.1/a', 'missing', '10.1/b'], path)
+
+    assert [work['id'] for work in works] == ['W10.1/a', 'W10.1/b']
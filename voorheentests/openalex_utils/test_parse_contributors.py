@@ -0,0 +1,38 @@
+"""
+Tests for splitting the names of contributors.
+
+split_name must give the same first and last name as nameparser.HumanName, also for the plain
+'First Last' names it splits without nameparser, and remembers the names it split.
+"""
+import sys
+from pathlib import Path
+import pytest
+from nameparser import HumanName
+
+# Add src directory to sys.path to find openalex_utils
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from openalex_utils import split_name, parse_contributors
+
+
+@pytest.mark.parametrize("name", [
+    'Jan Vries', 'Jinping Xi', 'Léa Müller', 'JAN VRIES', 'jan vries', 'Ng Li',
+    'Jan de Vries', 'Van Halen', 'Dr Smith', 'Sir Paul', 'St John', 'John Jr', 'Mary Vi', 'Ab Cd',
+    'E Smith', 'J. Smith', 'Smith, John', 'Jean-Pierre Dupont', 'John Doe Smith', 'Jan  Vries', ' Jan Vries',
+    'Anna Von', 'Del Toro', 'Unknown Author', '',
+])
+def test_split_name_matches_nameparser(name):
+    human_name = HumanName(name)
+    assert split_name(name) == (human_name.first, human_name.last)
+
+
+def test_split_name_is_memoized():
+    split_name.cache_clear()
+    authorships = [{'author': {'display_name': name, 'id': 'https://openalex.org/A1'}}
+                   for name in ['Jan Vries', 'Jan de Vries'] * 50]
+
+    contributors = parse_contributors(authorships)
+
+    assert [(c['first_name'], c['last_name']) for c in contributors[:2]] == [('Jan', 'Vries'), ('Jan', 'de Vries')]
+    info = split_name.cache_info()
+    assert info.misses == 2 and info.hits == 98
@@ -0,0 +1,78 @@
+"""
+Tests for transform_openalex_to_df and the streaming transformer.
+
+The transformer may only read the fields in openalex_client.WORK_FIELDS, since OpenAlex is asked
+for those fields only. Works without the required fields are rejected with their id and reason.
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find openalex_utils
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from openalex_client import WORK_FIELDS
+from openalex_utils import transform_openalex_to_df, iter_openalex_records, iter_openalex_chunks, Rejects
+
+
+class RecordingWork(dict):
+    """Work that records the fields read from it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read = set()
+
+    def get(self, key, default=None):
+        self.read.add(key)
+        return super().get(key, default)
+
+    def __getitem__(self, key):
+        self.read.add(key)
+        return super().__getitem__(key)
+
+
+def make_work(number, **fields):
+    work = {
+        'id': f'https://openalex.org/W{number}',
+        'doi': f'https://doi.org/10.1/{number}',
+        'title': 'A title',
+        'type': 'article',
+        'language': 'en',
+        'publication_date': '2024-02-03',
+        'open_access': {'is_oa': True, 'oa_status': 'gold'},
+        'authorships': [{'author': {'display_name': 'Jan de Vries', 'orcid': None, 'id': 'https://openalex.org/A1'}}],
+        'keywords': [{'display_name': 'Keyword'}],
+        'primary_location': {'source': {'issn_l': '1234-5678'}},
+    }
+    work.update(fields)
+    return work
+
+
+def test_transform_reads_only_the_selected_fields():
+    work = RecordingWork(make_work(1))
+
+    processed, not_processed = transform_openalex_to_df([work])
+
+    assert len(processed) == 1 and not_processed.empty
+    assert work.read <= set(WORK_FIELDS)
+
+
+def test_rejects_keep_only_id_and_reason():
+    works = [make_work(1), make_work(2, title=None, authorships=[]), make_work(3)]
+    rejects = Rejects()
+
+    records = iter_openalex_records(iter(works), rejects)
+
+    assert [record['doi'] for record in records] == ['https://doi.org/10.1/1', 'https://doi.org/10.1/3']
+    assert list(rejects) == [('https://openalex.org/W2', 'Missing fields: title contributors')]
+
+    processed, not_processed = transform_openalex_to_df(works)
+    assert len(processed) == 2
+    assert not_processed.to_dict('records') == [{'id': 'https://openalex.org/W2',
+                                                 'reason': 'Missing fields: title contributors'}]
+
+
+def test_records_are_yielded_in_chunks():
+    chunks = list(iter_openalex_chunks((make_work(number) for number in range(5)), chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert list(chunks[2]['doi']) == ['https://doi.org/10.1/4']
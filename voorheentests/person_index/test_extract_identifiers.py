@@ -0,0 +1,53 @@
+"""
+Tests for the identifier extraction and normalization of the person index.
+
+The index maps every normalized identifier of a Pure person (ORCID without url prefix,
+Scopus id, OpenAlex id and the ids in ID_URI) to the uuid of that person.
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src directory to sys.path to find person_index
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from person_index import normalize_identifier, extract_identifiers, reduce_record
+
+
+@pytest.mark.parametrize("test_input,expected", [
+    ("https://orcid.org/0000-0002-1825-009x", "0000-0002-1825-009X"),
+    ("0000-0002-1825-009X", "0000-0002-1825-009X"),
+    ("https://openalex.org/A5023888391", "A5023888391"),
+    (" 57194512345 ", "57194512345"),
+    (None, ""),
+])
+def test_normalize_identifier(test_input, expected):
+    assert normalize_identifier(test_input) == expected
+
+
+def test_extract_identifiers():
+    item = {
+        "uuid": "p1",
+        "orcid": "https://orcid.org/0000-0002-1825-0097",
+        "identifiers": [
+            {"typeDiscriminator": "PrimaryId", "idSource": "Scopus", "value": "57194512345"},
+            {"typeDiscriminator": "ClassifiedId", "id": "employee-1", "type": {"uri": "/unknown/type"}},
+        ]
+    }
+    assert extract_identifiers(item) == {"0000-0002-1825-0097", "57194512345"}
+
+
+def test_reduce_record_keeps_association_periods():
+    item = {
+        "uuid": "p1",
+        "name": {"firstName": "John", "lastName": "Doe"},
+        "staffOrganizationAssociations": [
+            {"period": {"startDate": "2020-01-01"}, "organization": {"uuid": "o1", "name": "Org"}, "pureId": 1}
+        ],
+        "profileInformation": ["large"],
+    }
+    assert reduce_record(item) == {
+        "uuid": "p1",
+        "name": {"firstName": "John", "lastName": "Doe"},
+        "staffOrganizationAssociations": [{"period": {"startDate": "2020-01-01"}, "organization": {"uuid": "o1"}}],
+    }
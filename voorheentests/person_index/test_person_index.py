@@ -0,0 +1,96 @@
+"""
+Tests for building, refreshing and querying the person index.
+
+The index is built by paging through the persons and external persons of Pure; the client
+below serves the pages from lists, so the paging of PureClient.iter_search is exercised.
+"""
+import json
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find person_index
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import person_index
+from person_index import PersonIndex, PERSONS, EXTERNAL_PERSONS
+from pure_client import PureClient, CachedResponse
+
+
+def person(uuid, orcid=None, first_name='John', last_name='Doe'):
+    item = {"uuid": uuid, "name": {"firstName": first_name, "lastName": last_name},
+            "staffOrganizationAssociations": [{"period": {"startDate": "2020-01-01"}, "organization": {"uuid": "o1"}}]}
+    if orcid:
+        item["orcid"] = orcid
+    return item
+
+
+class FakePagingClient(PureClient):
+    """PureClient that answers the searches of an endpoint page by page from a list of items."""
+
+    def __init__(self, items):
+        super().__init__(base_url='https://pure.example.org/ws/api/')
+        self.items = items
+        self.requests = []
+
+    def post(self, path, use_cache=True, **kwargs):
+        body = kwargs['json']
+        self.requests.append((path, body['offset']))
+        items = self.items.get(path.split('/')[0], [])
+        page = items[body['offset']:body['offset'] + body['size']]
+        return CachedResponse(json.dumps({"count": len(items), "items": page}))
+
+    def iter_search(self, path, body=None, page_size=2, prefetch=1, use_cache=False):
+        return super().iter_search(path, body, page_size, prefetch, use_cache)
+
+
+def test_build_pages_through_persons_and_external_persons(tmp_path):
+    persons = [person(f"p{number}", orcid=f"0000-0000-0000-000{number}") for number in range(5)]
+    client = FakePagingClient({PERSONS: persons, EXTERNAL_PERSONS: [person("e1", orcid="0000-0000-0000-0009")]})
+    index = PersonIndex(str(tmp_path / "index.sqlite"))
+
+    index.build(client)
+    assert [offset for path, offset in client.requests if path == 'persons/search/'] == [0, 2, 4]
+    assert index.lookup("https://orcid.org/0000-0000-0000-0003") == ["p3"]
+    assert index.lookup("0000-0000-0000-0009") == []
+    assert index.lookup("0000-0000-0000-0009", EXTERNAL_PERSONS) == ["e1"]
+    assert index.record("p4")["name"] == {"firstName": "John", "lastName": "Doe"}
+    assert not index.is_stale()
+
+
+def test_rebuild_drops_persons_no_longer_in_pure(tmp_path):
+    index = PersonIndex(str(tmp_path / "index.sqlite"))
+    index.build(FakePagingClient({PERSONS: [person("p1", orcid="0000-0000-0000-0001")]}), kinds=(PERSONS,))
+    index.build(FakePagingClient({PERSONS: [person("p2")]}), kinds=(PERSONS,))
+
+    assert index.lookup("0000-0000-0000-0001") == []
+    assert index.record("p1") is None
+    assert index.record("p2") is not None
+
+
+def test_lookup_of_shared_identifier_returns_all_persons(tmp_path):
+    index = PersonIndex(str(tmp_path / "index.sqlite"))
+    index.build(FakePagingClient({PERSONS: [person("p1", orcid="0000-0000-0000-0001"),
+                                            person("p2", orcid="0000-0000-0000-0001")]}), kinds=(PERSONS,))
+    assert sorted(index.lookup("0000-0000-0000-0001")) == ["p1", "p2"]
+
+
+def test_refresh_rebuilds_only_a_stale_index(tmp_path, monkeypatch):
+    index = PersonIndex(str(tmp_path / "index.sqlite"))
+    builds = []
+    monkeypatch.setattr(index, 'build', lambda: builds.append(1))
+
+    index.refresh()
+    assert builds == [1]
+
+    PersonIndex.build(index, FakePagingClient({}), kinds=())
+    index.refresh(max_age=3600)
+    assert builds == [1]
+    index.refresh(max_age=-1)
+    assert builds == [1, 1]
+
+
+def test_index_is_not_used_before_it_is_built(tmp_path, monkeypatch):
+    monkeypatch.setattr(person_index, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(person_index, 'PERSON_INDEX_ENABLED', True)
+    monkeypatch.setattr(person_index, '_index', None)
+    assert person_index.get_person_index() is None
@@ -0,0 +1,180 @@
+"""
+Tests for the asyncio Pure client and the concurrent contributor lookups.
+
+A failing or timed out request counts as a failed search of that contributor only; the other
+contributors of the output are still resolved. PUTs are not retried and the response cache is
+used from a thread.
+"""
+import asyncio
+import sys
+from pathlib import Path
+import aiohttp
+import pytest
+
+# Add src directory to sys.path to find pure_async
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import pure_async
+import pure_persons
+
+
+class FakeResponse:
+    def __init__(self, status, text='{}'):
+        self.status = status
+        self._text = text
+        self.headers = {'Retry-After': '0'}
+
+    async def text(self):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append(method)
+        return FakeResponse(self.statuses.pop(0))
+
+
+class FakeCache:
+    def __init__(self):
+        self.stored = {}
+
+    def get(self, path, body):
+        return self.stored.get((path, body))
+
+    def set(self, path, body, text):
+        self.stored[(path, body)] = text
+
+    def invalidate(self, entity):
+        self.stored.clear()
+
+
+def make_client(statuses, cache=None):
+    client = pure_async.AsyncPureClient(base_url='https://pure.example.org/ws/api/', cache=cache or FakeCache(),
+                                        backoff_factor=0)
+    client._session = FakeSession(statuses)
+    client._semaphore = asyncio.Semaphore(client.concurrency)
+    return client
+
+
+class FakeSearchClient:
+    """Answers get/post like AsyncPureClient, raising the exception given for a path."""
+
+    def __init__(self, errors=None, items=None):
+        self.errors = errors or {}
+        self.items = items or []
+
+    async def get(self, path, **kwargs):
+        if path in self.errors:
+            raise self.errors[path]
+        return pure_async.AsyncResponse(404, '')
+
+    async def post(self, path, **kwargs):
+        if path in self.errors:
+            raise self.errors[path]
+        return pure_async.AsyncResponse(200, '{"items": %s}' % ('[{"uuid": "p1"}]' if self.items else '[]'))
+
+
+@pytest.fixture(autouse=True)
+def no_memo_or_index(monkeypatch):
+    pure_persons.person_memo.clear()
+    monkeypatch.setattr(pure_persons, 'find_record_in_index', lambda person_ids: None)
+    yield
+    pure_persons.person_memo.clear()
+
+
+def test_put_is_not_retried():
+    client = make_client([503, 201])
+    response = asyncio.run(client.put('persons/'))
+    assert response.status_code == 503
+    assert client._session.sent == ['PUT']
+
+
+def test_get_is_retried():
+    client = make_client([502, 200])
+    response = asyncio.run(client.get('persons/p1'))
+    assert response.status_code == 200
+    assert client._session.sent == ['GET', 'GET']
+
+
+def test_search_is_cached():
+    cache = FakeCache()
+    client = make_client([200], cache)
+    asyncio.run(client.post('persons/search/', data='{"searchString": "x"}'))
+    response = asyncio.run(client.post('persons/search/', data='{"searchString": "x"}'))
+    assert response.status_code == 200
+    assert client._session.sent == ['POST']
+
+
+def test_timeout_of_uuid_get_is_a_failed_search():
+    client = FakeSearchClient(errors={'persons/p1': asyncio.TimeoutError()})
+    record, failed = asyncio.run(pure_async.search_person_record(client, None, {'uuid': 'p1'}))
+    assert record is None
+    assert failed
+
+
+def test_timeout_of_search_falls_through_to_name():
+    client = FakeSearchClient(errors={'persons/search/': asyncio.TimeoutError()})
+    record, failed = asyncio.run(pure_async.search_person_record(client, 'John Doe', {'orcid': '0000'}))
+    assert record is None
+    assert failed
+
+
+def test_failed_lookup_is_not_memoized():
+    client = FakeSearchClient(errors={'persons/search/': aiohttp.ClientError('reset')})
+    assert asyncio.run(pure_async.find_person(client, 'John Doe', {}, None)) is None
+    assert pure_persons.person_memo.get(pure_persons.PersonMemo.key('John Doe', {})) == (False, None)
+
+
+def test_one_failing_contributor_does_not_cancel_the_others(monkeypatch):
+    async def find_person(client, name, person_ids, date, strict=False):
+        if name == 'Broken':
+            raise ValueError('unexpected')
+        await asyncio.sleep(0)
+        return {'uuid': name}
+
+    class Client:
+        def __init__(self, concurrency):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+    monkeypatch.setattr(pure_async, 'find_person', find_person)
+    monkeypatch.setattr(pure_async, 'AsyncPureClient', Client)
+    found = pure_async.find_persons([('A', {}, None), ('Broken', {}, None), ('B', {}, None)])
+    assert found == [{'uuid': 'A'}, None, {'uuid': 'B'}]
+
+
+def test_strict_lookup_raises_after_all_lookups(monkeypatch):
+    async def find_person(client, name, person_ids, date, strict=False):
+        if name == 'Broken':
+            raise pure_async.PureLookupError('person lookup of Broken failed')
+        return {'uuid': name}
+
+    class Client:
+        def __init__(self, concurrency):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+    monkeypatch.setattr(pure_async, 'find_person', find_person)
+    monkeypatch.setattr(pure_async, 'AsyncPureClient', Client)
+    with pytest.raises(pure_async.PureLookupError):
+        pure_async.find_persons([('A', {}, None), ('Broken', {}, None)], strict=True)
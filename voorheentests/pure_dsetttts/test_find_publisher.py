@@ -0,0 +1,36 @@
+"""
+Tests for resolving the publisher of a dataset.
+
+Publisher names are matched after normalization; names without a publisher in Pure resolve
+to the default publisher and are remembered, so they are searched only once.
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find publisher_resolver
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from publisher_resolver import PublisherResolver, normalize_publisher_name
+from local_store import PersistentMap
+from config import DEFAULTS
+
+
+def test_normalize_publisher_name():
+    assert normalize_publisher_name("  Zenodo ") == normalize_publisher_name("ZENODO") == "zenodo"
+    assert normalize_publisher_name(None) == ""
+
+
+def test_publisher_is_searched_once(tmp_path, fake_client):
+    client = fake_client([{"uuid": "p1", "name": "Zenodo"}])
+    resolver = PublisherResolver(client, PersistentMap(str(tmp_path / 'lookups.sqlite'), 'publisher_name'))
+    assert resolver.resolve("Zenodo") == "p1"
+    assert resolver.resolve("zenodo") == "p1"
+    assert client.searches == 1
+
+
+def test_unknown_publisher_resolves_to_default(tmp_path, fake_client):
+    client = fake_client([{"uuid": "p1", "name": "Zenodo Foundation"}])
+    resolver = PublisherResolver(client, PersistentMap(str(tmp_path / 'lookups.sqlite'), 'publisher_name'))
+    assert resolver.resolve("Zenodo") == DEFAULTS['publisher']
+    assert resolver.resolve("Zenodo") == DEFAULTS['publisher']
+    assert client.searches == 1
@@ -0,0 +1,90 @@
+"""
+Tests for answering find_person from the local person index.
+
+An identifier that belongs to exactly one person in the index gives that person's record;
+a miss (or an identifier shared by several persons) falls back to the live search in Pure.
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src directory to sys.path to find pure_persons
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import pure_persons
+from person_index import PersonIndex, PERSONS
+from pure_client import PureLookupError
+
+
+class FakePagingClient:
+    """Client with the iter_search of PureClient, serving the persons of the index."""
+
+    def __init__(self, persons):
+        self.persons = persons
+
+    def iter_search(self, path, body=None):
+        return iter(self.persons if path == f'{PERSONS}/search/' else [])
+
+
+def person(uuid, orcid):
+    return {"uuid": uuid, "orcid": orcid, "name": {"firstName": "John", "lastName": uuid},
+            "staffOrganizationAssociations": [{"period": {"startDate": "2020-01-01"}, "organization": {"uuid": "o1"}}]}
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = PersonIndex(str(tmp_path / "index.sqlite"))
+    index.build(FakePagingClient([person("p1", "0000-0000-0000-0001"), person("p2", "0000-0000-0000-0002"),
+                                  person("p3", "0000-0000-0000-0002")]))
+    monkeypatch.setattr(pure_persons, 'get_person_index', lambda: index)
+    pure_persons.person_memo.clear()
+    yield index
+    pure_persons.person_memo.clear()
+
+
+def test_found_by_orcid(index):
+    record = pure_persons.find_record_in_index({"orcid": "https://orcid.org/0000-0000-0000-0001"})
+    assert record["uuid"] == "p1"
+
+
+def test_found_by_uuid(index):
+    assert pure_persons.find_record_in_index({"orcid": "unknown", "uuid": "p2"})["uuid"] == "p2"
+
+
+def test_shared_identifier_is_not_found(index):
+    assert pure_persons.find_record_in_index({"orcid": "0000-0000-0000-0002"}) is None
+
+
+def test_no_index_or_no_ids(index, monkeypatch):
+    assert pure_persons.find_record_in_index({}) is None
+    monkeypatch.setattr(pure_persons, 'get_person_index', lambda: None)
+    assert pure_persons.find_record_in_index({"orcid": "0000-0000-0000-0001"}) is None
+
+
+def test_find_person_uses_index_without_searching(index, monkeypatch):
+    monkeypatch.setattr(pure_persons, 'search_person_record', lambda name, person_ids: pytest.fail("searched Pure"))
+    details = pure_persons.find_person("John p1", {"orcid": "0000-0000-0000-0001"}, None)
+    assert details["uuid"] == "p1"
+    assert details["associationsUUIDs"][0]["uuid"] == "o1"
+
+
+def test_find_person_miss_falls_back_to_live_search(index, monkeypatch):
+    searched = []
+
+    def search_person_record(name, person_ids):
+        searched.append(name)
+        return person("p9", "0000-0000-0000-0009"), False
+
+    monkeypatch.setattr(pure_persons, 'search_person_record', search_person_record)
+    details = pure_persons.find_person("John p9", {"orcid": "0000-0000-0000-0009"}, None)
+    assert details["uuid"] == "p9"
+    assert searched == ["John p9"]
+
+
+def test_failed_search_raises_when_strict_and_is_not_memoized(index, monkeypatch):
+    monkeypatch.setattr(pure_persons, 'search_person_record', lambda name, person_ids: (None, True))
+    assert pure_persons.find_person("John p9", {"orcid": "0000-0000-0000-0009"}, None) is None
+    with pytest.raises(PureLookupError):
+        pure_persons.find_person("John p9", {"orcid": "0000-0000-0000-0009"}, None, strict=True)
+    assert pure_persons.person_memo.get(pure_persons.PersonMemo.key("John p9", {"orcid": "0000-0000-0000-0009"})) \
+        == (False, None)
@@ -0,0 +1,36 @@
+"""
+Tests for the per-run memo of find_person.
+
+The memo maps (name, identifiers) to the raw Pure person record, with optional
+least-recently-used eviction when a maximum size is set.
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find pure_persons
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from pure_persons import PersonMemo
+
+
+def test_key_does_not_depend_on_identifier_order():
+    assert PersonMemo.key("John Doe", {"ORCID": "1", "OpenAlex": "A1"}) == \
+           PersonMemo.key("John Doe", {"OpenAlex": "A1", "ORCID": "1"})
+
+
+def test_not_found_is_memoized():
+    memo = PersonMemo()
+    key = PersonMemo.key("John Doe", {})
+    assert memo.get(key) == (False, None)
+    memo.put(key, None)
+    assert memo.get(key) == (True, None)
+
+
+def test_least_recently_used_is_evicted():
+    memo = PersonMemo(maxsize=2)
+    memo.put("a", {"uuid": "a"})
+    memo.put("b", {"uuid": "b"})
+    memo.get("a")
+    memo.put("c", {"uuid": "c"})
+    assert memo.get("b") == (False, None)
+    assert memo.get("a") == (True, {"uuid": "a"})
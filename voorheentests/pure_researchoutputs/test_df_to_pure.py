@@ -7,6 +7,17 @@ Parameters:
 Returns:
 
 """
+import sys
+from pathlib import Path
+import pandas as pd
+import pytest
+
+# Add src directory to sys.path to find pure_researchoutputs
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import pure_researchoutputs
+from pure_client import PureLookupError
+
 
 def test_fil_data():
     """
@@ -24,4 +35,59 @@ def test_fil_data2():
      This test ensures that...
     """
     result = 'x'
-    assert result is not None
\ No newline at end of file
+    assert result is not None
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_df_to_pure_counts(monkeypatch, workers):
+    """The counters are the same whether the outputs are processed one by one or in a worker pool."""
+    statuses = ['created', 'skipped', 'failed', 'created', 'tested']
+    df = pd.DataFrame({'research_output_id': range(len(statuses)), 'status': statuses})
+    monkeypatch.setattr(pure_researchoutputs, 'process_research_output', lambda row, test, async_contributors: (row['status'], row, None))
+
+    counts = pure_researchoutputs.df_to_pure(df, 'no', workers=workers)
+    assert counts == {'created': 2, 'skipped': 1, 'failed': 1, 'tested': 1}
+
+
+@pytest.mark.parametrize("async_contributors", [False, True])
+def test_contributors_resolver_follows_flag(monkeypatch, async_contributors):
+    """With async_contributors the contributors are resolved with the asyncio client."""
+    used = []
+    monkeypatch.setattr(pure_researchoutputs, 'get_contributors_details',
+                        lambda contributors, ref_date, test: used.append('sync'))
+    monkeypatch.setattr(pure_researchoutputs, 'get_contributors_details_async',
+                        lambda contributors, ref_date, test: used.append('async'))
+    row = pd.Series({'title': 't', 'research_output_id': 1, 'contributors': [], 'publication_date': None})
+
+    status, _, reason = pure_researchoutputs.process_research_output(row, 'yes', async_contributors)
+    assert (status, reason) == ('skipped', 'no internal contributors')
+    assert used == ['async' if async_contributors else 'sync']
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_error_in_one_output_is_reported_as_failed(monkeypatch, workers):
+    """An output that raises is counted as failed; the outputs after it are still processed."""
+    def process_research_output(row, test, async_contributors):
+        if row['research_output_id'] == 1:
+            raise KeyError('journal_issn')
+        return 'created', row, None
+
+    df = pd.DataFrame({'research_output_id': range(4)})
+    monkeypatch.setattr(pure_researchoutputs, 'process_research_output', process_research_output)
+    results = []
+
+    counts = pure_researchoutputs.df_to_pure(df, 'no', workers=workers,
+                                             on_result=lambda status, row, reason: results.append((status, reason)))
+    assert counts == {'created': 3, 'failed': 1}
+    assert results[1] == ('failed', "error: 'journal_issn'")
+
+
+def test_failed_pure_lookup_is_failed_not_skipped(monkeypatch):
+    """A person search that failed makes the output failed, so a later run retries it."""
+    def get_contributors_details(contributors, ref_date, test):
+        raise PureLookupError('person lookup of John Doe failed')
+
+    monkeypatch.setattr(pure_researchoutputs, 'get_contributors_details', get_contributors_details)
+    row = pd.Series({'title': 't', 'research_output_id': 1, 'contributors': [], 'publication_date': None})
+    status, _, reason = pure_researchoutputs.process_research_output(row, 'no', False)
+    assert (status, reason) == ('failed', 'person lookup of John Doe failed')
@@ -0,0 +1,65 @@
+"""
+Tests for resolving the journal of a research output on ISSN.
+
+Journals are resolved with an exact match on ISSN, eISSN or ISSN-L via the journal index
+of journal_resolver, which is filled from Pure searches and persisted between runs.
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src directory to sys.path to find journal_resolver
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from journal_resolver import JournalResolver, normalize_issn, journal_issns
+from local_store import PersistentMap
+from pure_client import PureLookupError
+
+
+@pytest.mark.parametrize("test_input,expected", [
+    ("1234-5678", "1234-5678"),
+    ("1234567x", "1234-567X"),
+    ("No ISSN", ""),
+    (None, ""),
+])
+def test_normalize_issn(test_input, expected):
+    assert normalize_issn(test_input) == expected
+
+
+def test_journal_issns():
+    item = {"uuid": "j1", "issns": [{"issn": "1234-5678"}], "eissns": [{"value": "8765-4321"}]}
+    assert journal_issns(item) == {"1234-5678", "8765-4321"}
+
+
+def test_resolve_matches_issn_exactly(tmp_path, fake_client):
+    client = fake_client([
+        {"uuid": "other", "issns": [{"issn": "1111-1111"}]},
+        {"uuid": "j1", "issns": [{"issn": "1234-5678"}]},
+    ])
+    resolver = JournalResolver(client, PersistentMap(str(tmp_path / 'lookups.sqlite'), 'journal_issn'))
+    assert resolver.resolve("12345678") == "j1"
+    assert resolver.resolve("1234-5678") == "j1"
+    assert resolver.resolve("1111-1111") == "other"
+    assert client.searches == 1
+
+
+def test_resolve_without_exact_match(tmp_path, fake_client):
+    client = fake_client([{"uuid": "other", "issns": [{"issn": "1111-1111"}]}])
+    resolver = JournalResolver(client, PersistentMap(str(tmp_path / 'lookups.sqlite'), 'journal_issn'))
+    assert resolver.resolve("1234-5678") is None
+    assert resolver.resolve("1234-5678") is None
+    assert client.searches == 1
+
+
+class FailingClient:
+    """Client whose journal searches fail with a server error."""
+
+    def post(self, path, **kwargs):
+        return type('Response', (), {'status_code': 503, 'text': 'unavailable'})()
+
+
+def test_failed_search_raises_only_when_strict(tmp_path):
+    resolver = JournalResolver(FailingClient(), PersistentMap(str(tmp_path / 'lookups.sqlite'), 'journal_issn'))
+    assert resolver.resolve("1234-5678") is None
+    with pytest.raises(PureLookupError):
+        resolver.resolve("1234-5678", strict=True)
@@ -0,0 +1,68 @@
+"""
+Tests for the adaptive token bucket of the rate limiter.
+
+The bucket hands out `rate` tokens per second with at most `burst` saved up, slows down
+after a 429/503 (throttle) and speeds up again after successful requests (recover).
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src directory to sys.path to find rate_limiter
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import rate_limiter
+from rate_limiter import TokenBucket, parse_retry_after
+
+
+def test_burst_is_served_without_waiting():
+    bucket = TokenBucket(rate=1, burst=3)
+    waits = [bucket.reserve() for _ in range(3)]
+    assert waits == [0.0, 0.0, 0.0]
+
+
+def test_wait_after_burst_is_used():
+    bucket = TokenBucket(rate=2, burst=1)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.05)
+
+
+def test_throttle_halves_rate_and_honors_retry_after():
+    bucket = TokenBucket(rate=8, burst=5)
+    bucket.throttle(retry_after=2)
+    assert bucket.rate == 4
+    assert bucket.reserve() == pytest.approx(2, abs=0.05)
+
+
+def test_recover_does_not_exceed_max_rate():
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket.throttle()
+    for _ in range(20):
+        bucket.recover()
+    assert bucket.rate == 10
+
+
+def test_buckets_are_shared_per_host():
+    rate_limiter.configure({'api.openalex.org': (10, 10), 'default': (2, 4)})
+    assert rate_limiter.get_bucket('https://api.openalex.org/works/x') is rate_limiter.get_bucket('https://api.openalex.org/works/y')
+    assert rate_limiter.get_bucket('https://api.openalex.org/works').max_rate == 10
+    assert rate_limiter.get_bucket('https://api.datacite.org/dois/x').max_rate == 2
+
+
+@pytest.mark.parametrize("value,expected", [("3", 3.0), (None, None), ("", None), ("not a date", None)])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_unlimited_host_does_not_wait():
+    rate_limiter.configure({'localhost': None, 'default': (1, 1)})
+    bucket = rate_limiter.get_bucket('http://localhost:3030/api/x')
+    assert [bucket.reserve() for _ in range(100)] == [0.0] * 100
+    assert rate_limiter.get_bucket('https://api.datacite.org/dois/x').max_rate == 1
+
+
+def test_unlimited_host_honors_retry_after():
+    rate_limiter.configure({'localhost': None})
+    bucket = rate_limiter.get_bucket('http://localhost:3030/api/x')
+    bucket.throttle(30)
+    assert bucket.reserve() > 29
@@ -0,0 +1,54 @@
+"""
+Tests for the persistent response cache of Pure searches.
+
+Responses are keyed by endpoint plus the normalized request body, expire after the ttl of
+their endpoint and are invalidated by a write to their entity type.
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find response_cache
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from response_cache import ResponseCache, normalize_body
+
+
+def make_cache(tmp_path, ttls=None):
+    return ResponseCache(str(tmp_path / 'cache.sqlite'), ttls or {'persons/search': 60, 'external-persons/search': 60})
+
+
+def test_equal_bodies_share_a_key():
+    assert normalize_body('{"searchString": "x", "size": 10}') == normalize_body({"size": 10, "searchString": "x"})
+
+
+def test_cache_hit_after_set(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set('persons/search/', '{"searchString": "0000-0001"}', '{"items": []}')
+    assert cache.get('/persons/search', {"searchString": "0000-0001"}) == '{"items": []}'
+    assert cache.hits == 1
+
+
+def test_endpoints_without_ttl_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set('research-outputs/search/', {"searchString": "doi"}, '{"items": []}')
+    assert cache.get('research-outputs/search/', {"searchString": "doi"}) is None
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = make_cache(tmp_path, {'persons/search': -1})
+    cache.set('persons/search/', {"searchString": "x"}, '{}')
+    assert cache.get('persons/search/', {"searchString": "x"}) is None
+
+
+def test_invalidate_removes_searches_of_entity_type(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set('persons/search/', {"searchString": "x"}, '{}')
+    cache.set('external-persons/search/', {"searchString": "x"}, '{}')
+    cache.invalidate('external-persons')
+    assert cache.get('external-persons/search/', {"searchString": "x"}) is None
+    assert cache.get('persons/search/', {"searchString": "x"}) == '{}'
+
+
+def test_cache_is_shared_between_instances(tmp_path):
+    make_cache(tmp_path).set('persons/search/', {"searchString": "x"}, '{}')
+    assert make_cache(tmp_path).get('persons/search/', {"searchString": "x"}) == '{}'
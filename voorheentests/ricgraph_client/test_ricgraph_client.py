@@ -0,0 +1,86 @@
+"""
+Tests for the Ricgraph client.
+
+The neighbor nodes of a node are cached per (key, category_want), in memory and on disk, so a
+second run on the same faculty does not walk the graph again.
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src directory to sys.path to find ricgraph_client
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from ricgraph_client import RicgraphClient, DATA_SET, RESEARCH_OUTPUT
+from local_store import PersistentMap
+from ricgraph_snapshot import RicgraphSnapshot
+
+
+@pytest.fixture
+def neighbor_session(ricgraph_session):
+    # every neighbor request is answered with one node, keyed on the parameters of the request
+    return lambda: ricgraph_session(lambda url, params: [{"_key": f"{params['key']}|{params['category_want']}",
+                                                          "_source": []}])
+
+
+def test_neighbor_nodes_are_cached_per_category(neighbor_session):
+    session = neighbor_session()
+    client = RicgraphClient('http://ricgraph/api/', session=session)
+    assert client.research_outputs('root1') == client.research_outputs('root1')
+    client.datasets('root1')
+    assert len(session.calls) == 2
+    assert session.calls[0] == ('http://ricgraph/api/get_all_neighbor_nodes',
+                                {'key': 'root1', 'category_want': RESEARCH_OUTPUT, 'max_nr_items': '0'})
+
+
+def test_neighbor_nodes_are_reused_between_runs(tmp_path, neighbor_session):
+    path = str(tmp_path / 'ricgraph.sqlite')
+    first = RicgraphClient('http://ricgraph/api/', session=neighbor_session(), store=PersistentMap(path, 'neighbor_nodes'))
+    nodes = first.datasets('root1')
+
+    session = neighbor_session()
+    second = RicgraphClient('http://ricgraph/api/', session=session, store=PersistentMap(path, 'neighbor_nodes'))
+    assert second.neighbor_nodes('root1', DATA_SET) == nodes
+    assert session.calls == []
+
+
+def test_map_personroots_keeps_order(neighbor_session):
+    import random
+    import time
+
+    def fetch(key):
+        time.sleep(random.random() / 100)
+        return key.upper()
+
+    client = RicgraphClient('http://ricgraph/api/', session=neighbor_session())
+    personroots = [{'_key': f'root{i}'} for i in range(20)] + [{'_key': None}]
+    results = list(client.map_personroots(personroots, fetch, workers=8))
+    assert results == [(f'root{i}', f'ROOT{i}') for i in range(20)]
+
+
+def test_doi_set_keeps_provenance():
+    from ricgraph_client import DoiSet
+
+    dois = DoiSet()
+    dois.add('10.1/A', 'root1', ['OpenAlex-uu'])
+    dois.add('10.1/b', 'root1', ['OpenAlex-uu', 'Pure-uu'])
+    dois.add('10.1/a', 'root2', ['Yoda-DataCite'])
+
+    assert list(dois) == ['10.1/A', '10.1/b']
+    assert (dois.raw, len(dois)) == (3, 2)
+    assert dois.provenance('10.1/a')['personroots'] == ['root1', 'root2']
+    assert dois.provenance('10.1/a')['sources'] == {'OpenAlex-uu', 'Yoda-DataCite'}
+
+    not_in_pure = dois.filter(lambda entry: 'Pure-uu' not in entry['sources'])
+    assert list(not_in_pure) == ['10.1/A'] and not_in_pure.raw == 2
+
+
+def test_live_and_snapshot_walk_ask_for_all_neighbors(neighbor_session, ricgraph_session, tmp_path):
+    session = neighbor_session()
+    RicgraphClient('http://ricgraph/api/', session=session).research_outputs('root1')
+    snapshot_session = ricgraph_session(lambda url, params: [{"_key": "root1", "_source": []}]
+                                        if 'personroot' in url else [])
+    RicgraphSnapshot(str(tmp_path / 'snapshot.sqlite')).take('faculty1', RicgraphClient('http://ricgraph/api/',
+                                                                                          session=snapshot_session))
+    neighbor_params = [params for url, params in snapshot_session.calls if url.endswith('get_all_neighbor_nodes')]
+    assert neighbor_params[0]['max_nr_items'] == session.calls[0][1]['max_nr_items'] == '0'
@@ -0,0 +1,75 @@
+"""
+Tests for the Ricgraph snapshot.
+
+A faculty is walked once with one neighbor request per person-root; the scripts then read the
+research outputs, datasets and person ids of the person-roots from the snapshot.
+"""
+import sys
+from pathlib import Path
+import requests
+
+# Add src directory to sys.path to find ricgraph_snapshot
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from ricgraph_client import RicgraphClient, DATA_SET, PERSON, RESEARCH_OUTPUT
+from ricgraph_snapshot import RicgraphSnapshot, SnapshotRicgraphClient
+
+
+def faculty_nodes(url, params):
+    if url.endswith('get_all_personroot_nodes'):
+        return [{'_key': 'root1'}, {'_key': 'root2'}]
+    key = params['key']
+    return [
+        {'_key': f'10.1/{key}|doi', 'category': RESEARCH_OUTPUT, '_source': ['OpenAlex-uu']},
+        {'_key': f'10.2/{key}|doi', 'category': DATA_SET, '_source': ['Yoda-DataCite']},
+        {'_key': f'{key}|orcid', 'category': PERSON, 'name': 'ORCID', 'value': key},
+    ]
+
+
+def endpoints(session):
+    return [url.rsplit('/', 1)[-1] for url, _ in session.calls]
+
+
+def test_snapshot_is_read_instead_of_ricgraph(tmp_path, ricgraph_session):
+    snapshot = RicgraphSnapshot(str(tmp_path / 'snapshot.sqlite'))
+    walk = ricgraph_session(faculty_nodes)
+    snapshot.take('faculty1', RicgraphClient('http://ricgraph/api/', session=walk))
+    assert endpoints(walk).count('get_all_neighbor_nodes') == 2
+
+    live = ricgraph_session(faculty_nodes)
+    client = SnapshotRicgraphClient(snapshot, base_url='http://ricgraph/api/', session=live)
+    personroots = client.personroots('faculty1')
+    assert [key for key, _ in client.map_personroots(personroots, client.research_outputs)] == ['root1', 'root2']
+    assert client.datasets('root2')[0]['_key'] == '10.2/root2|doi'
+    assert client.person_ids('root1')[0]['value'] == 'root1'
+    assert client.select_faculties('all') == ['faculty1']
+    assert live.calls == []
+
+
+def walk_of(personroots, failing=()):
+    """Nodes of a faculty with these person-roots, where fetching the neighbors of `failing` fails."""
+    def nodes(url, params):
+        if url.endswith('get_all_personroot_nodes'):
+            return [{'_key': key} for key in personroots]
+        if params['key'] in failing:
+            raise requests.ConnectionError('reset')
+        return faculty_nodes(url, params)
+    return nodes
+
+
+def test_retaking_a_faculty_drops_stale_nodes(tmp_path, ricgraph_session):
+    snapshot = RicgraphSnapshot(str(tmp_path / 'snapshot.sqlite'))
+
+    def take(faculty, nodes):
+        snapshot.take(faculty, RicgraphClient('http://ricgraph/api/', session=ricgraph_session(nodes)))
+
+    take('faculty1', walk_of(['root1', 'root2', 'root3']))
+    take('faculty2', walk_of(['root2']))
+    # root2 and root3 have left faculty1, root2 is still in faculty2 and root1 cannot be fetched
+    take('faculty1', walk_of(['root1', 'root4'], failing=['root1']))
+
+    assert snapshot.neighbor_nodes('root1', RESEARCH_OUTPUT) is None
+    assert snapshot.neighbor_nodes('root2', RESEARCH_OUTPUT)[0]['_key'] == '10.1/root2|doi'
+    assert snapshot.neighbor_nodes('root3', RESEARCH_OUTPUT) is None
+    assert snapshot.neighbor_nodes('root4', RESEARCH_OUTPUT)[0]['_key'] == '10.1/root4|doi'
+    assert [node['_key'] for node in snapshot.personroots('faculty1')] == ['root1', 'root4']
@@ -0,0 +1,45 @@
+"""
+Tests for sharding a run over several processes.
+
+Every DOI is in exactly one shard, the shard of a DOI does not depend on the run, the processes
+share the rate limits of the hosts and the counters of the shards are added up by the parent process.
+"""
+import logging
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find sharding
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import rate_limiter
+import sharding
+
+
+def count_shard(dois, index, prefix):
+    logging.info(f"shard {index}: {len(dois)} DOIs")
+    return {'processed': len(dois), prefix: len([doi for doi in dois if doi.startswith(prefix)])}
+
+
+def bucket_of_shard(dois, index):
+    bucket = rate_limiter.get_bucket('https://api.example.org/')
+    return bucket.max_rate, bucket.burst
+
+
+def test_split_is_stable_and_complete():
+    dois = [f'10.1/{i}' for i in range(100)]
+    parts = sharding.split(dois, 4)
+    assert sorted(doi for part in parts for doi in part) == sorted(dois)
+    assert parts == sharding.split(dois, 4)
+    assert sharding.shard_of('10.1/ABC', 4) == sharding.shard_of('10.1/abc', 4)
+
+
+def test_run_sharded_merges_counters():
+    dois = [f'10.1/{i}' for i in range(50)] + [f'10.2/{i}' for i in range(10)]
+    results = sharding.run_sharded(count_shard, sharding.split(dois, 3), 3, '10.2')
+    counts = sharding.merge_counts(results)
+    assert counts == {'processed': 60, '10.2': 10}
+
+
+def test_processes_share_the_rate_limit():
+    results = sharding.run_sharded(bucket_of_shard, [[], []], 2)
+    assert results == [(rate_limiter.DEFAULT_RATE / 2, rate_limiter.DEFAULT_BURST / 2)] * 2
@@ -0,0 +1,37 @@
+"""
+Tests for the sync state of the research output import.
+
+DOIs that were created or skipped for a faculty are not processed again by the next run;
+failed DOIs are retried.
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to sys.path to find sync_state
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+from sync_state import SyncState, CREATED, SKIPPED, FAILED
+from doi_utils import normalize_doi
+
+
+def test_normalize_doi():
+    assert normalize_doi('https://doi.org/10.1038/ABC') == '10.1038/abc'
+    assert normalize_doi(' doi.org/10.1038/abc') == '10.1038/abc'
+    assert normalize_doi(None) == ''
+
+
+def test_only_created_and_skipped_dois_are_handled(tmp_path):
+    state = SyncState(str(tmp_path / 'sync_state.sqlite'))
+    state.record_many([
+        ('faculty1', 'doi.org/10.1/a', CREATED, None),
+        ('faculty1', 'https://doi.org/10.1/B', SKIPPED, 'no internal contributors'),
+        ('faculty1', '10.1/c', FAILED, 'not accepted by Pure'),
+        ('faculty2', '10.1/d', CREATED, None),
+    ])
+    assert state.handled(['faculty1']) == {'10.1/a', '10.1/b'}
+    assert state.handled(['faculty1', 'faculty2']) == {'10.1/a', '10.1/b', '10.1/d'}
+    assert state.status('faculty1', 'doi.org/10.1/C')[:2] == (FAILED, 'not accepted by Pure')
+
+    # a retried DOI replaces its earlier status
+    state.record('faculty1', '10.1/c', CREATED)
+    assert '10.1/c' in state.handled(['faculty1'])
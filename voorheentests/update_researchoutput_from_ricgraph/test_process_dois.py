@@ -0,0 +1,116 @@
+"""
+Tests for recording the sync state of the research output import.
+
+The status of a DOI is recorded as soon as it is known, so a run that stops halfway keeps what it
+did. Works that cannot be transformed are skipped; DOIs that are not found, whose Pure lookups
+failed or whose outcome is unknown are failed and retried by the next run.
+"""
+import functools
+import sys
+from collections import Counter
+from pathlib import Path
+import pandas as pd
+import pytest
+
+# Add src directory to sys.path to find update_researchoutput_from_ricgraph
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "src"))
+
+import openalex_utils
+import sync_state
+import update_researchoutput_from_ricgraph as update
+from openalex_client import NOT_FOUND
+from sync_state import SyncState, CREATED, SKIPPED, FAILED
+
+
+def work(doi, title='A title'):
+    return {'id': 'W' + doi, 'doi': 'https://doi.org/' + doi, 'title': title, 'type': 'article',
+            'publication_date': '2024-01-02', 'keywords': [],
+            'authorships': [{'author': {'display_name': 'Jane Smith', 'id': 'https://openalex.org/A1'}}],
+            'primary_location': {'source': {'issn_l': '1234-5678'}}}
+
+
+class FakeOpenAlexClient:
+    def iter_works(self, dois):
+        for doi in dois:
+            if doi == '10.1/missing':
+                yield doi, None, NOT_FOUND
+            else:
+                yield doi, work(doi, title=None if doi == '10.1/untitled' else 'A title'), None
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    state = SyncState(str(tmp_path / 'sync_state.sqlite'))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sync_state, 'SyncState', lambda: state)
+    monkeypatch.setattr(update, 'get_openalex_client', FakeOpenAlexClient)
+    monkeypatch.setattr(openalex_utils, 'harvest_path', lambda name: str(tmp_path / f'{name}.jsonl'))
+    return state
+
+
+DOIS = ['10.1/created', '10.1/lookup', '10.1/missing', '10.1/untitled']
+FACULTIES_OF = {doi: ['faculty1'] for doi in DOIS}
+
+
+def test_statuses_are_recorded(state, monkeypatch):
+    def df_to_pure(df, test, workers, on_result, async_contributors):
+        for _, row in df.iterrows():
+            if row['doi'].endswith('lookup'):
+                on_result('failed', row, 'person lookup of Jane Smith failed')
+            else:
+                on_result('created', row, None)
+        return Counter()
+
+    monkeypatch.setattr(update.pure, 'df_to_pure', df_to_pure)
+    update.process_dois(DOIS, None, 'no', 1, FACULTIES_OF)
+
+    assert state.status('faculty1', '10.1/created')[0] == CREATED
+    assert state.status('faculty1', '10.1/lookup')[:2] == (FAILED, 'person lookup of Jane Smith failed')
+    assert state.status('faculty1', '10.1/missing')[:2] == (FAILED, NOT_FOUND)
+    assert state.status('faculty1', '10.1/untitled')[:2] == (SKIPPED, 'Missing fields: title in OpenAlex')
+    assert state.handled(['faculty1']) == {'10.1/created', '10.1/untitled'}
+
+
+def test_interrupted_run_keeps_the_recorded_statuses(state, monkeypatch):
+    def df_to_pure(df, test, workers, on_result, async_contributors):
+        on_result('created', df.iloc[0], None)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(update.pure, 'df_to_pure', df_to_pure)
+    with pytest.raises(KeyboardInterrupt):
+        update.process_dois(DOIS, None, 'no', 1, FACULTIES_OF)
+
+    assert state.status('faculty1', '10.1/created')[0] == CREATED
+    assert state.status('faculty1', '10.1/lookup') is None
+
+
+def test_unreported_dois_are_failed(state, monkeypatch):
+    monkeypatch.setattr(update.pure, 'df_to_pure',
+                        lambda df, test, workers, on_result, async_contributors: Counter())
+    update.process_dois(['10.1/created'], None, 'no', 1, FACULTIES_OF)
+    assert state.status('faculty1', '10.1/created')[:2] == (FAILED, 'not processed')
+
+
+def test_works_are_processed_in_chunks(state, monkeypatch):
+    chunks = []
+
+    def df_to_pure(df, test, workers, on_result, async_contributors):
+        chunks.append(list(df['doi']))
+        return Counter(created=len(df))
+
+    monkeypatch.setattr(update.pure, 'df_to_pure', df_to_pure)
+    monkeypatch.setattr(openalex_utils, 'iter_openalex_chunks',
+                        functools.partial(openalex_utils.iter_openalex_chunks, chunk_size=1))
+    counts = update.process_dois(DOIS, None, 'no', 1, FACULTIES_OF)
+
+    assert len(chunks) == 2
+    assert counts == {'created': 2, 'not in openalex': 1}
+    assert list(pd.read_excel('ro.xlsx')['doi']) == [doi for chunk in chunks for doi in chunk]
+    assert state.status('faculty1', '10.1/untitled')[0] == SKIPPED
+
+
+def test_no_transformed_works_writes_an_empty_excel_file(state, monkeypatch):
+    monkeypatch.setattr(update.pure, 'df_to_pure', lambda *args: pytest.fail("nothing to process"))
+    counts = update.process_dois(['10.1/missing', '10.1/untitled'], None, 'no', 1, FACULTIES_OF)
+    assert counts == {'not in openalex': 1}
+    assert pd.read_excel('ro.xlsx').empty